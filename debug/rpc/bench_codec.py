@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from shared.ndjson import FRAME_CODECS, FrameFormat
+from shared.proc_rpc import RPC_STREAM_LIMIT
+
+_STDOUT = "\n".join(f"{i:05d} drwxr-xr-x  agent  staff  src/module_{i}/__init__.py \"quoted\" \\t" for i in range(2000))
+_BODY = json.dumps({"items": [{"id": i, "title": f"Item {i} — ünïcode", "tags": ["a", "b"]} for i in range(3000)]})
+
+# Frames shaped like what actually crosses gateway hops during a turn.
+SAMPLE_FRAMES = {
+    "policy.get_decision": {
+        "id": "3f0c7a52-9d1e-4a55-9f7e-1b7c2f6f0a11",
+        "op": "policy.get_decision",
+        "payload": {"principal_id": "tg:123456789", "resource_type": "tool", "resource_value": "git"},
+    },
+    "assistant.delta": {
+        "id": "3f0c7a52-9d1e-4a55-9f7e-1b7c2f6f0a11",
+        "event": "assistant.delta",
+        "payload": {"text": "Sure — I'll check the repo status and summarise the open tasks.\n"},
+    },
+    "codex.session.send": {
+        "id": "3f0c7a52-9d1e-4a55-9f7e-1b7c2f6f0a11",
+        "op": "codex.session.send",
+        "payload": {
+            "session_key": "private_main",
+            "prompt": "Please review the failing tests and propose a fix.\n" * 40,
+            "model_ref": "gpt-5-codex",
+            "provider_name": "openai-codex-chatgpt",
+            "api_key": "",
+            "base_url": "",
+            "channel": "telegram",
+            "principal_external_id": "123456789",
+        },
+    },
+    "tools.exec result": {
+        "id": "3f0c7a52-9d1e-4a55-9f7e-1b7c2f6f0a11",
+        "ok": True,
+        "result": {"status": "executed", "code": 0, "stdout": _STDOUT, "stderr": ""},
+    },
+    "web.request result": {
+        "id": "3f0c7a52-9d1e-4a55-9f7e-1b7c2f6f0a11",
+        "ok": True,
+        "result": {"status": "executed", "response": {"status": 200, "headers": {"content-type": "application/json"},
+                                                      "body": _BODY}},
+    },
+}
+
+
+def _time_per_frame(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1_000_000
+
+
+def _decode_once(fmt: FrameFormat, data: bytes) -> dict:
+    async def _read():
+        reader = asyncio.StreamReader(limit=RPC_STREAM_LIMIT)
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await fmt.read(reader)
+
+    return asyncio.run(_read())
+
+
+def _bench(name: str, frame: dict, codec: str | None, iterations: int) -> dict:
+    fmt = FrameFormat()
+    if codec is not None:
+        fmt.use(codec)
+    data = fmt.encode(frame)
+    assert _decode_once(fmt, data) == frame
+    loads = fmt.codec.loads if fmt.codec is not None else json.loads
+    body = data[4:] if fmt.codec is not None else data
+    return {
+        "frame": name,
+        "codec": fmt.codec_name,
+        "bytes": len(data),
+        "encode_us": round(_time_per_frame(lambda: fmt.encode(frame), iterations), 2),
+        "decode_us": round(_time_per_frame(lambda: loads(body), iterations), 2),
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Encode/decode cost of RPC frame codecs on realistic gateway frames")
+    p.add_argument("--iterations", type=int, default=200)
+    args = p.parse_args()
+    for name, frame in SAMPLE_FRAMES.items():
+        for codec in (None, *FRAME_CODECS):
+            print(json.dumps(_bench(name, frame, codec, args.iterations), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import socket
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from shared import proc_rpc
+from shared.proc_rpc import ProcClient
+from shared.service_base import NDJSONService
+
+# Shaped like the small secrets/policy lookups that dominate a gateway turn.
+SAMPLE_PAYLOAD = {"principal_id": "tg:123456789", "resource_type": "tool", "resource_value": "git"}
+
+
+def _free_port() -> int:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def _echo_app() -> NDJSONService:
+    async def echo(payload, emit_event, req_id):
+        return {"decision": "ALLOW", "echo": payload}
+
+    return NDJSONService(name="bench.echo", island="gw", kind="service", version="bench", ops={"echo": echo})
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+async def _measure(client: ProcClient, requests: int, concurrency: int) -> dict:
+    await client.request("echo", SAMPLE_PAYLOAD)
+    latencies: list[float] = []
+
+    async def _worker(count: int) -> None:
+        for _ in range(count):
+            started = time.perf_counter()
+            await client.request("echo", SAMPLE_PAYLOAD)
+            latencies.append((time.perf_counter() - started) * 1_000_000)
+
+    per_worker = max(1, requests // concurrency)
+    started = time.perf_counter()
+    await asyncio.gather(*(_worker(per_worker) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_us": round(statistics.median(latencies), 1),
+        "p99_us": round(_percentile(latencies, 99), 1),
+    }
+
+
+async def _bench_transport(transport: str, requests: int, concurrency: int) -> dict:
+    app = _echo_app()
+    with tempfile.TemporaryDirectory(prefix="sheriff-bench-") as tmp:
+        sock_path = Path(tmp) / "bench.sock"
+        port = _free_port()
+        if transport == "unix":
+            server = asyncio.create_task(app.run_unix(sock_path))
+            proc_rpc.rpc_socket_path = lambda service: sock_path
+            proc_rpc.rpc_endpoint = lambda service: None
+        else:
+            server = asyncio.create_task(app.run_tcp("127.0.0.1", port))
+            proc_rpc.rpc_socket_path = lambda service: None
+            proc_rpc.rpc_endpoint = lambda service: ("127.0.0.1", port)
+        await asyncio.sleep(0.1)
+        client = ProcClient("bench", spawn_fallback=False)
+        try:
+            return {"transport": transport, **await _measure(client, requests, concurrency)}
+        finally:
+            await client.close()
+            server.cancel()
+            try:
+                await server
+            except asyncio.CancelledError:
+                pass
+
+
+async def _main(args) -> None:
+    for concurrency in args.concurrency:
+        for transport in ("tcp", "unix"):
+            print(json.dumps(await _bench_transport(transport, args.requests, concurrency)))
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Compare ProcClient round-trip cost over TCP loopback and AF_UNIX")
+    p.add_argument("--requests", type=int, default=5000)
+    p.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    asyncio.run(_main(p.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
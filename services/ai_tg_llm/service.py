@@ -1,11 +1,11 @@
 from __future__ import annotations
 
-from shared.proc_rpc import ProcClient
+from shared.rpc_pool import pooled_client
 
 
 class AITgLlmService:
     def __init__(self):
-        self.gateway = ProcClient("sheriff-gateway", spawn_fallback=False)
+        self.gateway = pooled_client("sheriff-gateway")
 
     async def _secrets(self, op: str, payload: dict):
         _, res = await self.gateway.request("gateway.secrets.call", {"op": op, "payload": payload})
@@ -2,12 +2,12 @@ from __future__ import annotations
 
 import inspect
 
-from shared.proc_rpc import ProcClient
+from shared.rpc_pool import pooled_client
 
 
 class SheriffChatProxyService:
     def __init__(self) -> None:
-        self.gateway = ProcClient("sheriff-gateway", spawn_fallback=False)
+        self.gateway = pooled_client("sheriff-gateway")
 
     async def send(self, payload, emit_event, req_id):
         stream, final = await self.gateway.request(
@@ -18,6 +18,7 @@ class SheriffChatProxyService:
                 "text": payload.get("text", ""),
                 "model_ref": payload.get("model_ref"),
                 "master_password": payload.get("master_password"),
+                "tool_results_in_order": bool(payload.get("tool_results_in_order")),
             },
             stream_events=True,
         )
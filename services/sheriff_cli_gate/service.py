@@ -14,13 +14,13 @@ from shared.codex_auth import (
     start_codex_device_auth,
 )
 from shared.paths import gw_root
-from shared.proc_rpc import ProcClient
+from shared.rpc_pool import pooled_client
 
 
 class SheriffCliGateService:
     def __init__(self) -> None:
-        self.requests = ProcClient("sheriff-requests", spawn_fallback=False)
-        self.gateway = ProcClient("sheriff-gateway", spawn_fallback=False)
+        self.requests = pooled_client("sheriff-requests")
+        self.gateway = pooled_client("sheriff-gateway")
         # Back-compat shim for existing tests/mocks.
         self.secrets = None
         self.services =[
@@ -137,7 +137,7 @@ class SheriffCliGateService:
         if cmd == "status":
             lines =[]
             for svc in self.services:
-                cli = ProcClient(svc, spawn_fallback=False)
+                cli = pooled_client(svc)
                 try:
                     _, resp = await cli.request("health", {})
                     st = resp.get("result", {}).get("status", "ok") if resp.get("ok") else "error"
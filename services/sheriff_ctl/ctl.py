@@ -28,8 +28,10 @@ from services.sheriff_ctl.chat import (
 )
 from services.sheriff_ctl.onboard import cmd_configure_llm, cmd_logout_llm, cmd_onboard
 from services.sheriff_ctl.sandbox import cmd_sandbox
-from services.sheriff_ctl.service_runner import ALL, cmd_logs, cmd_start, cmd_status, cmd_stop
+from services.sheriff_ctl.service_runner import ALL, GW_HOST, cmd_logs, cmd_start, cmd_status, cmd_stop
+from services.sheriff_ctl.stats import add_stats_parser
 from services.sheriff_ctl.system import cmd_debug, cmd_factory_reset, cmd_update
+from services.sheriff_ctl.trace import add_trace_parser
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -37,11 +39,13 @@ def build_parser() -> argparse.ArgumentParser:
     sub = p.add_subparsers(dest="cmd", required=True)
     st = sub.add_parser("start")
     st.add_argument("--master-password", default=None, help="Unlock vault after start (or set SHERIFF_MASTER_PASSWORD)")
+    st.add_argument("--monolith", action="store_true",
+                    help="Run all gw services in one process (or set SHERIFF_GW_MONOLITH=1)")
     st.set_defaults(func=cmd_start)
     sub.add_parser("stop").set_defaults(func=cmd_stop)
     sub.add_parser("status").set_defaults(func=cmd_status)
     lg = sub.add_parser("logs")
-    lg.add_argument("service", choices=ALL)
+    lg.add_argument("service", choices=[*ALL, GW_HOST])
     lg.set_defaults(func=cmd_logs)
 
     for onboard_name in ("onboard", "onboarding"):
@@ -107,6 +111,8 @@ def build_parser() -> argparse.ArgumentParser:
         add_doctor_parser = None
     if add_doctor_parser is not None:
         add_doctor_parser(sub)
+    add_trace_parser(sub)
+    add_stats_parser(sub)
 
     chat = sub.add_parser("chat")
     chat.add_argument("--principal", default=DEFAULT_CHAT_PRINCIPAL)
@@ -152,6 +158,8 @@ def main_sheriff(argv: list[str] | None = None) -> None:
         "configure-llm",
         "logout-llm",
         "doctor",
+        "trace",
+        "stats",
         "chat",
         "agent-chat",
         "proxy-chat",
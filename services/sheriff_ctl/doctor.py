@@ -49,6 +49,31 @@ async def _health_summary(service: str) -> str:
         await cli.close()
 
 
+async def _latency_lines(service: str) -> list[str]:
+    cli = ProcClient(service, spawn_fallback=False)
+    cli.request_timeout_sec = DOCTOR_RPC_TIMEOUT_SEC
+    try:
+        _, res = await cli.request("metrics", {})
+    except Exception as exc:  # noqa: BLE001
+        return [f"{service}: metrics unavailable ({exc})"]
+    finally:
+        await cli.close()
+    ops = (res.get("result") or {}).get("ops") or {}
+    lines = []
+    loop = (res.get("result") or {}).get("loop")
+    if loop:
+        lines.append(f"{service} event loop: lag p50={loop['lag_p50_ms']}ms p99={loop['lag_p99_ms']}ms "
+                     f"max={loop['lag_max_ms']}ms stalls={loop['stalls']}")
+    for op, stats in sorted(ops.items(), key=lambda item: item[1].get("p99_ms", 0), reverse=True):
+        if op in {"health", "meta", "metrics"} or not stats.get("count"):
+            continue
+        lines.append(
+            f"{service} {op}: n={stats['count']} err={stats.get('errors', 0)} in_flight={stats.get('in_flight', 0)} "
+            f"p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms max={stats['max_ms']}ms"
+        )
+    return lines
+
+
 async def _vault_summary() -> str:
     gw = ProcClient("sheriff-gateway")
     gw.request_timeout_sec = DOCTOR_RPC_TIMEOUT_SEC
@@ -82,10 +107,21 @@ async def _report_async(tail_lines: int) -> str:
     lines.append("")
     lines.append("Services")
     lines.append("--------")
+    running = []
     for svc in ALL:
         status = SERVICE_MANAGER.status_code(svc)
         health = await _health_summary(svc) if status != "stopped" else "stopped"
         lines.append(f"{svc}: pid={status} health={health}")
+        if status != "stopped":
+            running.append(svc)
+
+    lines.append("")
+    lines.append("Latency")
+    lines.append("-------")
+    latency = []
+    for svc in running:
+        latency.extend(await _latency_lines(svc))
+    lines.extend(latency or ["(no requests recorded)"])
 
     lines.append("")
     lines.append("Codex Debug")
@@ -26,7 +26,7 @@ from services.sheriff_ctl.utils import (
     _service_exec_command,
 )
 from shared.proc_rpc import ProcClient
-from shared.service_registry import rpc_endpoint
+from shared.service_registry import rpc_endpoint, rpc_socket_path
 from shared.service_manager import ServiceManager
 from shared.paths import base_root
 
@@ -48,6 +48,14 @@ ALL =[*GW_ORDER, *LLM_ORDER]
 
 MANAGED_SERVICES = ALL
 
+# Optional single process hosting every GW_ORDER service; the llm island always stays separate.
+GW_HOST = "sheriff-gw-host"
+
+
+def _gw_monolith_enabled() -> bool:
+    v = os.environ.get("SHERIFF_GW_MONOLITH", "0").strip().lower()
+    return v in {"1", "true", "yes"}
+
 
 def _posix_user_exists(user: str) -> bool:
     if not user:
@@ -110,8 +118,14 @@ def _service_command(service: str) -> list[str]:
 def _service_env(service: str) -> dict[str, str]:
     env = os.environ.copy()
     env.setdefault("SHERIFFCLAW_ROOT", str(base_root()))
+    socket_path = rpc_socket_path(service)
     endpoint = rpc_endpoint(service)
-    if endpoint is not None:
+    if socket_path is not None:
+        env["SHERIFF_RPC_SOCKET"] = str(socket_path)
+        env.pop("SHERIFF_RPC_HOST", None)
+        env.pop("SHERIFF_RPC_PORT", None)
+    elif endpoint is not None:
+        env.pop("SHERIFF_RPC_SOCKET", None)
         env["SHERIFF_RPC_HOST"] = endpoint[0]
         env["SHERIFF_RPC_PORT"] = str(endpoint[1])
     return env
@@ -141,7 +155,8 @@ async def _wait_service_health(service: str, timeout_sec: float = 10.0) -> None:
     if endpoint is None:
         await asyncio.sleep(0.2)
         return
-    cli = ProcClient(service, spawn_fallback=False)
+    # Polling a service that is still booting is expected to fail; don't back off between polls.
+    cli = ProcClient(service, spawn_fallback=False, circuit_breaker=False)
     deadline = asyncio.get_running_loop().time() + timeout_sec
     try:
         while True:
@@ -159,20 +174,23 @@ async def _wait_service_health(service: str, timeout_sec: float = 10.0) -> None:
 def cmd_start(args):
     mp = getattr(args, "master_password", None) or os.getenv("SHERIFF_MASTER_PASSWORD", "")
 
-    to_restart = list(MANAGED_SERVICES)
+    monolith = bool(getattr(args, "monolith", False)) or _gw_monolith_enabled()
+    to_restart = [GW_HOST, *LLM_ORDER] if monolith else list(MANAGED_SERVICES)
 
-    # Restart managed services we selected to avoid stale old binaries.
-    SERVICE_MANAGER.stop_many(list(reversed(to_restart)))
+    # Restart managed services we selected to avoid stale old binaries; stopping both layouts
+    # also cleans up after a switch between per-service and monolith mode.
+    SERVICE_MANAGER.stop_many(list(reversed([GW_HOST, *MANAGED_SERVICES])))
 
     async def _start_all() -> None:
         for service in to_restart:
             SERVICE_MANAGER.start(service)
-            await _wait_service_health(service)
+            for hosted in (GW_ORDER if service == GW_HOST else [service]):
+                await _wait_service_health(hosted)
 
     asyncio.run(_start_all())
 
     async def _check_and_unlock():
-        secrets = ProcClient("sheriff-secrets", spawn_fallback=False)
+        secrets = ProcClient("sheriff-secrets", spawn_fallback=False, circuit_breaker=False)
         try:
             for _ in range(15):
                 try:
@@ -206,10 +224,13 @@ def cmd_start(args):
 
 
 def cmd_stop(args):
-    SERVICE_MANAGER.stop_many(list(reversed(MANAGED_SERVICES)))
+    SERVICE_MANAGER.stop_many(list(reversed([GW_HOST, *MANAGED_SERVICES])))
 
 
 def cmd_status(args):
+    host_status = SERVICE_MANAGER.status_code(GW_HOST)
+    if host_status != "stopped":
+        print(f"{GW_HOST}: {host_status}")
     for svc in ALL:
         print(f"{svc}: {SERVICE_MANAGER.status_code(svc)}")
 
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import json
+import time
+
+from shared.turn_timings import TurnTimingStore, summarize
+
+# Fixed phases first, in turn order; tool:<name> rows follow, then the host/Codex split.
+PHASE_ORDER = (
+    "queue_wait",
+    "preflight",
+    "session_ensure",
+    "vault",
+    "provider",
+    "codex_first_event",
+    "codex",
+    "tools",
+)
+
+
+def _ordered(summary: dict[str, dict]) -> list[str]:
+    names = [name for name in PHASE_ORDER if name in summary]
+    names += sorted(name for name in summary if name.startswith("tool:"))
+    names += sorted(name for name in summary if name not in names and name not in {"host", "total"})
+    names += [name for name in ("host", "total") if name in summary]
+    return names
+
+
+def render_turn_stats(rows: list[dict]) -> str:
+    if not rows:
+        return "No turn timings recorded yet."
+    summary = summarize(rows)
+    lines = [f"{len(rows)} turns",
+             f"{'phase':<24} {'count':>6} {'p50':>10} {'p95':>10} {'p99':>10} {'max':>10}"]
+    for name in _ordered(summary):
+        stats = summary[name]
+        lines.append(f"{name:<24} {stats['count']:>6} {stats['p50_ms']:>8.1f}ms {stats['p95_ms']:>8.1f}ms "
+                     f"{stats['p99_ms']:>8.1f}ms {stats['max_ms']:>8.1f}ms")
+    return "\n".join(lines)
+
+
+def cmd_stats_turns(args) -> None:
+    since_min = float(getattr(args, "since_min", 0) or 0)
+    since = time.time() - since_min * 60 if since_min > 0 else None
+    rows = TurnTimingStore().load(int(getattr(args, "limit", 1000)), since=since)
+    if getattr(args, "json", False):
+        print(json.dumps({"turns": len(rows), "phases": summarize(rows)}, indent=2, sort_keys=True))
+        return
+    print(render_turn_stats(rows))
+
+
+def add_stats_parser(sub) -> None:
+    st = sub.add_parser("stats", help="Summarize recorded latency data")
+    st_sub = st.add_subparsers(dest="stats_cmd", required=True)
+    turns = st_sub.add_parser("turns", help="Per-phase latency percentiles of gateway turns")
+    turns.add_argument("--limit", type=int, default=1000, help="Only the most recent N turns")
+    turns.add_argument("--since-min", type=float, default=0, help="Only turns from the last N minutes")
+    turns.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    turns.set_defaults(func=cmd_stats_turns)
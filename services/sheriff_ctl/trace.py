@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+import time
+
+from shared.rpc_trace import trace_dirs
+
+WATERFALL_WIDTH = 40
+
+
+def _iter_spans():
+    for directory in trace_dirs():
+        if not directory.exists():
+            continue
+        for path in sorted(directory.glob("*.jsonl*")):
+            try:
+                lines = path.read_text(encoding="utf-8", errors="replace").splitlines()
+            except OSError:
+                continue
+            for line in lines:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(row, dict) and row.get("trace_id"):
+                    yield row
+
+
+def load_trace(trace_id: str) -> tuple[list[str], list[dict]]:
+    """Return (matching trace ids, spans); a prefix of the id is enough when it is unambiguous."""
+    spans = [row for row in _iter_spans() if str(row["trace_id"]).startswith(trace_id)]
+    ids = sorted({row["trace_id"] for row in spans})
+    return ids, spans
+
+
+def recent_traces(limit: int = 10) -> list[dict]:
+    roots = [row for row in _iter_spans() if not row.get("parent_span_id")]
+    roots.sort(key=lambda row: row.get("start", 0), reverse=True)
+    return roots[:limit]
+
+
+def render_waterfall(spans: list[dict], *, width: int = WATERFALL_WIDTH) -> str:
+    if not spans:
+        return "(no spans)"
+    t0 = min(row["start"] for row in spans)
+    end = max(row["start"] + row.get("duration_ms", 0) / 1000 for row in spans)
+    total_ms = max((end - t0) * 1000, 0.001)
+    by_id = {row["span_id"]: row for row in spans}
+    children: dict[str | None, list[dict]] = {}
+    for row in spans:
+        parent = row.get("parent_span_id")
+        children.setdefault(parent if parent in by_id else None, []).append(row)
+    for group in children.values():
+        group.sort(key=lambda row: row["start"])
+
+    lines = [f"trace {spans[0]['trace_id']}  {total_ms:.1f}ms  {len(spans)} spans"]
+
+    def _walk(parent: str | None, depth: int) -> None:
+        for row in children.get(parent, []):
+            offset_ms = (row["start"] - t0) * 1000
+            duration_ms = row.get("duration_ms", 0)
+            col = min(width - 1, int(offset_ms / total_ms * width))
+            bar = " " * col + "█" * max(1, min(width - col, round(duration_ms / total_ms * width)))
+            outcome = row.get("outcome", "ok")
+            label = f"{row.get('service', '?')} {row.get('op', '?')}" + ("" if outcome == "ok" else f" [{outcome}]")
+            lines.append(f"{offset_ms:>9.1f}ms {duration_ms:>9.1f}ms |{bar:<{width}}| {'  ' * depth}{label}")
+            _walk(row["span_id"], depth + 1)
+
+    _walk(None, 0)
+    return "\n".join(lines)
+
+
+def cmd_trace(args) -> None:
+    trace_id = (getattr(args, "trace_id", None) or "").strip()
+    if not trace_id:
+        roots = recent_traces(int(getattr(args, "limit", 10)))
+        if not roots:
+            print("No traces recorded yet.")
+            return
+        for row in roots:
+            started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row["start"]))
+            print(f"{row['trace_id']}  {started}  {row.get('duration_ms', 0):>9.1f}ms  "
+                  f"{row.get('service', '?')} {row.get('op', '?')}")
+        return
+    ids, spans = load_trace(trace_id)
+    if not ids:
+        print(f"No spans found for trace {trace_id}")
+        return
+    if len(ids) > 1:
+        print(f"Trace id prefix {trace_id} is ambiguous:")
+        for candidate in ids:
+            print(f"  {candidate}")
+        return
+    print(render_waterfall(spans))
+
+
+def add_trace_parser(sub) -> None:
+    tr = sub.add_parser("trace", help="Show the span waterfall of one traced request")
+    tr.add_argument("trace_id", nargs="?", default="", help="Trace id or unique prefix; omit to list recent traces")
+    tr.add_argument("--limit", type=int, default=10, help="How many recent traces to list")
+    tr.set_defaults(func=cmd_trace)
@@ -39,6 +39,7 @@ SERVICE_MODULES = {
     "sheriff-cli-gate": "services.sheriff_cli_gate.__main__",
     "sheriff-updater": "services.sheriff_updater.__main__",
     "sheriff-scheduler": "services.sheriff_scheduler.__main__",
+    "sheriff-gw-host": "services.sheriff_gw_host.__main__",
     "codex-mcp-host": "services.ai_worker.__main__",
     "ai-tg-llm": "services.ai_tg_llm.__main__",
     "telegram-listener": "services.telegram_listener.__main__",
@@ -1,15 +1,29 @@
 from __future__ import annotations
 
+import asyncio
+
 from services.sheriff_gateway.service import SheriffGatewayService
 from shared.protocol import VERSION
 from shared.service_base import NDJSONService
-from shared.service_boot import run_service
+from shared.service_boot import serve_app
 
 
-def main() -> None:
+async def _run() -> None:
     svc = SheriffGatewayService()
     app = NDJSONService(name="gw.gateway", island="gw", kind="service", version=VERSION, ops=svc.ops())
-    run_service(app)
+    queue_task = asyncio.create_task(svc.run_queue_forever())
+    try:
+        await serve_app(app)
+    finally:
+        queue_task.cancel()
+        try:
+            await queue_task
+        except asyncio.CancelledError:
+            pass
+
+
+def main() -> None:
+    asyncio.run(_run())
 
 
 if __name__ == "__main__":
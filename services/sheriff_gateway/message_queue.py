@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+# The caller gave up on it; it is not replayed unless the same key is submitted again.
+CANCELLED = "cancelled"
+OPEN_STATUSES = (QUEUED, RUNNING)
+
+# An open message whose lease was not extended for this long is handed to another worker.
+GW_QUEUE_VISIBILITY_SEC = float(os.environ.get("SHERIFF_GW_QUEUE_VISIBILITY_SEC", "300"))
+# How often leases of running messages are extended and abandoned ones replayed.
+GW_QUEUE_SWEEP_SEC = float(os.environ.get("SHERIFF_GW_QUEUE_SWEEP_SEC", "30"))
+# A message that took the gateway down this many times is parked as failed instead of replayed again.
+GW_QUEUE_MAX_ATTEMPTS = int(os.environ.get("SHERIFF_GW_QUEUE_MAX_ATTEMPTS", "3"))
+# Finished messages are remembered this long so a redelivered update is dropped as a duplicate.
+GW_QUEUE_KEEP_SEC = float(os.environ.get("SHERIFF_GW_QUEUE_KEEP_SEC", str(7 * 24 * 3600)))
+
+# Never persisted: a replayed message cannot unlock the vault on its own.
+TRANSIENT_PAYLOAD_KEYS = ("master_password",)
+
+_COLUMNS = ("id", "idem_key", "principal_id", "channel", "payload_json", "status", "owner", "lease_until",
+            "attempts", "result_json", "error", "enqueued_at", "updated_at")
+
+
+class DurableMessageQueue:
+    """SQLite (WAL) record of every inbound gateway message, used for at-least-once processing.
+
+    A message is enqueued under an idempotency key before it waits for its turn. Whoever runs it
+    first claims a lease: the message's status becomes running, the lease names an owner (one id per
+    gateway process), and it lasts `visibility` seconds unless extended. A message that is still
+    open when its lease expires, or whose owner is another (dead) process, can be claimed again.
+    Finished rows are kept for a while so that a redelivered update is recognized as a duplicate.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._conn: sqlite3.Connection | None = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL: a commit survives a process crash; only an OS crash can lose the last few.
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    idem_key TEXT NOT NULL UNIQUE,
+                    principal_id TEXT NOT NULL,
+                    channel TEXT NOT NULL,
+                    payload_json TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    owner TEXT NOT NULL,
+                    lease_until REAL NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    result_json TEXT,
+                    error TEXT,
+                    enqueued_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS messages_open ON messages(status, lease_until)")
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    @staticmethod
+    def _row(row: sqlite3.Row | None) -> dict | None:
+        if row is None:
+            return None
+        out = {name: row[name] for name in _COLUMNS}
+        out["payload"] = json.loads(out.pop("payload_json") or "{}")
+        result = out.pop("result_json")
+        out["result"] = json.loads(result) if result else None
+        return out
+
+    def get(self, message_id: int) -> dict | None:
+        return self._row(self._db().execute("SELECT * FROM messages WHERE id=?", (message_id,)).fetchone())
+
+    def enqueue(self, idem_key: str, principal_id: str, channel: str, payload: dict, *, owner: str,
+                visibility: float) -> tuple[dict, bool]:
+        """Store a message unless its key is known; returns (row, created)."""
+        now = time.time()
+        stored = {k: v for k, v in payload.items() if k not in TRANSIENT_PAYLOAD_KEYS}
+        cur = self._db().execute(
+            "INSERT OR IGNORE INTO messages (idem_key, principal_id, channel, payload_json, status, owner, "
+            "lease_until, enqueued_at, updated_at) VALUES (?,?,?,?,?,?,?,?,?)",
+            (idem_key, principal_id, channel, json.dumps(stored, ensure_ascii=False, default=str), QUEUED, owner,
+             now + visibility, now, now),
+        )
+        row = self._row(self._db().execute("SELECT * FROM messages WHERE idem_key=?", (idem_key,)).fetchone())
+        return row, cur.rowcount == 1
+
+    def claim(self, message_id: int, *, owner: str, visibility: float, max_attempts: int) -> dict | None:
+        """Lease an open message for `owner`; None when someone else holds it or it is finished."""
+        now = time.time()
+        conn = self._db()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT * FROM messages WHERE id=?", (message_id,)).fetchone()
+            claimable = row is not None and row["status"] in OPEN_STATUSES and (
+                row["status"] == QUEUED or row["owner"] != owner or row["lease_until"] < now)
+            if not claimable:
+                conn.execute("COMMIT")
+                return None
+            if row["attempts"] >= max_attempts:
+                conn.execute("UPDATE messages SET status=?, error=?, updated_at=? WHERE id=?",
+                             (FAILED, f"gave up after {row['attempts']} attempts", now, message_id))
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE messages SET status=?, owner=?, lease_until=?, attempts=attempts+1, updated_at=? WHERE id=?",
+                (RUNNING, owner, now + visibility, now, message_id),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return self.get(message_id)
+
+    def extend(self, message_ids, *, owner: str, visibility: float) -> None:
+        ids = list(message_ids)
+        if not ids:
+            return
+        now = time.time()
+        marks = ",".join("?" * len(ids))
+        self._db().execute(
+            f"UPDATE messages SET lease_until=?, updated_at=? WHERE owner=? AND status IN (?,?) AND id IN ({marks})",
+            (now + visibility, now, owner, *OPEN_STATUSES, *ids),
+        )
+
+    def finish(self, message_id: int, status: str, *, result: dict | None = None, error: str = "") -> None:
+        self._db().execute(
+            "UPDATE messages SET status=?, result_json=?, error=?, updated_at=? WHERE id=?",
+            (status, json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+             error or None, time.time(), message_id),
+        )
+
+    def cancel(self, message_id: int, *, owner: str) -> bool:
+        """Close an open message `owner` holds because its caller went away; False if it no longer holds it."""
+        cur = self._db().execute(
+            "UPDATE messages SET status=?, error=?, updated_at=? WHERE id=? AND owner=? AND status IN (?,?)",
+            (CANCELLED, "cancelled by caller", time.time(), message_id, owner, *OPEN_STATUSES),
+        )
+        return cur.rowcount == 1
+
+    def requeue(self, message_id: int, *, owner: str, visibility: float) -> dict | None:
+        """Reopen a cancelled message that was submitted again."""
+        now = time.time()
+        self._db().execute(
+            "UPDATE messages SET status=?, owner=?, lease_until=?, error=NULL, updated_at=? WHERE id=? AND status=?",
+            (QUEUED, owner, now + visibility, now, message_id, CANCELLED),
+        )
+        return self.get(message_id)
+
+    def reclaimable(self, *, owner: str, limit: int = 100) -> list[dict]:
+        """Open messages no live lease covers: left by another process or past their visibility timeout."""
+        rows = self._db().execute(
+            "SELECT * FROM messages WHERE status IN (?,?) AND (owner != ? OR lease_until < ?) ORDER BY id LIMIT ?",
+            (*OPEN_STATUSES, owner, time.time(), limit),
+        ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def prune(self, older_than_sec: float) -> int:
+        cur = self._db().execute("DELETE FROM messages WHERE status IN (?,?,?) AND updated_at < ?",
+                                 (DONE, FAILED, CANCELLED, time.time() - older_than_sec))
+        return cur.rowcount
+
+    def counts(self) -> dict[str, int]:
+        rows = self._db().execute("SELECT status, COUNT(*) FROM messages GROUP BY status").fetchall()
+        return {row[0]: row[1] for row in rows}
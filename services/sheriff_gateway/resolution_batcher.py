@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import os
+import time
+from typing import Awaitable, Callable
+
+from shared.oplog import get_op_logger
+
+# Resolutions for one session that arrive within this many seconds of each other wake the agent once.
+GW_RESOLUTION_WINDOW_SEC = float(os.environ.get("SHERIFF_GW_RESOLUTION_WINDOW_SEC", "3"))
+# A steady trickle of resolutions is still delivered this long after the first one of the batch.
+GW_RESOLUTION_MAX_WAIT_SEC = float(os.environ.get("SHERIFF_GW_RESOLUTION_MAX_WAIT_SEC", "15"))
+
+
+def pending_requests(tool_name: str, tool_payload: dict, result) -> list[tuple[str, str]]:
+    """(type, key) of the requests a routed tool call left waiting on the user."""
+    if not isinstance(result, dict):
+        return []
+    if tool_name == "requests.create_or_update":
+        if tool_payload.get("type") and tool_payload.get("key"):
+            return [(str(tool_payload["type"]), str(tool_payload["key"]))]
+        return []
+    status = result.get("status")
+    if status == "needs_tool_approval" and result.get("tool"):
+        return [("tool", str(result["tool"]))]
+    if status == "needs_domain_approval" and result.get("host"):
+        return [("domain", str(result["host"]))]
+    if status == "needs_secret":
+        handles = result.get("missing_handles") or [result.get("handle")]
+        return [("secret", str(handle)) for handle in handles if handle]
+    if status == "master_password_required":
+        return [("master_password", "master_password")]
+    return []
+
+
+def _intro(event: dict) -> str:
+    req_type, key, status = event.get("type"), event.get("key"), event.get("status")
+    if req_type == "secret" and status == "approved":
+        return f'Sheriff: user provided secret "{key}". Retry the blocked work if it is still needed.'
+    if req_type == "secret" and status == "denied":
+        return f'Sheriff: user denied secret "{key}". Do not assume you can use it.'
+    if req_type == "tool" and status == "approved":
+        return f'Sheriff: user approved tool "{key}". Retry the blocked command if it is still needed.'
+    if req_type == "tool" and status == "denied":
+        return f'Sheriff: user denied tool "{key}". Choose another approach.'
+    return "Sheriff: a request resolution event occurred."
+
+
+def resolution_prompt(events: list[dict]) -> str:
+    if len(events) == 1:
+        event = events[0]
+        return (
+            f"{_intro(event)}\n\n"
+            "Review repo state and continue the task appropriately.\n\n"
+            "## Request Resolution Event\n"
+            f"- type: {event.get('type')}\n"
+            f"- key: {event.get('key')}\n"
+            f"- status: {event.get('status')}\n"
+        )
+    intros = "\n".join(f"- {_intro(event).removeprefix('Sheriff: ')}" for event in events)
+    rows = "\n".join(f"- type: {e.get('type')}, key: {e.get('key')}, status: {e.get('status')}" for e in events)
+    return (
+        f"Sheriff: {len(events)} requests were resolved:\n{intros}\n\n"
+        "Review repo state and continue the task appropriately.\n\n"
+        "## Request Resolution Events\n"
+        f"{rows}\n"
+    )
+
+
+class ResolutionBatcher:
+    """Buffers request-resolution events per session and delivers each burst as one batch.
+
+    A session's batch goes out once `window` seconds pass without another event for it, or
+    `max_wait` seconds after its first event, whichever comes first.
+    """
+
+    def __init__(self, deliver: Callable[[str, list[dict]], Awaitable[None]], *,
+                 window: float = GW_RESOLUTION_WINDOW_SEC, max_wait: float = GW_RESOLUTION_MAX_WAIT_SEC):
+        self._deliver = deliver
+        self.window = max(0.0, window)
+        self.max_wait = max(self.window, max_wait)
+        self.log = get_op_logger("gateway")
+        self._batches: dict[str, list[dict]] = {}
+        self._last: dict[str, float] = {}
+        self._timers: dict[str, asyncio.Task] = {}
+        # Strong references: the loop only keeps weak ones to running tasks.
+        self._tasks: set[asyncio.Task] = set()
+
+    def add(self, session: str, event: dict) -> int:
+        """Buffer `event` for `session`; returns how many events its batch holds now."""
+        batch = self._batches.setdefault(session, [])
+        batch.append(event)
+        self._last[session] = time.monotonic()
+        if session not in self._timers:
+            # Clean context: the batch turn must not run under the first notifier's deadline or trace.
+            task = asyncio.get_running_loop().create_task(self._flush_later(session, time.monotonic()),
+                                                          context=contextvars.Context())
+            self._timers[session] = task
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return len(batch)
+
+    def pending(self) -> int:
+        return sum(len(batch) for batch in self._batches.values())
+
+    async def flush(self) -> None:
+        """Deliver every buffered batch now."""
+        for session in list(self._batches):
+            timer = self._timers.pop(session, None)
+            if timer is not None:
+                timer.cancel()
+            await self._deliver_batch(session)
+
+    async def _flush_later(self, session: str, first: float) -> None:
+        try:
+            while True:
+                due = min(self._last.get(session, first) + self.window, first + self.max_wait)
+                now = time.monotonic()
+                if now >= due:
+                    break
+                await asyncio.sleep(due - now)
+        finally:
+            if self._timers.get(session) is asyncio.current_task():
+                del self._timers[session]
+        await self._deliver_batch(session)
+
+    async def _deliver_batch(self, session: str) -> None:
+        events = self._batches.pop(session, [])
+        self._last.pop(session, None)
+        if not events:
+            return
+        self.log.info("resolution_batch session=%s events=%s", session, len(events))
+        try:
+            await self._deliver(session, events)
+        except Exception as exc:
+            self.log.warning("resolution_batch_failed session=%s events=%s err=%r", session, len(events), exc)
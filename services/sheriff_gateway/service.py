@@ -1,18 +1,55 @@
 from __future__ import annotations
 
+import asyncio
 import inspect
 import json
 import os
+import time
 import uuid
-from collections import defaultdict, deque
+from collections import OrderedDict
+from services.sheriff_gateway.message_queue import (
+    CANCELLED,
+    DONE,
+    FAILED,
+    GW_QUEUE_KEEP_SEC,
+    GW_QUEUE_MAX_ATTEMPTS,
+    GW_QUEUE_SWEEP_SEC,
+    GW_QUEUE_VISIBILITY_SEC,
+    OPEN_STATUSES,
+    DurableMessageQueue,
+)
+from services.sheriff_gateway.resolution_batcher import ResolutionBatcher, pending_requests, resolution_prompt
+from services.sheriff_gateway.tool_dispatch import ToolDispatcher
+from services.sheriff_gateway.turn_scheduler import (
+    GW_COALESCE,
+    GW_COALESCE_MAX,
+    GW_LANE_KEY,
+    GW_LANE_WEIGHTS,
+    TurnScheduler,
+)
+from services.sheriff_gateway.vault_cache import VaultStateCache
+from services.sheriff_gateway.write_behind import WriteBehindQueue
 from shared.codex_auth import codex_auth_help_text, is_codex_auth_error
 from shared.codex_output import extract_text_content
+from shared.errors import ServiceCrashedError
 from shared.identity import principal_id_for_channel
 from shared.oplog import get_op_logger
 from shared.paths import gw_root
-from shared.proc_rpc import ProcClient
-from shared.session_keys import session_key_for_message
+from shared.rpc_deadline import reset_deadline, set_deadline
+from shared.rpc_pool import pooled_client
+from shared.rpc_trace import current_trace_id
+from shared.session_keys import session_key_for_message, update_idempotency_key
 from shared.transcript import append_jsonl
+from shared.turn_timings import TurnTimer, TurnTimingStore, begin_turn, current_turn, turn_phase
+
+
+# Message fields that decide a session key and where replies for it go.
+SESSION_ORIGIN_KEYS = ("channel", "principal_external_id", "chat_id", "chat_type", "message_thread_id")
+# Open user requests remembered for routing their resolution back to the session that hit them.
+MAX_PENDING_REQUESTS = 1024
+# A memory inbox append that takes longer than this is retried (and eventually dropped) instead of
+# holding up the session's later inbox writes for the client's full request timeout.
+GW_INBOX_APPEND_TIMEOUT_SEC = float(os.environ.get("SHERIFF_GW_INBOX_APPEND_TIMEOUT_SEC", "10"))
 
 
 class SheriffGatewayService:
@@ -40,99 +77,102 @@ class SheriffGatewayService:
     }
 
     def __init__(self) -> None:
-        self.ai = ProcClient("codex-mcp-host", spawn_fallback=False)
-        self.web = ProcClient("sheriff-web", spawn_fallback=False)
-        self.tools = ProcClient("sheriff-tools", spawn_fallback=False)
-        self.secrets = ProcClient("sheriff-secrets", spawn_fallback=False)
-        self.requests = ProcClient("sheriff-requests", spawn_fallback=False)
-        self.tg_gate = ProcClient("sheriff-tg-gate", spawn_fallback=False)
+        self.ai = pooled_client("codex-mcp-host")
+        self.web = pooled_client("sheriff-web")
+        self.tools = pooled_client("sheriff-tools")
+        self.secrets = pooled_client("sheriff-secrets")
+        self.requests = pooled_client("sheriff-requests")
+        # Resolves self.secrets on each call so a swapped client is picked up.
+        self.vault = VaultStateCache(lambda: self.secrets)
+        self.tg_gate = pooled_client("sheriff-tg-gate")
         self.log = get_op_logger("gateway")
+        self.turn_timings = TurnTimingStore()
         self.sessions: set[str] = set()
-        self._queue = defaultdict(deque)
-        self._processing = set()
-        self._queue_cond = None
-        self._queue_paused = False
-        self._queue_pause_reason = ""
-
-    async def _ensure_queue_cond(self):
-        import asyncio
-
-        if self._queue_cond is None:
-            self._queue_cond = asyncio.Condition()
-        return self._queue_cond
+        # Last message routing fields per session, most recently active last.
+        self._session_origins: OrderedDict[str, dict] = OrderedDict()
+        self._request_sessions: OrderedDict[tuple[str, str], str] = OrderedDict()
+        self.resolutions = ResolutionBatcher(self._deliver_resolutions)
+        self.lane_key = GW_LANE_KEY
+        self.turns = TurnScheduler()
+        self.message_queue = DurableMessageQueue(gw_root() / "state" / "message_queue.db")
+        # Lease owner id of this process; leases held under any other id belong to a dead gateway.
+        self.boot_id = uuid.uuid4().hex
+        # Messages some task of this process is waiting on or running.
+        self._inflight: set[int] = set()
+        self._replays: set[asyncio.Task] = set()
+        self._next_prune = 0.0
+        # Inbox capture and transcripts are written behind the turn, in order.
+        self.writes = WriteBehindQueue()
+        # Provider of the last turn; decides whether pre-flight reads the API key too.
+        self._provider_hint = ""
 
     async def _process_message(self, principal_id: str, payload, emit_event):
         text = payload.get("text", "")
 
         session = self._session_key(payload)
-        if session not in self.sessions:
-            await self.ai.request("codex.session.ensure", {"session_key": session, "hydrate": False})
-            self.sessions.add(session)
+        self._session_origins[session] = {k: payload[k] for k in SESSION_ORIGIN_KEYS if payload.get(k) is not None}
+        self._session_origins.move_to_end(session)
 
-        await self.ai.request(
-            "codex.memory.inbox.append",
-            {
-                "session_key": session,
-                "text": text,
-                "channel": payload.get("channel", "cli"),
-                "principal_id": principal_id,
-                "metadata": {
-                    "chat_id": payload.get("chat_id"),
-                    "chat_type": payload.get("chat_type"),
-                    "message_thread_id": payload.get("message_thread_id"),
-                },
-            },
-        )
-
-        append_jsonl(gw_root() / "state" / "transcripts" / f"{session}.jsonl", {"role": "user", "content": text})
+        self._append_inbox(session, principal_id, payload)
+        self._append_transcript(session, {"role": "user", "content": text})
 
         debug_mode = os.environ.get("SHERIFF_DEBUG", "").strip().lower() in {"1", "true", "yes"}
         provider_name = "stub"
         api_key = ""
         base_url = ""
 
-        _, unlocked = await self.secrets.request("secrets.is_unlocked", {})
+        with turn_phase("preflight"):
+            unlocked, prov, key = await self._preflight(session)
         vault_known_locked = unlocked.get("ok") is True and unlocked.get("result", {}).get("unlocked") is False
         if vault_known_locked:
             supplied_mp = (payload.get("master_password") or "").strip()
             if supplied_mp:
-                _, u = await self.secrets.request("secrets.unlock", {"master_password": supplied_mp})
-                if u.get("result", {}).get("ok"):
-                    _, unlocked = await self.secrets.request("secrets.is_unlocked", {})
+                with turn_phase("vault"):
+                    _, u = await self.secrets.request("secrets.unlock", {"master_password": supplied_mp})
+                    self.vault.note_write("secrets.unlock")
+                    if u.get("result", {}).get("ok"):
+                        unlocked = await self.vault.request("secrets.is_unlocked")
+                        # Read while the vault was still locked.
+                        prov = key = None
                     vault_known_locked = unlocked.get("ok") is True and unlocked.get("result", {}).get(
                         "unlocked") is False
             if vault_known_locked:
                 msg = "🔒 Sheriff vault is locked. Run /unlock <master_password> first."
                 await emit_event("assistant.final", {"text": msg})
-                append_jsonl(gw_root() / "state" / "transcripts" / f"{session}.jsonl",
-                             {"role": "assistant", "content": msg})
+                self._append_transcript(session, {"role": "assistant", "content": msg})
                 return {"status": "locked", "session_handle": session}
 
         if unlocked.get("ok") is True and unlocked.get("result", {}).get("unlocked"):
-            _, prov = await self.secrets.request("secrets.get_llm_provider", {})
+            if prov is None:
+                with turn_phase("provider"):
+                    prov = await self.vault.request("secrets.get_llm_provider")
             if not prov.get("ok"):
                 if not debug_mode:
                     msg = "Sheriff could not read LLM provider from vault."
                     await emit_event("assistant.final", {"text": msg})
-                    append_jsonl(gw_root() / "state" / "transcripts" / f"{session}.jsonl",
-                                 {"role": "assistant", "content": msg})
+                    self._append_transcript(session, {"role": "assistant", "content": msg})
                     return {"status": "provider_error", "session_handle": session}
             else:
                 provider_name = prov.get("result", {}).get("provider") or provider_name
+                self._provider_hint = provider_name
                 if provider_name == "openai-codex-chatgpt":
                     # Codex subscription login is managed by the local Codex repo state.
                     api_key = ""
                     if not payload.get("model_ref"):
                         payload["model_ref"] = "gpt-5-codex"
                 elif provider_name == "openai-codex":
-                    _, key = await self.secrets.request("secrets.get_llm_api_key", {})
+                    if key is None:
+                        with turn_phase("provider"):
+                            key = await self.vault.request("secrets.get_llm_api_key")
                     api_key = key.get("result", {}).get("api_key") or ""
                     if not api_key and not debug_mode:
                         msg = "OpenAI API key missing. Run: sheriff configure-llm --provider openai-codex"
                         await emit_event("assistant.final", {"text": msg})
-                        append_jsonl(gw_root() / "state" / "transcripts" / f"{session}.jsonl",
-                                     {"role": "assistant", "content": msg})
+                        self._append_transcript(session, {"role": "assistant", "content": msg})
                         return {"status": "llm_key_missing", "session_handle": session}
+        turn = current_turn()
+        codex_started = time.perf_counter()
+        tool_sec = 0.0
         stream, final = await self.ai.request(
             "codex.session.send",
             {
@@ -150,22 +190,37 @@ class SheriffGatewayService:
         saw_final = False
         delta_parts: list[str] =[]
         event_counts: dict[str, int] = {}
-        async for frame in stream:
-            ev = frame.get("event")
-            event_counts[ev] = event_counts.get(ev, 0) + 1
-            if ev == "tool.call":
-                result = await self._route_tool(principal_id, frame.get("payload", {}))
-                await emit_event("tool.result", result)
-                continue
-            if ev == "assistant.final":
-                saw_final = True
-            elif ev == "assistant.delta":
-                part = str((frame.get("payload") or {}).get("text") or "")
-                if part:
-                    delta_parts.append(part)
-            await emit_event(ev, frame.get("payload", {}))
+        tools = ToolDispatcher(lambda call: self._route_tool(principal_id, call, session=session), emit_event,
+                               in_order=bool(payload.get("tool_results_in_order")))
+        try:
+            async for frame in stream:
+                ev = frame.get("event")
+                if turn is not None and not event_counts:
+                    turn.add("codex_first_event", time.perf_counter() - codex_started)
+                event_counts[ev] = event_counts.get(ev, 0) + 1
+                if ev == "tool.call":
+                    # Only waiting for a free slot holds up the stream; the call itself runs alongside.
+                    tool_started = time.perf_counter()
+                    await tools.submit(frame.get("payload", {}))
+                    tool_sec += time.perf_counter() - tool_started
+                    continue
+                if ev == "assistant.final":
+                    saw_final = True
+                elif ev == "assistant.delta":
+                    part = str((frame.get("payload") or {}).get("text") or "")
+                    if part:
+                        delta_parts.append(part)
+                await emit_event(ev, frame.get("payload", {}))
+            tool_started = time.perf_counter()
+            await tools.drain()
+            tool_sec += time.perf_counter() - tool_started
+        finally:
+            await tools.cancel()
 
         final_res = await final if inspect.isawaitable(final) else final
+        if turn is not None:
+            # Time Codex spent waiting on our tool routing is host time, not model time.
+            turn.add("codex", time.perf_counter() - codex_started - tool_sec)
         if isinstance(final_res, dict) and isinstance(final_res.get("result"), dict):
             final_payload = final_res.get("result", {})
         elif isinstance(final_res, dict):
@@ -198,8 +253,7 @@ class SheriffGatewayService:
                 msg = f"AI worker error: {err}"
                 status = "ai_error"
             await emit_event("assistant.final", {"text": msg})
-            append_jsonl(gw_root() / "state" / "transcripts" / f"{session}.jsonl",
-                         {"role": "assistant", "content": msg})
+            self._append_transcript(session, {"role": "assistant", "content": msg})
             return {"status": status, "session_handle": session}
 
         if not saw_final:
@@ -220,46 +274,309 @@ class SheriffGatewayService:
             else:
                 msg = "AI produced no final response."
             await emit_event("assistant.final", {"text": msg})
-            append_jsonl(gw_root() / "state" / "transcripts" / f"{session}.jsonl",
-                         {"role": "assistant", "content": msg})
+            self._append_transcript(session, {"role": "assistant", "content": msg})
 
         return {"status": "done", "session_handle": session}
 
+    async def _preflight(self, session: str) -> tuple[dict, dict, dict | None]:
+        """Open the Codex session and read vault state at once, ahead of codex.session.send.
+
+        The provider (and, when the last turn's provider needed one, the API key) is read up front
+        only when the cache already knows the vault is unlocked: those reads fail on a locked vault.
+        Otherwise they come back as None and are read after the unlock check.
+        """
+
+        async def _ensure():
+            if session in self.sessions:
+                return
+            with turn_phase("session_ensure"):
+                await self.ai.request("codex.session.ensure", {"session_key": session, "hydrate": False})
+            self.sessions.add(session)
+
+        async def _read(phase: str, op: str) -> dict:
+            with turn_phase(phase):
+                return await self.vault.request(op)
+
+        reads = [_read("vault", "secrets.is_unlocked")]
+        if self.vault.known_unlocked():
+            reads.append(_read("provider", "secrets.get_llm_provider"))
+            if self._provider_hint == "openai-codex":
+                reads.append(_read("provider", "secrets.get_llm_api_key"))
+        _, unlocked, *config = await asyncio.gather(_ensure(), *reads)
+        config += [None] * (2 - len(config))
+        return unlocked, config[0], config[1]
+
+    def _append_inbox(self, session: str, principal_id: str, payload: dict) -> None:
+        entry = {
+            "session_key": session,
+            "text": payload.get("text", ""),
+            "channel": payload.get("channel", "cli"),
+            "principal_id": principal_id,
+            "metadata": {
+                "chat_id": payload.get("chat_id"),
+                "chat_type": payload.get("chat_type"),
+                "message_thread_id": payload.get("message_thread_id"),
+                **({"coalesced": payload["coalesced"]} if payload.get("coalesced") else {}),
+            },
+        }
+
+        async def _write():
+            token = set_deadline(time.time() + GW_INBOX_APPEND_TIMEOUT_SEC)
+            try:
+                _, res = await self.ai.request("codex.memory.inbox.append", entry)
+            finally:
+                reset_deadline(token)
+            if isinstance(res, dict) and res.get("ok") is False:
+                raise RuntimeError(res.get("error") or "inbox append failed")
+
+        self.writes.submit(f"inbox:{session}", _write)
+
+    def _append_transcript(self, session: str, row: dict) -> None:
+        path = gw_root() / "state" / "transcripts" / f"{session}.jsonl"
+        self.writes.submit(f"transcript:{session}", lambda: append_jsonl(path, row))
+
     def _session_key(self, payload: dict) -> str:
         return session_key_for_message(str(payload.get("channel", "cli")), payload)
 
+    def _lane_for(self, principal_id: str, payload: dict) -> str:
+        if self.lane_key == "principal":
+            return principal_id
+        return self._session_key(payload)
+
     async def handle_user_message(self, payload, emit_event, req_id):
         channel = payload.get("channel", "cli")
         principal_id = principal_id_for_channel(channel, payload["principal_external_id"])
-        queue_id = str(uuid.uuid4())
-        append_jsonl(gw_root() / "state" / "message_queue.jsonl",
-                     {"event": "enqueue", "principal_id": principal_id, "queue_id": queue_id,
-                      "text": payload.get("text", "")})
-
-        cond = await self._ensure_queue_cond()
-        async with cond:
-            self._queue[principal_id].append(queue_id)
-            while True:
-                is_head = self._queue[principal_id] and self._queue[principal_id][0] == queue_id
-                busy = principal_id in self._processing
-                if is_head and not busy and not self._queue_paused:
-                    self._processing.add(principal_id)
-                    break
-                await cond.wait()
+        row, created = self.message_queue.enqueue(self._idempotency_key(payload), principal_id, str(channel),
+                                                  payload, owner=self.boot_id, visibility=GW_QUEUE_VISIBILITY_SEC)
+        if not created and row["status"] == CANCELLED:
+            # Its earlier caller gave up; whoever sends it again gets it run.
+            row = self.message_queue.requeue(row["id"], owner=self.boot_id, visibility=GW_QUEUE_VISIBILITY_SEC)
+        if not created and (row["status"] not in OPEN_STATUSES or row["id"] in self._inflight):
+            self.log.info("duplicate_message queue_id=%s key=%s status=%s", row["id"], row["idem_key"], row["status"])
+            return {"status": "duplicate", "queue_id": row["id"], "original_status": row["status"]}
+        # A redelivered key whose first copy an earlier process never finished is simply run here.
+        with begin_turn() as turn:
+            return await self._run_turn(row["id"], principal_id, payload, emit_event, turn)
+
+    def _idempotency_key(self, payload: dict) -> str:
+        explicit = str(payload.get("idempotency_key") or "").strip()
+        if explicit:
+            return explicit
+        if payload.get("update_id") is not None and payload.get("chat_id") is not None:
+            return update_idempotency_key(str(payload.get("channel", "cli")), payload["chat_id"], payload["update_id"])
+        return f"msg:{uuid.uuid4()}"
+
+    async def _run_turn(self, queue_id: int, principal_id: str, payload, emit_event, turn: TurnTimer):
+        self._inflight.add(queue_id)
+        # False once an absorbed message's caller leaves: the leader's turn still holds the message.
+        owned = True
+        try:
+            queued = time.perf_counter()
+            channel = str(payload.get("channel", "cli"))
+            entry = {"queue_id": queue_id, "principal_id": principal_id, "payload": payload,
+                     "done": asyncio.get_running_loop().create_future()}
+            ticket = await self.turns.acquire(self._lane_for(principal_id, payload), GW_LANE_WEIGHTS.get(channel, 1),
+                                              data=entry)
+            turn.add("queue_wait", time.perf_counter() - queued)
+            if ticket.leader is not None:
+                # Answered as part of an earlier message's turn (burst coalescing).
+                try:
+                    out = await asyncio.shield(entry["done"])
+                except asyncio.CancelledError:
+                    # Keep its lease extended until the leader's turn settles it.
+                    owned = False
+                    entry["done"].add_done_callback(lambda _done: self._inflight.discard(queue_id))
+                    raise
+                self._record_turn(turn, principal_id, payload, "coalesced")
+                return out
+            status = "error"
+            burst: list[dict] = []
+            try:
+                claimed = self.message_queue.claim(queue_id, owner=self.boot_id, visibility=GW_QUEUE_VISIBILITY_SEC,
+                                                   max_attempts=GW_QUEUE_MAX_ATTEMPTS)
+                if claimed is None:
+                    status = "duplicate"
+                    return {"status": "duplicate", "queue_id": queue_id}
+                if GW_COALESCE:
+                    burst = self._absorb_burst(ticket, payload)
+                run_payload = self._coalesced_payload(payload, burst) if burst else payload
+                try:
+                    out = await self._process_message(principal_id, run_payload, emit_event)
+                except Exception as exc:
+                    for qid in [queue_id, *(item["queue_id"] for item in burst)]:
+                        self.message_queue.finish(qid, FAILED, error=repr(exc))
+                    self._settle_burst(burst, exc=exc)
+                    raise
+                except asyncio.CancelledError:
+                    for item in burst:
+                        self.message_queue.cancel(item["queue_id"], owner=self.boot_id)
+                    raise
+                if isinstance(out, dict):
+                    status = str(out.get("status") or "done")
+                self.message_queue.finish(queue_id, DONE, result=out if isinstance(out, dict) else None)
+                for item in burst:
+                    self.message_queue.finish(item["queue_id"], DONE,
+                                              result={"status": "coalesced", "into": queue_id})
+                self._settle_burst(burst, out={"status": "coalesced", "into": queue_id,
+                                               "session_handle": (out or {}).get("session_handle")})
+                return out
+            finally:
+                self._settle_burst(burst, exc=ServiceCrashedError("coalesced turn was interrupted"))
+                self.turns.release(ticket)
+                self._record_turn(turn, principal_id, payload, status)
+        except asyncio.CancelledError:
+            # The caller gave up (cancel, deadline, disconnect): don't run it again behind its back.
+            # Only a process that dies mid-turn leaves its messages open for replay.
+            if owned:
+                self.message_queue.cancel(queue_id, owner=self.boot_id)
+            raise
+        finally:
+            if owned:
+                self._inflight.discard(queue_id)
 
+    def _absorb_burst(self, ticket, payload: dict) -> list[dict]:
+        """Take over the messages of the same session queued right behind this one."""
+        session = self._session_key(payload)
+
+        def _accept(follower) -> bool:
+            other = (follower.data or {}).get("payload") or {}
+            return (other.get("channel", "cli") == payload.get("channel", "cli")
+                    and other.get("principal_external_id") == payload.get("principal_external_id")
+                    and other.get("model_ref") == payload.get("model_ref")
+                    and not other.get("master_password")
+                    and self._session_key(other) == session)
+
+        burst = []
+        for follower in self.turns.absorb(ticket, GW_COALESCE_MAX - 1, _accept):
+            item = follower.data
+            if self.message_queue.claim(item["queue_id"], owner=self.boot_id, visibility=GW_QUEUE_VISIBILITY_SEC,
+                                        max_attempts=GW_QUEUE_MAX_ATTEMPTS) is None:
+                self._settle_burst([item], out={"status": "duplicate", "queue_id": item["queue_id"]})
+                continue
+            burst.append(item)
+        if burst:
+            self.log.info("coalesced_burst session=%s messages=%s", session, 1 + len(burst))
+        return burst
+
+    @staticmethod
+    def _coalesced_payload(payload: dict, burst: list[dict]) -> dict:
+        messages = [payload, *(item["payload"] for item in burst)]
+        parts = [f"[{len(messages)} messages sent in a row; answer them together]"]
+        for i, message in enumerate(messages, 1):
+            parts.append(f"--- message {i} ---\n{message.get('text', '')}")
+        return {
+            **payload,
+            "text": "\n\n".join(parts),
+            "coalesced": [
+                {key: message.get(key) for key in ("text", "update_id", "message_thread_id", "idempotency_key")
+                 if message.get(key) is not None}
+                for message in messages
+            ],
+        }
+
+    @staticmethod
+    def _settle_burst(burst: list[dict], *, out: dict | None = None, exc: BaseException | None = None) -> None:
+        for item in burst:
+            done = item["done"]
+            if done.done():
+                continue
+            if exc is not None:
+                done.set_exception(exc)
+                # Nobody may be left waiting on it (the caller gave up); don't log it as unretrieved.
+                done.exception()
+            else:
+                done.set_result(out)
+
+    async def run_queue_forever(self):
+        """Replay messages an earlier process left open, then keep leases fresh and redrive expired ones."""
+        self.log.info("message_queue boot owner=%s counts=%s", self.boot_id, self.message_queue.counts())
+        while True:
+            try:
+                self._sweep_queue()
+            except Exception as exc:
+                self.log.warning("message_queue_sweep_failed err=%s", exc)
+            await asyncio.sleep(GW_QUEUE_SWEEP_SEC)
+
+    def _sweep_queue(self) -> None:
+        self.message_queue.extend(self._inflight, owner=self.boot_id, visibility=GW_QUEUE_VISIBILITY_SEC)
+        for row in self.message_queue.reclaimable(owner=self.boot_id):
+            if row["id"] in self._inflight:
+                continue
+            if not self._can_reply(row):
+                # Its caller went away with the old process and there is no channel to answer on.
+                self.message_queue.finish(row["id"], FAILED, error="abandoned: no channel to deliver a replay on")
+                continue
+            self._inflight.add(row["id"])
+            task = asyncio.create_task(self._replay(row))
+            self._replays.add(task)
+            task.add_done_callback(self._replays.discard)
+        if time.monotonic() >= self._next_prune:
+            self._next_prune = time.monotonic() + 3600
+            self.message_queue.prune(GW_QUEUE_KEEP_SEC)
+
+    async def _replay(self, row: dict) -> None:
+        """Run a recovered message with nobody waiting on it and deliver the reply over its channel."""
+        payload = row["payload"]
+        replies: list[str] = []
+        deltas: list[str] = []
+
+        async def _collect(ev, p):
+            text = str((p or {}).get("text") or "")
+            if ev == "assistant.final" and text:
+                replies.append(text)
+            elif ev == "assistant.delta" and text:
+                deltas.append(text)
+
+        self.log.info("message_replay queue_id=%s key=%s attempts=%s", row["id"], row["idem_key"], row["attempts"])
         try:
-            out = await self._process_message(principal_id, payload, emit_event)
-            append_jsonl(gw_root() / "state" / "message_queue.jsonl",
-                         {"event": "dequeue", "principal_id": principal_id, "queue_id": queue_id})
-            return out
+            with begin_turn() as turn:
+                out = await self._run_turn(row["id"], row["principal_id"], payload, _collect, turn)
+        except Exception as exc:
+            self.log.warning("message_replay_failed queue_id=%s err=%s", row["id"], exc)
+            return
         finally:
-            async with cond:
-                if self._queue[principal_id] and self._queue[principal_id][0] == queue_id:
-                    self._queue[principal_id].popleft()
-                self._processing.discard(principal_id)
-                cond.notify_all()
+            self._inflight.discard(row["id"])
+        if isinstance(out, dict) and out.get("status") == "duplicate":
+            return
+        reply = replies[-1] if replies else "".join(deltas).strip()
+        if reply and self._can_reply(row):
+            await self._send_llm_telegram(reply, chat_id=payload["chat_id"],
+                                          message_thread_id=payload.get("message_thread_id"))
+
+    @staticmethod
+    def _can_reply(row: dict) -> bool:
+        return row["channel"] == "telegram" and (row["payload"] or {}).get("chat_id") is not None
 
-    async def _route_tool(self, principal_id: str, tool_call: dict) -> dict:
+    def _record_turn(self, turn: TurnTimer, principal_id: str, payload: dict, status: str) -> None:
+        try:
+            self.turn_timings.append(turn.row(
+                principal_id=principal_id,
+                channel=payload.get("channel", "cli"),
+                session=self._session_key(payload),
+                status=status,
+                trace_id=current_trace_id(),
+            ))
+        except Exception as exc:
+            self.log.warning("turn_timing_write_failed principal=%s err=%s", principal_id, exc)
+
+    async def _route_tool(self, principal_id: str, tool_call: dict, session: str | None = None) -> dict:
+        started = time.perf_counter()
+        try:
+            result = await self._route_tool_call(principal_id, tool_call)
+            if session is not None:
+                for request_key in pending_requests(str(tool_call.get("tool_name") or ""),
+                                                    tool_call.get("payload") or {}, result):
+                    self._request_sessions[request_key] = session
+                    self._request_sessions.move_to_end(request_key)
+                while len(self._request_sessions) > MAX_PENDING_REQUESTS:
+                    self._request_sessions.popitem(last=False)
+            return result
+        finally:
+            turn = current_turn()
+            if turn is not None:
+                turn.add_tool(str(tool_call.get("tool_name") or "?"), time.perf_counter() - started)
+
+    async def _route_tool_call(self, principal_id: str, tool_call: dict) -> dict:
         tool_name = tool_call.get("tool_name")
         payload = tool_call.get("payload", {})
         if tool_name == "secure.web.request":
@@ -282,19 +599,15 @@ class SheriffGatewayService:
         return {"status": "error", "error": f"unsupported tool {tool_name}"}
 
     async def queue_control(self, payload, emit_event, req_id):
-        cond = await self._ensure_queue_cond()
-        pause = bool(payload.get("pause", False))
-        reason = payload.get("reason", "")
-        async with cond:
-            self._queue_paused = pause
-            self._queue_pause_reason = reason if pause else ""
-            cond.notify_all()
-        return {"ok": True, "paused": self._queue_paused, "reason": self._queue_pause_reason}
+        if payload.get("pause", False):
+            self.turns.pause(payload.get("reason", ""))
+        else:
+            self.turns.resume()
+        return {"ok": True, "paused": self.turns.paused, "reason": self.turns.pause_reason}
 
     async def queue_status(self, payload, emit_event, req_id):
-        pending = sum(len(v) for v in self._queue.values())
-        return {"paused": self._queue_paused, "pause_reason": self._queue_pause_reason,
-                "processing": len(self._processing), "pending": pending}
+        return {**self.turns.status(), "lane_key": self.lane_key, "durable": self.message_queue.counts(),
+                "resolutions_pending": self.resolutions.pending(), "write_behind": self.writes.status()}
 
     async def verify_master_password(self, payload, emit_event, req_id):
         master_password = payload.get("master_password") or ""
@@ -307,27 +620,32 @@ class SheriffGatewayService:
             return {"ok": False, "error": "op_not_allowed", "op": op}
         req_payload = payload.get("payload") or {}
         _, res = await self.secrets.request(op, req_payload)
+        self.vault.note_write(op)
         return {"ok": bool(res.get("ok", True)), "result": res.get("result", {}), "error": res.get("error")}
 
-    async def _send_llm_telegram(self, text: str):
+    async def _send_llm_telegram(self, text: str, *, chat_id=None, message_thread_id=None):
         _, res = await self.secrets.request("secrets.get_llm_bot_token", {})
         token = res.get("result", {}).get("token", "")
         if not token:
             return
 
-        _, st = await self.secrets.request("secrets.activation.status", {"bot_role": "llm"})
-        user_id = st.get("result", {}).get("user_id")
-        if not user_id:
-            return
+        if chat_id is None:
+            _, st = await self.secrets.request("secrets.activation.status", {"bot_role": "llm"})
+            user_id = st.get("result", {}).get("user_id")
+            if not user_id:
+                return
+            chat_id = int(str(user_id).strip())
 
         import requests
-        import asyncio
 
         def _post_chunk(chunk):
+            body = {"chat_id": chat_id, "text": chunk, "disable_web_page_preview": True}
+            if message_thread_id is not None:
+                body["message_thread_id"] = message_thread_id
             try:
                 requests.post(
                     f"https://api.telegram.org/bot{token}/sendMessage",
-                    json={"chat_id": int(str(user_id).strip()), "text": chunk, "disable_web_page_preview": True},
+                    json=body,
                     timeout=10
                 )
             except Exception:
@@ -338,58 +656,45 @@ class SheriffGatewayService:
             chunk = text[i:i+MAX_LEN]
             await asyncio.to_thread(_post_chunk, chunk)
 
+    def _resolution_session(self, payload: dict) -> str | None:
+        if payload.get("session_key"):
+            return str(payload["session_key"])
+        session = self._request_sessions.pop((str(payload.get("type")), str(payload.get("key"))), None)
+        if session is not None:
+            return session
+        if self._session_origins:
+            return next(reversed(self._session_origins))
+        return next(iter(self.sessions), None)
+
     async def notify_request_resolved(self, payload, emit_event, req_id):
-        if not self.sessions:
+        session_handle = self._resolution_session(payload)
+        if session_handle is None:
             return {"status": "no_session"}
-        session_handle = next(iter(self.sessions))
         result = {"type": payload.get("type"), "key": payload.get("key"), "status": payload.get("status")}
-        append_jsonl(
-            gw_root() / "state" / "transcripts" / f"{session_handle}.jsonl",
-            {"role": "tool", "name": "requests.resolved", "content": result},
-            )
+        self._append_transcript(session_handle, {"role": "tool", "name": "requests.resolved", "content": result})
+        batched = self.resolutions.add(session_handle, result)
+        return {"status": "notified", "session_handle": session_handle, "batched": batched}
+
+    async def _deliver_resolutions(self, session: str, events: list[dict]) -> None:
+        """Wake the agent once, in the session that raised them, for a batch of resolved requests."""
+        origin = self._session_origins.get(session)
+        if origin:
+            message = dict(origin)
+        else:
+            _, st = await self.secrets.request("secrets.activation.status", {"bot_role": "llm"})
+            message = {"channel": "telegram", "principal_external_id": st.get("result", {}).get("user_id") or "system"}
+        message["text"] = resolution_prompt(events)
+        reply_to = {}
+        if message.get("channel") == "telegram" and message.get("chat_id") is not None:
+            reply_to = {"chat_id": message["chat_id"], "message_thread_id": message.get("message_thread_id")}
 
         async def _emit(ev, p):
             if ev == "assistant.final":
                 text = p.get("text")
                 if text:
-                    await self._send_llm_telegram(text)
-
-        _, st = await self.secrets.request("secrets.activation.status", {"bot_role": "llm"})
-        user_id = st.get("result", {}).get("user_id") or "system"
-
-        req_type = payload.get("type")
-        key = payload.get("key")
-        status = payload.get("status")
-        if req_type == "secret" and status == "approved":
-            intro = f'Sheriff: user provided secret "{key}". Retry the blocked work if it is still needed.'
-        elif req_type == "secret" and status == "denied":
-            intro = f'Sheriff: user denied secret "{key}". Do not assume you can use it.'
-        elif req_type == "tool" and status == "approved":
-            intro = f'Sheriff: user approved tool "{key}". Retry the blocked command if it is still needed.'
-        elif req_type == "tool" and status == "denied":
-            intro = f'Sheriff: user denied tool "{key}". Choose another approach.'
-        else:
-            intro = "Sheriff: a request resolution event occurred."
-
-        trigger_msg = (
-            f"{intro}\n\n"
-            "Review repo state and continue the task appropriately.\n\n"
-            "## Request Resolution Event\n"
-            f"- type: {req_type}\n"
-            f"- key: {key}\n"
-            f"- status: {status}\n"
-        )
-
-        import asyncio
-        asyncio.create_task(
-            self.handle_user_message(
-                {"channel": "telegram", "principal_external_id": user_id, "text": trigger_msg},
-                _emit,
-                f"sys-trigger-{uuid.uuid4()}"
-            )
-        )
+                    await self._send_llm_telegram(text, **reply_to)
 
-        return {"status": "notified", "session_handle": session_handle}
+        await self.handle_user_message(message, _emit, f"sys-trigger-{uuid.uuid4()}")
 
     async def reset_session(self, payload, emit_event, req_id):
         session = str(payload.get("session_id") or self._session_key(payload))
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import Awaitable, Callable
+
+# Tool calls of one turn routed at the same time; later calls wait for a free slot.
+GW_TOOL_CONCURRENCY = max(1, int(os.environ.get("SHERIFF_GW_TOOL_CONCURRENCY", "4")))
+
+
+class ToolDispatcher:
+    """Routes the tool calls of one turn concurrently, at most `limit` at a time.
+
+    Each result goes out as a tool.result event tagged with its call_id: as soon as it is ready,
+    or with `in_order`, once the results of all earlier calls are out. A call that raises fails
+    the turn from drain(), like a serially routed call would have.
+    """
+
+    def __init__(self, route: Callable[[dict], Awaitable[dict]], emit_event, *, limit: int = GW_TOOL_CONCURRENCY,
+                 in_order: bool = False):
+        self._route = route
+        self._emit = emit_event
+        self._slots = asyncio.Semaphore(max(1, int(limit)))
+        self.in_order = in_order
+        self._tasks: list[asyncio.Task] = []
+        self._ready: dict[int, dict | None] = {}
+        self._next = 0
+        self._emitting = asyncio.Lock()
+
+    async def submit(self, tool_call: dict) -> None:
+        """Start routing `tool_call`; blocks only while `limit` calls are already running."""
+        await self._slots.acquire()
+        seq = len(self._tasks)
+        call_id = str(tool_call.get("call_id") or f"call-{seq + 1}")
+        self._tasks.append(asyncio.create_task(self._run(seq, call_id, tool_call)))
+
+    async def drain(self) -> None:
+        """Wait for every submitted call and its tool.result event."""
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            await self.cancel()
+
+    async def cancel(self) -> None:
+        """Stop the calls still running and wait for them; their failures are collected, not raised."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run(self, seq: int, call_id: str, tool_call: dict) -> None:
+        try:
+            result = await self._route(tool_call)
+        except Exception:
+            await self._deliver(seq, None)
+            raise
+        finally:
+            self._slots.release()
+        payload = {**result, "call_id": call_id} if isinstance(result, dict) else {"result": result,
+                                                                                    "call_id": call_id}
+        await self._deliver(seq, payload)
+
+    async def _deliver(self, seq: int, payload: dict | None) -> None:
+        async with self._emitting:
+            if not self.in_order:
+                if payload is not None:
+                    await self._emit("tool.result", payload)
+                return
+            # A failed call leaves a gap (None) so the results after it are not held back.
+            self._ready[seq] = payload
+            while self._next in self._ready:
+                item = self._ready.pop(self._next)
+                self._next += 1
+                if item is not None:
+                    await self._emit("tool.result", item)
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from collections import deque
+
+LANE_KEYS = ("principal", "session")
+
+
+def _lane_key_setting() -> str:
+    value = os.environ.get("SHERIFF_GW_LANE_KEY", "session").strip().lower()
+    return value if value in LANE_KEYS else "session"
+
+
+def _parse_weights(raw: str) -> dict[str, int]:
+    weights: dict[str, int] = {}
+    for part in raw.split(","):
+        name, _, value = part.partition("=")
+        try:
+            weight = int(value)
+        except ValueError:
+            continue
+        if name.strip() and weight > 0:
+            weights[name.strip()] = weight
+    return weights
+
+
+# Lane key: "session" lets different chats and group topics of one principal run in parallel,
+# "principal" serializes everything a principal sends.
+GW_LANE_KEY = _lane_key_setting()
+# Turns running at once across all lanes; size it to what the Codex host can serve.
+GW_MAX_TURNS = max(1, int(os.environ.get("SHERIFF_GW_MAX_TURNS", "4")))
+# Per-channel round-robin weights, e.g. "telegram=2,cli=1"; unlisted channels weigh 1.
+GW_LANE_WEIGHTS = _parse_weights(os.environ.get("SHERIFF_GW_LANE_WEIGHTS", ""))
+# Answer messages of one session that queued up behind a running turn together, in one turn.
+GW_COALESCE = os.environ.get("SHERIFF_GW_COALESCE", "0").strip().lower() in {"1", "true", "yes", "on"}
+GW_COALESCE_MAX = max(1, int(os.environ.get("SHERIFF_GW_COALESCE_MAX", "8")))
+
+
+class TurnTicket:
+    __slots__ = ("lane", "weight", "data", "granted", "leader", "_future")
+
+    def __init__(self, lane: str, weight: int, future: asyncio.Future, data=None):
+        self.lane = lane
+        self.weight = weight
+        # Caller's own context for the queued work (seen by absorb() predicates).
+        self.data = data
+        self.granted = False
+        # Set when another ticket's turn took this one's work over; no slot is held then.
+        self.leader: TurnTicket | None = None
+        self._future = future
+
+
+class _Lane:
+    __slots__ = ("waiting", "running", "credits")
+
+    def __init__(self) -> None:
+        self.waiting: deque[TurnTicket] = deque()
+        self.running = False
+        self.credits = 0
+
+
+class TurnScheduler:
+    """FIFO lanes served weighted round-robin under a global cap on running turns.
+
+    One turn runs per lane at a time. A grant resolves only the chosen ticket's future, so a
+    finished turn wakes exactly the waiter that takes its slot. A lane that gets a slot keeps its
+    place at the head of the rotation for `weight` grants in a row before moving to the back.
+    """
+
+    def __init__(self, max_concurrent: int = GW_MAX_TURNS):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.paused = False
+        self.pause_reason = ""
+        self.running = 0
+        self._lanes: dict[str, _Lane] = {}
+        # Lanes with waiters and nothing running, in service order.
+        self._ready: deque[str] = deque()
+
+    async def acquire(self, lane: str, weight: int = 1, data=None) -> TurnTicket:
+        ticket = TurnTicket(lane, max(1, int(weight)), asyncio.get_running_loop().create_future(), data)
+        state = self._lanes.get(lane)
+        if state is None:
+            state = self._lanes[lane] = _Lane()
+        state.waiting.append(ticket)
+        if not state.running and len(state.waiting) == 1:
+            self._ready.append(lane)
+        self._dispatch()
+        try:
+            await ticket._future
+        except BaseException:
+            # Cancelled (caller gave up) or past its deadline while queued: leave the lane so later
+            # turns are not stuck behind it, and hand on a slot granted in the meantime.
+            if ticket.granted:
+                self.release(ticket)
+            else:
+                self._withdraw(ticket)
+            raise
+        return ticket
+
+    def release(self, ticket: TurnTicket) -> None:
+        if not ticket.granted:
+            return
+        ticket.granted = False
+        self.running -= 1
+        state = self._lanes.get(ticket.lane)
+        if state is not None:
+            state.running = False
+            if state.waiting:
+                if state.credits > 0:
+                    self._ready.appendleft(ticket.lane)
+                else:
+                    self._ready.append(ticket.lane)
+            else:
+                del self._lanes[ticket.lane]
+        self._dispatch()
+
+    def absorb(self, ticket: TurnTicket, limit: int, accept) -> list[TurnTicket]:
+        """Hand up to `limit` tickets queued right behind granted `ticket` in its lane over to it.
+
+        Stops at the first waiter `accept` rejects so the lane stays FIFO. Absorbed tickets return
+        from acquire() with `leader` set and without a slot of their own.
+        """
+        state = self._lanes.get(ticket.lane)
+        taken: list[TurnTicket] = []
+        if not ticket.granted or state is None:
+            return taken
+        while state.waiting and len(taken) < limit:
+            follower = state.waiting[0]
+            if not follower._future.done() and not accept(follower):
+                break
+            state.waiting.popleft()
+            if follower._future.done():
+                continue
+            follower.leader = ticket
+            follower._future.set_result(None)
+            taken.append(follower)
+        return taken
+
+    def pause(self, reason: str = "") -> None:
+        self.paused = True
+        self.pause_reason = reason
+
+    def resume(self) -> None:
+        self.paused = False
+        self.pause_reason = ""
+        self._dispatch()
+
+    def _withdraw(self, ticket: TurnTicket) -> None:
+        state = self._lanes.get(ticket.lane)
+        if state is None:
+            return
+        try:
+            state.waiting.remove(ticket)
+        except ValueError:
+            return
+        if not state.waiting and not state.running:
+            del self._lanes[ticket.lane]
+            try:
+                self._ready.remove(ticket.lane)
+            except ValueError:
+                pass
+
+    def _dispatch(self) -> None:
+        while not self.paused and self.running < self.max_concurrent and self._ready:
+            lane = self._ready.popleft()
+            state = self._lanes[lane]
+            ticket = state.waiting.popleft()
+            if ticket._future.done():
+                # Cancelled but its acquire() has not run its cleanup yet.
+                if state.waiting:
+                    self._ready.appendleft(lane)
+                elif not state.running:
+                    del self._lanes[lane]
+                continue
+            if state.credits <= 0:
+                state.credits = ticket.weight
+            state.credits -= 1
+            state.running = True
+            self.running += 1
+            ticket.granted = True
+            ticket._future.set_result(None)
+
+    def waiting(self) -> int:
+        return sum(len(state.waiting) for state in self._lanes.values())
+
+    def status(self) -> dict:
+        return {
+            "paused": self.paused,
+            "pause_reason": self.pause_reason,
+            "processing": self.running,
+            "waiting": self.waiting(),
+            "pending": self.running + self.waiting(),
+            "max_concurrent": self.max_concurrent,
+            "lanes": len(self._lanes),
+        }
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import os
+import time
+from typing import Callable
+
+from shared.errors import ServiceCrashedError
+from shared.oplog import get_op_logger
+
+# Which cached read each secrets.watch key invalidates.
+KEY_OPS = {
+    "unlocked": "secrets.is_unlocked",
+    "llm_provider": "secrets.get_llm_provider",
+    "llm_api_key": "secrets.get_llm_api_key",
+}
+
+# Writes the gateway issues itself; dropped locally at once instead of waiting for the push.
+WRITE_KEYS = {
+    "secrets.initialize": tuple(KEY_OPS),
+    "secrets.unlock": ("unlocked",),
+    "secrets.lock": ("unlocked",),
+    "secrets.set_llm_provider": ("llm_provider",),
+    "secrets.set_llm_api_key": ("llm_api_key",),
+}
+
+WATCH_RETRY_MAX_SEC = float(os.environ.get("SHERIFF_SECRETS_WATCH_RETRY_MAX_SEC", "30"))
+# After the service turns the watch down (e.g. it predates secrets.watch), try again this much later.
+WATCH_DISABLED_SEC = float(os.environ.get("SHERIFF_SECRETS_WATCH_DISABLED_SEC", "60"))
+
+
+class VaultStateCache:
+    """Read-through cache of vault unlock state and LLM provider config.
+
+    Entries are served only while a secrets.watch stream is open, so every invalidation the
+    secrets service pushes is seen; without a live stream each read goes to the service.
+    """
+
+    def __init__(self, client: Callable[[], object]):
+        self._client = client
+        self.log = get_op_logger("gateway")
+        self._entries: dict[str, dict] = {}
+        self._generation = 0
+        self._cursor: dict | None = None
+        self._live = False
+        self._task: asyncio.Task | None = None
+        self._retry_at = 0.0
+
+    @property
+    def live(self) -> bool:
+        return self._live
+
+    async def request(self, op: str) -> dict:
+        self._ensure_watch()
+        if self._live and op in self._entries:
+            return self._entries[op]
+        generation = self._generation
+        _, frame = await self._client().request(op, {})
+        # A change pushed while this read was in flight may postdate its answer: don't keep it.
+        if self._live and generation == self._generation and isinstance(frame, dict) and frame.get("ok") is True:
+            self._entries[op] = frame
+        return frame
+
+    def known_unlocked(self) -> bool:
+        """Whether the live cache already holds an unlocked answer, so config reads can be sent
+        alongside the unlock check instead of after it."""
+        frame = self._entries.get("secrets.is_unlocked") if self._live else None
+        return isinstance(frame, dict) and (frame.get("result") or {}).get("unlocked") is True
+
+    def invalidate(self, keys=None) -> None:
+        self._generation += 1
+        if not keys:
+            self._entries.clear()
+            return
+        for key in keys:
+            op = KEY_OPS.get(str(key))
+            if op is None:
+                self._entries.clear()
+                return
+            self._entries.pop(op, None)
+
+    def note_write(self, op: str) -> None:
+        keys = WRITE_KEYS.get(op)
+        if keys:
+            self.invalidate(keys)
+
+    def _ensure_watch(self) -> None:
+        task = self._task
+        loop = asyncio.get_running_loop()
+        if task is not None and not task.done() and task.get_loop() is loop:
+            return
+        if time.monotonic() < self._retry_at:
+            return
+        self._live = False
+        # Clean context: the watch outlives the request that starts it and must not inherit its
+        # deadline or trace span.
+        self._task = loop.create_task(self._watch(), context=contextvars.Context())
+
+    def _apply_cursor(self, data: dict) -> None:
+        cursor = {"epoch": data.get("epoch"), "version": data.get("version")}
+        if cursor != self._cursor:
+            self.invalidate()
+        self._cursor = cursor
+
+    async def _watch(self) -> None:
+        failures = 0
+        while True:
+            try:
+                stream, final = await self._client().request("secrets.watch", {}, stream_events=True)
+                async for frame in stream:
+                    data = frame.get("payload") or {}
+                    if frame.get("event") == "secrets.watching":
+                        # Same cursor as the last stream: nothing changed in between, keep the entries.
+                        self._apply_cursor(data)
+                        self._live = True
+                        failures = 0
+                    elif frame.get("event") == "secrets.changed":
+                        self.invalidate(data.get("keys"))
+                        self._cursor = {"epoch": data.get("epoch"), "version": data.get("version")}
+                res = await final
+                if not res.get("ok"):
+                    if res.get("error_type") == "unknown_op":
+                        self._stop(f"unsupported: {res.get('error')}")
+                        return
+                    failures += 1
+            except ServiceCrashedError as exc:
+                failures += 1
+                self.log.info("secrets_watch_lost failures=%s err=%s", failures, exc)
+            except asyncio.CancelledError:
+                self._live = False
+                raise
+            except Exception as exc:
+                self._stop(repr(exc))
+                return
+            self._live = False
+            if failures:
+                await asyncio.sleep(min(WATCH_RETRY_MAX_SEC, 0.5 * 2 ** (failures - 1)))
+
+    def _stop(self, reason: str) -> None:
+        self._live = False
+        self.invalidate()
+        self._retry_at = time.monotonic() + WATCH_DISABLED_SEC
+        self.log.warning("secrets_watch_disabled retry_in=%ss reason=%s", WATCH_DISABLED_SEC, reason)
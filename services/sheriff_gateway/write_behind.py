@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import inspect
+import os
+from collections import deque
+from typing import Callable
+
+from shared.oplog import get_op_logger
+
+# Writes waiting per key at most; past this the key's oldest is dropped rather than holding up turns.
+GW_WRITE_BEHIND_MAX = max(1, int(os.environ.get("SHERIFF_GW_WRITE_BEHIND_MAX", "1000")))
+GW_WRITE_BEHIND_ATTEMPTS = max(1, int(os.environ.get("SHERIFF_GW_WRITE_BEHIND_ATTEMPTS", "3")))
+GW_WRITE_BEHIND_RETRY_SEC = float(os.environ.get("SHERIFF_GW_WRITE_BEHIND_RETRY_SEC", "0.5"))
+
+
+class WriteBehindQueue:
+    """Runs non-critical writes (memory inbox capture, transcripts) off the turn's path.
+
+    Writes submitted under the same key (e.g. "transcript:<session>") run in order; each key has
+    its own worker, so a write that is slow or failing only holds up the writes behind it. A
+    failing write is retried with exponential backoff, up to `attempts` tries, and then dropped
+    with a warning. Writes still queued when the process exits are lost.
+    """
+
+    def __init__(self, *, max_pending: int = GW_WRITE_BEHIND_MAX, attempts: int = GW_WRITE_BEHIND_ATTEMPTS,
+                 retry_sec: float = GW_WRITE_BEHIND_RETRY_SEC):
+        self.max_pending = max(1, int(max_pending))
+        self.attempts = max(1, int(attempts))
+        self.retry_sec = retry_sec
+        self.log = get_op_logger("gateway")
+        self.dropped = 0
+        self.failed = 0
+        self._jobs: dict[str, deque[Callable]] = {}
+        self._workers: dict[str, asyncio.Task] = {}
+
+    def submit(self, key: str, write: Callable) -> None:
+        """Queue `write` (a callable, sync or returning an awaitable) to run after those before it under `key`."""
+        jobs = self._jobs.setdefault(key, deque())
+        if len(jobs) >= self.max_pending:
+            jobs.popleft()
+            self.dropped += 1
+            self.log.warning("write_behind_overflow key=%s pending=%s", key, len(jobs))
+        jobs.append(write)
+        self._ensure_worker(key)
+
+    async def drain(self) -> None:
+        """Wait until every queued write has run (or given up)."""
+        while True:
+            for key, jobs in list(self._jobs.items()):
+                if jobs:
+                    self._ensure_worker(key)
+            workers = [task for task in self._workers.values() if not task.done()]
+            if not workers:
+                return
+            # wait(), not gather(): a cancelled drain must not cancel the workers.
+            await asyncio.wait(workers)
+
+    def status(self) -> dict:
+        return {"pending": sum(len(jobs) for jobs in self._jobs.values()), "dropped": self.dropped,
+                "failed": self.failed}
+
+    def _ensure_worker(self, key: str) -> None:
+        task = self._workers.get(key)
+        loop = asyncio.get_running_loop()
+        if task is not None and not task.done() and task.get_loop() is loop:
+            return
+        # Clean context: the worker outlives the turn whose write starts it and must not inherit
+        # that turn's RPC deadline or trace span.
+        self._workers[key] = loop.create_task(self._run(key), context=contextvars.Context())
+
+    async def _run(self, key: str) -> None:
+        jobs = self._jobs[key]
+        try:
+            while jobs:
+                await self._attempt(key, jobs.popleft())
+        finally:
+            if self._workers.get(key) is asyncio.current_task():
+                del self._workers[key]
+            if not jobs and self._jobs.get(key) is jobs:
+                del self._jobs[key]
+
+    async def _attempt(self, key: str, write: Callable) -> None:
+        for attempt in range(1, self.attempts + 1):
+            try:
+                out = write()
+                if inspect.isawaitable(out):
+                    await out
+                return
+            except Exception as exc:
+                if attempt >= self.attempts:
+                    self.failed += 1
+                    self.log.warning("write_behind_failed key=%s attempts=%s err=%r", key, attempt, exc)
+                    return
+                await asyncio.sleep(self.retry_sec * 2 ** (attempt - 1))
@@ -0,0 +1,13 @@
+from __future__ import annotations
+
+import asyncio
+
+from services.sheriff_gw_host.host import GwHost
+
+
+def main() -> None:
+    asyncio.run(GwHost().run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import asyncio
+import importlib
+
+from shared.local_rpc import register_local_service, unregister_local_service
+from shared.protocol import VERSION
+from shared.rpc_pool import close_pool
+from shared.service_base import NDJSONService
+from shared.service_boot import serve_registered
+
+# service -> (module, class, app name); kept in the same start order as service_runner.GW_ORDER.
+GW_SERVICES: dict[str, tuple[str, str, str]] = {
+    "sheriff-secrets": ("services.sheriff_secrets.service", "SheriffSecretsService", "gw.secrets"),
+    "sheriff-policy": ("services.sheriff_policy.service", "SheriffPolicyService", "gw.policy"),
+    "sheriff-web": ("services.sheriff_web.service", "SheriffWebService", "gw.web"),
+    "sheriff-tools": ("services.sheriff_tools.service", "SheriffToolsService", "gw.tools"),
+    "sheriff-gateway": ("services.sheriff_gateway.service", "SheriffGatewayService", "gw.gateway"),
+    "sheriff-chat-proxy": ("services.sheriff_chat_proxy.service", "SheriffChatProxyService", "gw.chat_proxy"),
+    "sheriff-tg-gate": ("services.sheriff_tg_gate.service", "SheriffTgGateService", "gw.tg_gate"),
+    "sheriff-requests": ("services.sheriff_requests.service", "SheriffRequestsService", "gw.requests"),
+    "sheriff-cli-gate": ("services.sheriff_cli_gate.service", "SheriffCliGateService", "gw.cli_gate"),
+    "sheriff-updater": ("services.sheriff_updater.service", "SheriffUpdaterService", "gw.updater"),
+    "sheriff-scheduler": ("services.sheriff_scheduler.service", "SheriffSchedulerService", "gw.sheriff_scheduler"),
+}
+
+
+class GwHost:
+    """Runs every gw-island service in one process and event loop.
+
+    Each service still listens on its own socket or port for outside callers (ctl, the llm island),
+    while calls between co-hosted services go straight to the target's handlers.
+    """
+
+    def __init__(self, services: list[str] | None = None):
+        self.services: dict[str, object] = {}
+        self.apps: dict[str, NDJSONService] = {}
+        for name in services or list(GW_SERVICES):
+            module_name, class_name, app_name = GW_SERVICES[name]
+            svc = getattr(importlib.import_module(module_name), class_name)()
+            self.services[name] = svc
+            self.apps[name] = NDJSONService(name=app_name, island="gw", kind="service", version=VERSION,
+                                            ops=svc.ops())
+
+    def register(self) -> None:
+        for name, app in self.apps.items():
+            register_local_service(name, app)
+
+    def unregister(self) -> None:
+        for name in self.apps:
+            unregister_local_service(name)
+
+    async def _boot(self) -> list[asyncio.Task]:
+        # Same start-up work the standalone __main__ modules do.
+        background = []
+        requests = self.services.get("sheriff-requests")
+        if requests is not None:
+            await requests.boot_check({}, lambda _e, _p: asyncio.sleep(0), "boot")
+        gateway = self.services.get("sheriff-gateway")
+        if gateway is not None:
+            background.append(asyncio.create_task(gateway.run_queue_forever()))
+        scheduler = self.services.get("sheriff-scheduler")
+        if scheduler is not None:
+            background.append(asyncio.create_task(scheduler.run_forever()))
+        return background
+
+    async def run(self) -> None:
+        self.register()
+        tasks = [asyncio.create_task(serve_registered(name, app)) for name, app in self.apps.items()]
+        try:
+            tasks.extend(await self._boot())
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.unregister()
+            await close_pool()
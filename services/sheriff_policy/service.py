@@ -3,6 +3,8 @@ from __future__ import annotations
 from shared.approvals import ApprovalGate
 from shared.paths import gw_root
 from shared.permissions_store import PermissionsStore
+from shared.rpc_blocking import blocking
+from shared.service_base import idempotent
 
 
 class SheriffPolicyService:
@@ -10,6 +12,8 @@ class SheriffPolicyService:
         self.store = PermissionsStore(gw_root() / "state" / "permissions.db")
         self.gate = ApprovalGate()
 
+    @blocking("io")
+    @idempotent
     async def get_decision(self, payload, emit_event, req_id):
         principal = payload["principal_id"]
         # Check specific principal first
@@ -19,6 +23,7 @@ class SheriffPolicyService:
             decision = self.store.get_decision("default", payload["resource_type"], payload["resource_value"])
         return {"decision": decision}
 
+    @blocking("io")
     async def set_decision(self, payload, emit_event, req_id):
         self.store.set_decision(payload["principal_id"], payload["resource_type"], payload["resource_value"],
                                 payload["decision"])
@@ -28,6 +33,7 @@ class SheriffPolicyService:
         return self.gate.request_permission(payload["principal_id"], payload["resource_type"],
                                             payload["resource_value"], payload.get("metadata"))
 
+    # On the loop: ApprovalGate is shared with request_permission, pending_list and consume_one_off.
     async def apply_callback(self, payload, emit_event, req_id):
         item = self.gate.apply_callback(payload["approval_id"], payload["action"])
         if not item:
@@ -38,6 +44,7 @@ class SheriffPolicyService:
             self.store.set_decision(item["principal_id"], item["resource_type"], item["resource_value"], "DENY")
         return {"status": "recorded", "approval_id": payload["approval_id"]}
 
+    @idempotent
     async def pending_list(self, payload, emit_event, req_id):
         return {"pending": list(self.gate.pending.values())}
 
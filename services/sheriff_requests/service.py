@@ -6,7 +6,9 @@ import uuid
 from typing import Any
 
 from shared.paths import gw_root
-from shared.proc_rpc import ProcClient
+from shared.rpc_blocking import blocking
+from shared.rpc_pool import pooled_client
+from shared.service_base import idempotent
 
 
 class SheriffRequestsService:
@@ -15,9 +17,9 @@ class SheriffRequestsService:
         state_dir.mkdir(parents=True, exist_ok=True)
         self.db_path = state_dir / "requests.db"
 
-        self.tg_gate = ProcClient("sheriff-tg-gate", spawn_fallback=False)
-        self.policy = ProcClient("sheriff-policy", spawn_fallback=False)
-        self.gateway = ProcClient("sheriff-gateway", spawn_fallback=False)
+        self.tg_gate = pooled_client("sheriff-tg-gate")
+        self.policy = pooled_client("sheriff-policy")
+        self.gateway = pooled_client("sheriff-gateway")
         # Back-compat shim for tests that still mock direct secrets RPC.
         self.secrets = None
 
@@ -190,6 +192,7 @@ class SheriffRequestsService:
             "request_id": request_id,
         }
 
+    @blocking("io")
     async def search(self, payload, emit_event, req_id):
         query = payload.get("query") or ""
         types = payload.get("types")
@@ -229,6 +232,8 @@ class SheriffRequestsService:
             )
         return {"matches": matches}
 
+    @blocking("io")
+    @idempotent
     async def get(self, payload, emit_event, req_id):
         entry = self._get_entry(payload["type"], payload["key"])
         if not entry:
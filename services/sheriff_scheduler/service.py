@@ -9,7 +9,7 @@ from typing import Any
 
 from shared import agent_repo
 from shared.oplog import get_op_logger
-from shared.proc_rpc import ProcClient
+from shared.rpc_pool import pooled_client
 from shared.task_store import TaskStore
 
 
@@ -18,8 +18,8 @@ class SheriffSchedulerService:
         self.log = get_op_logger("scheduler")
         self.state_path = agent_repo.path_for("system", "maintenance_state.json")
         self.task_store = TaskStore()
-        self.gateway = ProcClient("sheriff-gateway", spawn_fallback=False)
-        self.ai = ProcClient("codex-mcp-host", spawn_fallback=False)
+        self.gateway = pooled_client("sheriff-gateway")
+        self.ai = pooled_client("codex-mcp-host")
         self.poll_interval_sec = float(os.environ.get("SHERIFF_SCHEDULER_POLL_SEC", "30"))
         self.heartbeat_interval_sec = float(os.environ.get("SHERIFF_HEARTBEAT_INTERVAL_SEC", "3600"))
         self.daily_update_interval_sec = float(os.environ.get("SHERIFF_DAILY_UPDATE_INTERVAL_SEC", "86400"))
@@ -1,94 +1,215 @@
 from __future__ import annotations
 
+import asyncio
+import os
+import threading
+import time
+import uuid
+
 from shared.paths import gw_root
+from shared.rpc_blocking import blocking
+from shared.rpc_deadline import current_deadline
 from shared.secrets_state import SecretsState
+from shared.service_base import idempotent
+
+# A watch stream ends after this long (or just before its request deadline) and is re-opened by the
+# watcher, so a long-lived subscription never trips the RPC timeout.
+WATCH_TIMEOUT_SEC = float(os.environ.get("SHERIFF_SECRETS_WATCH_SEC", "240"))
+
+ALL_WATCH_KEYS = ("unlocked", "llm_provider", "llm_api_key")
+
+
+class SecretsChangeFeed:
+    """Fans state changes out to secrets.watch streams.
+
+    Mutating handlers run on the crypto worker threads, so subscribers are woken through their
+    own loop. `epoch` is new per process: a watcher seeing another epoch missed every change.
+    """
+
+    def __init__(self) -> None:
+        self.epoch = uuid.uuid4().hex
+        self.version = 0
+        self._lock = threading.Lock()
+        self._subscribers: set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = set()
+
+    def subscribe(self) -> tuple[asyncio.AbstractEventLoop, asyncio.Queue]:
+        sub = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub) -> None:
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def cursor(self) -> dict:
+        with self._lock:
+            return {"epoch": self.epoch, "version": self.version}
+
+    def publish(self, *keys: str) -> None:
+        with self._lock:
+            self.version += 1
+            change = {"epoch": self.epoch, "version": self.version, "keys": list(keys)}
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, change)
+            except RuntimeError:
+                # Subscriber's loop already closed; its stream is gone.
+                self.unsubscribe((loop, queue))
 
 
 class SheriffSecretsService:
     def __init__(self) -> None:
         state_dir = gw_root() / "state"
         self.state = SecretsState(state_dir / "secrets.db", state_dir / "master.json")
+        self.changes = SecretsChangeFeed()
 
+    @blocking("crypto")
     async def initialize(self, payload, emit_event, req_id):
         self.state.initialize(payload)
+        self.changes.publish(*ALL_WATCH_KEYS)
         return {"status": "initialized"}
 
+    @blocking("crypto")
+    @idempotent
     async def verify_master(self, payload, emit_event, req_id):
         return {"ok": self.state.verify_master_password(payload["master_password"])}
 
+    @blocking("crypto")
     async def unlock(self, payload, emit_event, req_id):
-        return {"ok": self.state.unlock(payload["master_password"])}
+        ok = self.state.unlock(payload["master_password"])
+        if ok:
+            self.changes.publish("unlocked")
+        return {"ok": ok}
 
+    @blocking("crypto")
     async def lock(self, payload, emit_event, req_id):
         self.state.lock()
+        self.changes.publish("unlocked")
         return {"status": "locked"}
 
+    @blocking("crypto")
+    @idempotent
     async def is_unlocked(self, payload, emit_event, req_id):
         return {"unlocked": self.state.is_unlocked()}
 
+    @blocking("crypto")
+    @idempotent
     async def get_secret(self, payload, emit_event, req_id):
         return {"value": self.state.get_secret(payload["handle"])}
 
+    @blocking("crypto")
     async def set_secret(self, payload, emit_event, req_id):
         self.state.set_secret(payload["handle"], payload["value"])
         return {"status": "saved"}
 
+    @blocking("crypto")
     async def ensure_handle(self, payload, emit_event, req_id):
         return {"ok": self.state.ensure_handle(payload["handle"])}
 
+    @blocking("crypto")
+    @idempotent
     async def get_llm_provider(self, payload, emit_event, req_id):
         return {"provider": self.state.get_llm_provider()}
 
+    @blocking("crypto")
+    @idempotent
     async def get_llm_api_key(self, payload, emit_event, req_id):
         return {"api_key": self.state.get_llm_api_key()}
 
+    @blocking("crypto")
     async def set_llm_provider(self, payload, emit_event, req_id):
         self.state.set_llm_provider(payload.get("provider", "stub"))
+        self.changes.publish("llm_provider")
         return {"status": "saved"}
 
+    @blocking("crypto")
     async def set_llm_api_key(self, payload, emit_event, req_id):
         self.state.set_llm_api_key(payload.get("api_key", ""))
+        self.changes.publish("llm_api_key")
         return {"status": "saved"}
 
+    @blocking("crypto")
+    @idempotent
     async def get_llm_bot_token(self, payload, emit_event, req_id):
         return {"token": self.state.get_llm_bot_token()}
 
+    @blocking("crypto")
     async def set_llm_bot_token(self, payload, emit_event, req_id):
         self.state.set_llm_bot_token(payload.get("token", ""))
         return {"status": "saved"}
 
+    @blocking("crypto")
+    @idempotent
     async def get_gate_bot_token(self, payload, emit_event, req_id):
         return {"token": self.state.get_gate_bot_token()}
 
+    @blocking("crypto")
     async def set_gate_bot_token(self, payload, emit_event, req_id):
         self.state.set_gate_bot_token(payload.get("token", ""))
         return {"status": "saved"}
 
+    @blocking("crypto")
+    @idempotent
     async def identity_get(self, payload, emit_event, req_id):
         return self.state.get_identity()
 
+    @blocking("crypto")
     async def identity_save(self, payload, emit_event, req_id):
         self.state.save_identity(payload)
         return {"status": "saved"}
 
+    @blocking("crypto")
     async def activation_create(self, payload, emit_event, req_id):
         code = self.state.create_activation_code(payload["bot_role"], str(payload["user_id"]))
         return {"code": code}
 
+    @blocking("crypto")
     async def activation_claim(self, payload, emit_event, req_id):
         user_id = self.state.activate_with_code(payload["bot_role"], payload["code"])
         return {"ok": bool(user_id), "user_id": user_id}
 
+    @blocking("crypto")
+    @idempotent
     async def activation_status(self, payload, emit_event, req_id):
         return {"user_id": self.state.get_bound_user(payload["bot_role"])}
 
+    @blocking("crypto")
+    @idempotent
     async def telegram_webhook_get(self, payload, emit_event, req_id):
         return {"config": self.state.get_telegram_webhook_config()}
 
+    @blocking("crypto")
     async def telegram_webhook_set(self, payload, emit_event, req_id):
         self.state.set_telegram_webhook_config(payload.get("config", {}))
         return {"status": "saved"}
 
+    async def watch(self, payload, emit_event, req_id):
+        """Stream secrets.changed events until timeout_sec passes; the first event is the cursor."""
+        timeout = float(payload.get("timeout_sec") or WATCH_TIMEOUT_SEC)
+        deadline = current_deadline()
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.time() - 1.0)
+        sub = self.changes.subscribe()
+        queue = sub[1]
+        try:
+            await emit_event("secrets.watching", self.changes.cursor())
+            loop = asyncio.get_running_loop()
+            ends_at = loop.time() + max(0.0, timeout)
+            while True:
+                left = ends_at - loop.time()
+                if left <= 0:
+                    break
+                try:
+                    change = await asyncio.wait_for(queue.get(), left)
+                except asyncio.TimeoutError:
+                    break
+                await emit_event("secrets.changed", change)
+        finally:
+            self.changes.unsubscribe(sub)
+        return self.changes.cursor()
+
     def ops(self):
         return {
             "secrets.initialize": self.initialize,
@@ -114,4 +235,5 @@ class SheriffSecretsService:
             "secrets.activation.status": self.activation_status,
             "secrets.telegram_webhook.get": self.telegram_webhook_get,
             "secrets.telegram_webhook.set": self.telegram_webhook_set,
+            "secrets.watch": self.watch,
         }
@@ -6,14 +6,14 @@ import os
 import requests
 
 from shared.paths import gw_root
-from shared.proc_rpc import ProcClient
+from shared.rpc_pool import pooled_client
 from shared.transcript import append_jsonl
 
 
 class SheriffTgGateService:
     def __init__(self):
-        self.gateway = ProcClient("sheriff-gateway", spawn_fallback=False)
-        self.policy = ProcClient("sheriff-policy", spawn_fallback=False)
+        self.gateway = pooled_client("sheriff-gateway")
+        self.policy = pooled_client("sheriff-policy")
         self.log_path = gw_root() / "state" / "gate_events.jsonl"
         self.debug_mode = os.environ.get("SHERIFF_DEBUG", "").strip().lower() in {"1", "true", "yes"}
 
@@ -1,19 +1,20 @@
 from __future__ import annotations
 
+import asyncio
 import os
 import uuid
 
 from shared.paths import gw_root
-from shared.proc_rpc import ProcClient
+from shared.rpc_pool import pooled_client
 from shared.tools_exec import ToolExecutor
 
 
 class SheriffToolsService:
     def __init__(self) -> None:
         self.execer = ToolExecutor(gw_root() / "state" / "tool_output")
-        self.policy = ProcClient("sheriff-policy", spawn_fallback=False)
-        self.requests = ProcClient("sheriff-requests", spawn_fallback=False)
-        self.secrets = ProcClient("sheriff-secrets", spawn_fallback=False)
+        self.policy = pooled_client("sheriff-policy")
+        self.requests = pooled_client("sheriff-requests")
+        self.secrets = pooled_client("sheriff-secrets")
 
     async def _ensure_tool_allowed(self, principal: str, argv: list[str]) -> dict | None:
         _, dec = await self.policy.request(
@@ -38,18 +39,25 @@ class SheriffToolsService:
         if not handles:
             return {"status": "ok", "env": {}}
 
+        # Lookups against a locked vault fail (with a traceback in the secrets service): check first,
+        # then fetch every handle in one round trip.
         _, unlocked = await self.secrets.request("secrets.is_unlocked", {})
         if not unlocked.get("result", {}).get("unlocked"):
             return {"status": "master_password_required"}
+        replies = await self.secrets.request_many([("secrets.get_secret", {"handle": handle}) for handle in handles])
 
         resolved_env: dict[str, str] = {}
         missing: list[str] = []
-        for handle in handles:
-            _, res = await self.secrets.request("secrets.get_secret", {"handle": handle})
+        for handle, res in zip(handles, replies):
             value = res.get("result", {}).get("value")
             if value is None:
                 missing.append(handle)
-                await self.requests.request(
+                continue
+            resolved_env[handle] = value
+
+        if missing:
+            await self.requests.request_many([
+                (
                     "requests.create_or_update",
                     {
                         "type": "secret",
@@ -58,10 +66,8 @@ class SheriffToolsService:
                         "context": {"title": handle, "tool": argv[0], "argv": argv},
                     },
                 )
-                continue
-            resolved_env[handle] = value
-
-        if missing:
+                for handle in missing
+            ])
             return {"status": "needs_secret", "missing_handles": missing}
         return {"status": "ok", "env": resolved_env}
 
@@ -80,7 +86,8 @@ class SheriffToolsService:
 
         child_env = os.environ.copy()
         child_env.update(secret_result["env"])
-        result = self.execer.exec(argv, payload.get("stdin", ""), env=child_env)
+        # subprocess.run blocks until the tool exits; keep the loop free for other requests.
+        result = await asyncio.to_thread(self.execer.exec, argv, payload.get("stdin", ""), env=child_env)
         if payload.get("taint"):
             run_id = payload.get("run_id") or str(uuid.uuid4())
             self.execer.save_output(run_id, result)
@@ -1,15 +1,17 @@
 from __future__ import annotations
 
+import asyncio
+
 from shared.policy import GatewayPolicy
-from shared.proc_rpc import ProcClient
+from shared.rpc_pool import pooled_client
 from shared.secure_web import SecureWebRequester
 
 
 class SheriffWebService:
     def __init__(self) -> None:
         self.requester = SecureWebRequester(GatewayPolicy())
-        self.gateway = ProcClient("sheriff-gateway")
-        self.policy = ProcClient("sheriff-policy")
+        self.gateway = pooled_client("sheriff-gateway", spawn_fallback=True)
+        self.policy = pooled_client("sheriff-policy", spawn_fallback=True)
 
     async def _secrets(self, op: str, payload: dict):
         _, res = await self.gateway.request("gateway.secrets.call", {"op": op, "payload": payload})
@@ -35,7 +37,8 @@ class SheriffWebService:
         for header, handle in (payload.get("secret_headers") or {}).items():
             sec = await self._secrets("secrets.get_secret", {"handle": handle})
             resolved[header] = sec.get("value", "")
-        response = self.requester.request_https(payload, resolved)
+        # DNS checks and the HTTPS call itself are synchronous.
+        response = await asyncio.to_thread(self.requester.request_https, payload, resolved)
         return {"status": "executed", "response": response}
 
     def ops(self):
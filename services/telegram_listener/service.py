@@ -10,18 +10,24 @@ from shared.errors import ServiceCrashedError
 from shared.oplog import get_op_logger
 from shared.paths import gw_root
 from shared.proc_rpc import ProcClient
+from shared.rpc_pool import pooled_client
+from shared.rpc_trace import SpanRecorder, root_span
 
 CHAT_REQUEST_TIMEOUT_SEC = float(os.environ.get("SHERIFF_CHAT_REQUEST_TIMEOUT_SEC", "90"))
+CHAT_RETRY_ATTEMPTS = int(os.environ.get("SHERIFF_CHAT_RETRY_ATTEMPTS", "4"))
+CHAT_RETRY_BASE_SEC = float(os.environ.get("SHERIFF_CHAT_RETRY_BASE_SEC", "1.0"))
 
 
 class TelegramListenerService:
     def __init__(self):
         self.log = get_op_logger("telegram-listener", island="llm")
+        self.tracer = SpanRecorder("llm.telegram_listener", "llm")
         self.log.info("telegram-listener boot (build=delta-fallback-v2)")
+        # Own client rather than the pooled one: its chat timeout must not leak to other callers.
         self.gateway = ProcClient("sheriff-gateway", spawn_fallback=False)
         self.gateway.request_timeout_sec = CHAT_REQUEST_TIMEOUT_SEC
-        self.sheriff_gate = ProcClient("sheriff-tg-gate", spawn_fallback=False)
-        self.cli_gate = ProcClient("sheriff-cli-gate", spawn_fallback=False)
+        self.sheriff_gate = pooled_client("sheriff-tg-gate")
+        self.cli_gate = pooled_client("sheriff-cli-gate")
         self.offset_path = gw_root() / "state" / "telegram_offsets.json"
         self.tokens_cache_path = gw_root() / "state" / "telegram_tokens_cache.json"
         self.unlock_channel_path = gw_root() / "state" / "telegram_unlock_channel.json"
@@ -148,6 +154,7 @@ class TelegramListenerService:
             *,
             chat_type: str = "",
             message_thread_id: int | None = None,
+            update_id: int | None = None,
     ):
         try:
             unlocked = await self._secrets("secrets.is_unlocked", {})
@@ -177,29 +184,29 @@ class TelegramListenerService:
 
             self.log.info("ai inbound status=accepted user_id=%s", user_id)
 
-            stream, final = await self.gateway.request(
-                "gateway.handle_user_message",
-                {
-                    "channel": "telegram",
-                    "principal_external_id": user_id,
-                    "text": text,
-                    "chat_id": chat_id,
-                    "chat_type": chat_type,
-                    "message_thread_id": message_thread_id,
-                },
-                stream_events=True,
-            )
-            reply = None
-            delta_parts: list[str] =[]
-            async for frame in stream:
-                ev = frame.get("event")
-                if ev == "assistant.final":
-                    reply = frame.get("payload", {}).get("text")
-                elif ev == "assistant.delta":
-                    part = str((frame.get("payload") or {}).get("text") or "")
-                    if part:
-                        delta_parts.append(part)
-            final_res = await final if asyncio.isfuture(final) or asyncio.iscoroutine(final) else final
+            message = {
+                "channel": "telegram",
+                "principal_external_id": user_id,
+                "text": text,
+                "chat_id": chat_id,
+                "chat_type": chat_type,
+                "message_thread_id": message_thread_id,
+            }
+            if update_id is not None:
+                message["update_id"] = update_id
+            attempt = 0
+            while True:
+                try:
+                    reply, delta_parts, final_res = await self._ask_gateway(message)
+                    break
+                except ServiceCrashedError as e:
+                    # The gateway restarting (e.g. during an update) drops the connection. With an
+                    # update_id the gateway recognizes the resend, so handing it over again is safe.
+                    attempt += 1
+                    if update_id is None or "timeout" in str(e).lower() or attempt > CHAT_RETRY_ATTEMPTS:
+                        raise
+                    self.log.info("ai gateway retry attempt=%s update_id=%s err=%s", attempt, update_id, e)
+                    await asyncio.sleep(CHAT_RETRY_BASE_SEC * 2 ** (attempt - 1))
 
             if not reply and delta_parts:
                 reply = "".join(delta_parts).strip()
@@ -211,6 +218,10 @@ class TelegramListenerService:
             status_obj = result_obj.get("status")
             self.log.info("ai gateway final status=%s has_reply=%s delta_parts=%s", status_obj, bool(reply),
                           len(delta_parts))
+            if status_obj in {"duplicate", "coalesced"}:
+                # Already answered, being answered by the gateway's own replay of this update, or
+                # answered together with the message before it.
+                return
             if status_obj == "locked":
                 # Always notify on Sheriff channel too, so user can unlock right there.
                 msg = "🔒 Vault is locked. Open the Sheriff bot and send: /unlock <master_password>"
@@ -231,6 +242,27 @@ class TelegramListenerService:
             self.log.exception("ai_message handler failed user_id=%s err=%s", user_id, e)
             self._send_message(token, chat_id, f"⚠️ Internal system error processing your request: {e}")
 
+    async def _ask_gateway(self, message: dict):
+        stream, final = await self.gateway.request("gateway.handle_user_message", message, stream_events=True)
+        reply = None
+        delta_parts: list[str] = []
+        async for frame in stream:
+            ev = frame.get("event")
+            if ev == "assistant.final":
+                reply = frame.get("payload", {}).get("text")
+            elif ev == "assistant.delta":
+                part = str((frame.get("payload") or {}).get("text") or "")
+                if part:
+                    delta_parts.append(part)
+        final_res = await final if asyncio.isfuture(final) or asyncio.iscoroutine(final) else final
+        return reply, delta_parts, final_res
+
+    async def _traced(self, op: str, handler) -> None:
+        # Each inbound message opens its own trace; every RPC it triggers joins it.
+        with root_span(self.tracer, op) as span:
+            self.log.info("trace start op=%s trace_id=%s", op, span["trace_id"])
+            await handler
+
     async def _handle_sheriff_message(self, token: str, user_id: str, chat_id: int, text: str):
         try:
             # Direct unlock path for reliability during locked-state recovery.
@@ -310,20 +342,20 @@ class TelegramListenerService:
             # Fire and forget to prevent blocking the polling loop with long-running agent tasks
             if role == "llm":
                 self.log.info("dispatch role=llm user_id=%s text=%s", user_id, text[:80])
-                asyncio.create_task(
-                    self._handle_ai_message(
-                        token,
-                        sheriff_token,
-                        user_id,
-                        int(chat_id),
-                        text,
-                        chat_type=chat_type,
-                        message_thread_id=int(message_thread_id) if message_thread_id is not None else None,
-                    )
-                )
+                asyncio.create_task(self._traced("telegram.ai_message", self._handle_ai_message(
+                    token,
+                    sheriff_token,
+                    user_id,
+                    int(chat_id),
+                    text,
+                    chat_type=chat_type,
+                    message_thread_id=int(message_thread_id) if message_thread_id is not None else None,
+                    update_id=uid,
+                )))
             else:
                 self.log.info("dispatch role=sheriff user_id=%s text=%s", user_id, text[:80])
-                asyncio.create_task(self._handle_sheriff_message(token, user_id, int(chat_id), text))
+                asyncio.create_task(self._traced("telegram.sheriff_message",
+                                                 self._handle_sheriff_message(token, user_id, int(chat_id), text)))
 
         offsets[role] = offset
 
@@ -10,15 +10,16 @@ from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 import requests
 
-from shared.proc_rpc import ProcClient
+from shared.rpc_pool import pooled_client
+from shared.session_keys import update_idempotency_key
 
 
 class TelegramWebhookService:
     def __init__(self):
-        self.gateway = ProcClient("sheriff-gateway", spawn_fallback=False)
-        self.ai_gate = ProcClient("ai-tg-llm", spawn_fallback=False)
-        self.sheriff_gate = ProcClient("sheriff-tg-gate", spawn_fallback=False)
-        self.cli_gate = ProcClient("sheriff-cli-gate", spawn_fallback=False)
+        self.gateway = pooled_client("sheriff-gateway")
+        self.ai_gate = pooled_client("ai-tg-llm")
+        self.sheriff_gate = pooled_client("sheriff-tg-gate")
+        self.cli_gate = pooled_client("sheriff-cli-gate")
         self.debug_mode = os.environ.get("SHERIFF_DEBUG", "").strip().lower() in {"1", "true", "yes"}
         self.loop = None
 
@@ -70,7 +71,8 @@ class TelegramWebhookService:
         await self._secrets("secrets.telegram_webhook.set", {"config": cfg})
         return cfg
 
-    async def _handle_ai_message(self, token: str, user_id: str, chat_id: int, text: str):
+    async def _handle_ai_message(self, token: str, user_id: str, chat_id: int, text: str, *, chat_type: str = "",
+                                 message_thread_id: int | None = None, update_id=None):
         try:
             _, gate = await self.ai_gate.request("ai_tg_llm.inbound_message", {"user_id": user_id, "text": text})
             result = gate.get("result", {})
@@ -85,19 +87,37 @@ class TelegramWebhookService:
             if status != "accepted":
                 return
 
+            # chat_id is where the gateway sends the reply when it replays this message after a restart.
+            message = {
+                "channel": "telegram",
+                "principal_external_id": user_id,
+                "text": text,
+                "chat_id": chat_id,
+                "chat_type": chat_type,
+                "message_thread_id": message_thread_id,
+            }
+            if update_id is not None:
+                # Telegram redelivers an update it got no 200 for; the gateway drops the repeat.
+                message["idempotency_key"] = update_idempotency_key("telegram", chat_id, update_id)
             stream, final = await self.gateway.request(
                 "gateway.handle_user_message",
-                {"channel": "telegram", "principal_external_id": user_id, "text": text},
+                message,
                 stream_events=True,
             )
             reply = None
             async for frame in stream:
                 if frame.get("event") == "assistant.final":
                     reply = frame.get("payload", {}).get("text")
-            if hasattr(final, "__await__"):
-                await final
+            final_res = await final if hasattr(final, "__await__") else final
             if reply:
                 self._send_message(token, chat_id, reply)
+            result_obj = (final_res or {}).get("result", {}) if isinstance(final_res, dict) else {}
+            if result_obj.get("status") in {"duplicate", "coalesced"}:
+                # Already answered, being answered by the gateway's own replay of this update, or
+                # answered together with the message before it.
+                return
+            if not reply:
+                self._send_message(token, chat_id, "⚠️ No response generated. Please try again in a moment.")
         except Exception as e:
             self._send_message(token, chat_id, f"⚠️ Internal system error processing your request: {e}")
 
@@ -206,7 +226,9 @@ class TelegramWebhookService:
 
                 msg = upd.get("message") or {}
                 user_id = str((msg.get("from") or {}).get("id") or "")
-                chat_id = (msg.get("chat") or {}).get("id")
+                chat = msg.get("chat") or {}
+                chat_id = chat.get("id")
+                message_thread_id = msg.get("message_thread_id")
                 text = (msg.get("text") or "").strip()
 
                 if user_id and chat_id is not None and text:
@@ -214,7 +236,11 @@ class TelegramWebhookService:
                     # Dispatch to main event loop immediately and return 200 to prevent Telegram Timeout
                     if role == "llm":
                         __import__("asyncio").run_coroutine_threadsafe(
-                            service._handle_ai_message(token, user_id, int(chat_id), text),
+                            service._handle_ai_message(
+                                token, user_id, int(chat_id), text, chat_type=str(chat.get("type") or ""),
+                                message_thread_id=int(message_thread_id) if message_thread_id is not None else None,
+                                update_id=upd.get("update_id"),
+                            ),
                             service.loop
                         )
                     else:
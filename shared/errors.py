@@ -4,3 +4,7 @@ class ProtocolError(RuntimeError):
 
 class ServiceCrashedError(RuntimeError):
     """Raised when a child service exits during a request."""
+
+
+class ServiceUnavailableError(ServiceCrashedError):
+    """Raised without a connect attempt while a service's circuit breaker is open."""
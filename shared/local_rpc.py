@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from shared.service_base import NDJSONService
+
+# Services hosted in this process. ProcClient dispatches to these directly instead of opening a
+# socket, so co-hosted services talk without framing, serialization or a loopback hop.
+_LOCAL_SERVICES: dict[str, NDJSONService] = {}
+
+
+def register_local_service(service: str, app: NDJSONService) -> None:
+    _LOCAL_SERVICES[service] = app
+
+
+def unregister_local_service(service: str) -> None:
+    _LOCAL_SERVICES.pop(service, None)
+
+
+def local_service(service: str) -> NDJSONService | None:
+    return _LOCAL_SERVICES.get(service)
@@ -1,8 +1,23 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import struct
 from collections.abc import AsyncIterator
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional speedup
+    msgpack = None
+
+FRAME_HEADER = struct.Struct(">I")
+MAX_FRAME_BYTES = 256 * 1024 * 1024
+
 
 async def read_frames(reader) -> AsyncIterator[dict]:
     while True:
@@ -17,3 +32,112 @@ async def read_frames(reader) -> AsyncIterator[dict]:
 
 def encode_frame(frame: dict) -> bytes:
     return (json.dumps(frame, separators=(",", ":"), ensure_ascii=False) + "\n").encode("utf-8")
+
+
+class JsonCodec:
+    name = "json"
+
+    def dumps(self, frame: dict) -> bytes:
+        return json.dumps(frame, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+    def loads(self, data: bytes) -> dict:
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    name = "orjson"
+
+    def dumps(self, frame: dict) -> bytes:
+        return orjson.dumps(frame, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, data: bytes) -> dict:
+        return orjson.loads(data)
+
+
+class MsgpackCodec:
+    name = "msgpack"
+
+    def dumps(self, frame: dict) -> bytes:
+        return msgpack.packb(frame, use_bin_type=True)
+
+    def loads(self, data: bytes) -> dict:
+        return msgpack.unpackb(data, raw=False)
+
+
+def _available_codecs() -> dict[str, object]:
+    codecs: dict[str, object] = {}
+    if orjson is not None:
+        codecs["orjson"] = OrjsonCodec()
+    if msgpack is not None:
+        codecs["msgpack"] = MsgpackCodec()
+    codecs["json"] = JsonCodec()
+    return codecs
+
+
+# Ordered by preference; stdlib json is always present as the last resort.
+FRAME_CODECS = _available_codecs()
+
+
+def codec_names() -> list[str]:
+    return list(FRAME_CODECS.keys())
+
+
+def choose_codec(offered: list[str]) -> str | None:
+    for name in offered:
+        if name in FRAME_CODECS:
+            return name
+    return None
+
+
+class FrameFormat:
+    """Wire format of one connection: NDJSON until a codec is negotiated, length-prefixed afterwards.
+
+    When an out-of-band channel is attached, large strings travel as spill-file handles.
+    """
+
+    def __init__(self) -> None:
+        self.codec = None
+        self.oob = None
+
+    @property
+    def codec_name(self) -> str:
+        return self.codec.name if self.codec is not None else "ndjson"
+
+    def use(self, name: str) -> None:
+        self.codec = FRAME_CODECS[name]
+
+    def encode(self, frame: dict) -> bytes:
+        if self.oob is not None:
+            frame = self.oob.spill(frame)
+        if self.codec is None:
+            return encode_frame(frame)
+        body = self.codec.dumps(frame)
+        return FRAME_HEADER.pack(len(body)) + body
+
+    async def read(self, reader: asyncio.StreamReader) -> dict | None:
+        """Return the next frame, or None at EOF. Undecodable frames raise ValueError."""
+        frame = await self._read_raw(reader)
+        if frame is not None and self.oob is not None:
+            frame = self.oob.restore(frame)
+        return frame
+
+    async def _read_raw(self, reader: asyncio.StreamReader) -> dict | None:
+        if self.codec is None:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return None
+                if line.strip():
+                    return json.loads(line)
+        try:
+            header = await reader.readexactly(FRAME_HEADER.size)
+        except asyncio.IncompleteReadError:
+            return None
+        (size,) = FRAME_HEADER.unpack(header)
+        if size > MAX_FRAME_BYTES:
+            raise ConnectionError(f"frame too large: {size} bytes")
+        try:
+            body = await reader.readexactly(size)
+        except asyncio.IncompleteReadError:
+            return None
+        return self.codec.loads(body)
@@ -7,6 +7,7 @@ from logging.handlers import RotatingFileHandler, TimedRotatingFileHandler
 from pathlib import Path
 
 from shared.paths import gw_root, llm_root
+from shared.rpc_trace import current_trace_id
 
 
 def _enabled() -> bool:
@@ -14,6 +15,12 @@ def _enabled() -> bool:
     return v not in {"0", "false", "no", "off"}
 
 
+class _TraceIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = current_trace_id() or "-"
+        return True
+
+
 def get_op_logger(name: str, *, island: str = "gw") -> logging.Logger:
     logger = logging.getLogger(f"sheriff.op.{island}.{name}")
     if logger.handlers:
@@ -36,8 +43,9 @@ def get_op_logger(name: str, *, island: str = "gw") -> logging.Logger:
         backupCount=24,
         encoding="utf-8",
     )
-    fmt = logging.Formatter("%(asctime)s %(levelname)s %(name)s :: %(message)s")
+    fmt = logging.Formatter("%(asctime)s %(levelname)s %(name)s trace=%(trace_id)s :: %(message)s")
     handler.setFormatter(fmt)
+    handler.addFilter(_TraceIdFilter())
 
     logger.setLevel(logging.INFO)
     logger.addHandler(handler)
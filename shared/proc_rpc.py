@@ -1,59 +1,177 @@
 from __future__ import annotations
 
 import asyncio
-import json
 import os
+import random
 import sys
+import time
 import uuid
 from collections import deque
 from collections.abc import AsyncIterator
 from pathlib import Path
 
-from shared.errors import ProtocolError, ServiceCrashedError
-from shared.ndjson import encode_frame
-from shared.service_registry import rpc_endpoint
+from shared.errors import ProtocolError, ServiceCrashedError, ServiceUnavailableError
+from shared.local_rpc import local_service
+from shared.rpc_breaker import OPEN, CircuitBreaker, breaker_for
+from shared.ndjson import FrameFormat, codec_names
+from shared.rpc_deadline import effective_deadline, remaining
+from shared.rpc_oob import RPC_OOB_THRESHOLD, OOBChannel, make_probe, oob_dir, oob_file_mode
+from shared.rpc_trace import outgoing_trace
+from shared.service_registry import rpc_endpoint, rpc_socket_path, service_island
 
 RPC_STREAM_LIMIT = 10 * 1024 * 1024
+RPC_CODEC = os.environ.get("SHERIFF_RPC_CODEC", "auto").strip().lower() or "auto"
+RPC_RETRY_ATTEMPTS = int(os.environ.get("SHERIFF_RPC_RETRY_ATTEMPTS", "3"))
+RPC_RETRY_BASE_SEC = float(os.environ.get("SHERIFF_RPC_RETRY_BASE_SEC", "0.1"))
 
 
 class ProcClient:
-    def __init__(self, binary: str, *, cwd=None, env=None, spawn_fallback: bool = True):
+    def __init__(self, binary: str, *, cwd=None, env=None, spawn_fallback: bool = True, codec: str | None = None,
+                 circuit_breaker: bool = True):
         self.binary = binary
         self.cwd = cwd
         self.env = env
         self.spawn_fallback = spawn_fallback
+        self.circuit_breaker = circuit_breaker
+        self.codec = (codec or RPC_CODEC).strip().lower()
+        self._format = FrameFormat()
+        self.oob_threshold = RPC_OOB_THRESHOLD
         self.proc: asyncio.subprocess.Process | None = None
         self.reader: asyncio.StreamReader | None = None
         self.writer: asyncio.StreamWriter | None = None
         self._stderr_task: asyncio.Task | None = None
         self._stderr_tail: deque[str] = deque(maxlen=80)
         self._lock: asyncio.Lock | None = None
+        self._write_lock: asyncio.Lock | None = None
         self._lock_loop: asyncio.AbstractEventLoop | None = None
+        self._conn_loop: asyncio.AbstractEventLoop | None = None
+        self._reader_task: asyncio.Task | None = None
+        self._pending: dict[str, _PendingRequest] = {}
+        self._local = None
+        self._local_tasks: dict[str, asyncio.Task] = {}
+        self._control_tasks: set[asyncio.Task] = set()
+        # Ops the service declared safe to repeat (learned from the handshake's meta reply).
+        self.idempotent_ops: set[str] = set()
         self.request_timeout_sec = float(os.environ.get("SHERIFF_RPC_TIMEOUT_SEC", "600"))
+        # When set, a connection with nothing in flight for this long is closed (reopened on demand).
+        self.idle_timeout_sec: float | None = None
+        self._last_used = 0.0
+        self._idle_timer: asyncio.TimerHandle | None = None
 
     def _get_lock(self) -> asyncio.Lock:
         loop = asyncio.get_running_loop()
         if self._lock is None or self._lock_loop is not loop:
             self._lock = asyncio.Lock()
+            self._write_lock = asyncio.Lock()
             self._lock_loop = loop
         return self._lock
 
-    async def start(self):
-        if self.writer is not None and not self.writer.is_closing():
+    def _get_write_lock(self) -> asyncio.Lock:
+        self._get_lock()
+        assert self._write_lock is not None
+        return self._write_lock
+
+    def _connected(self) -> bool:
+        if self._reader_task is None or self._reader_task.done():
+            return False
+        if self.writer is not None:
+            return not self.writer.is_closing()
+        return self.proc is not None and self.proc.returncode is None
+
+    def _forget_stale_loop(self) -> None:
+        # Transports and tasks are bound to the loop that created them; a client reused from a
+        # later asyncio.run() starts over instead of touching the dead loop's objects.
+        loop = asyncio.get_running_loop()
+        if self._conn_loop is None or self._conn_loop is loop:
             return
-        if self.proc and self.proc.returncode is None:
+        self.reader = None
+        self.writer = None
+        self.proc = None
+        self._stderr_task = None
+        self._reader_task = None
+        self._pending = {}
+        self._local_tasks = {}
+        self._control_tasks = set()
+        self._idle_timer = None
+        self._conn_loop = None
+
+    @property
+    def breaker(self) -> CircuitBreaker | None:
+        # Only daemon-only clients fail fast; with a spawn fallback a dead endpoint is not an outage.
+        if not self.circuit_breaker or self.spawn_fallback:
+            return None
+        return breaker_for(self.binary)
+
+    def circuit_state(self) -> dict:
+        breaker = self.breaker
+        state = breaker.snapshot() if breaker is not None else {"state": "disabled"}
+        return {**state, "connected": self._local is not None or self._connected()}
+
+    def _unavailable(self, breaker: CircuitBreaker) -> ServiceUnavailableError:
+        snap = breaker.snapshot()
+        return ServiceUnavailableError(
+            f"managed service unavailable: {self.binary} (circuit {snap['state']}, retry in "
+            f"{snap['retry_in_sec']:.1f}s; last error: {snap['last_error']})"
+        )
+
+    async def start(self):
+        self._forget_stale_loop()
+        if self._local is None:
+            self._local = local_service(self.binary)
+        if self._local is not None or self._connected():
             return
+        breaker = self.breaker
+        if breaker is not None and breaker.state == OPEN:
+            raise self._unavailable(breaker)
+        async with self._get_lock():
+            if self._connected():
+                return
+            if breaker is not None and not breaker.allow():
+                raise self._unavailable(breaker)
+            try:
+                await self._connect()
+            except Exception as exc:
+                if breaker is not None:
+                    breaker.record_failure(str(exc))
+                raise
+            except BaseException:
+                if breaker is not None:
+                    breaker.release()
+                raise
+            if breaker is not None:
+                breaker.record_success()
+
+    async def _connect(self) -> None:
+        await self._reset_transport()
+        self._format = FrameFormat()
+        await self._open()
+        try:
+            await self._handshake()
+        except BaseException:
+            await self._reset_transport()
+            raise
+        self._conn_loop = asyncio.get_running_loop()
+        self._reader_task = asyncio.create_task(self._read_loop())
+
+    async def _open(self) -> None:
+        socket_path = rpc_socket_path(self.binary)
         endpoint = rpc_endpoint(self.binary)
-        if endpoint is not None:
+        if socket_path is not None or endpoint is not None:
             try:
-                self.reader, self.writer = await asyncio.open_connection(*endpoint, limit=RPC_STREAM_LIMIT)
+                if socket_path is not None:
+                    self.reader, self.writer = await asyncio.open_unix_connection(
+                        str(socket_path), limit=RPC_STREAM_LIMIT
+                    )
+                else:
+                    self.reader, self.writer = await asyncio.open_connection(*endpoint, limit=RPC_STREAM_LIMIT)
                 return
             except OSError as exc:
                 self.reader = None
                 self.writer = None
                 if not self.spawn_fallback:
+                    where = str(socket_path) if socket_path is not None else f"{endpoint[0]}:{endpoint[1]}"
                     raise ServiceCrashedError(
-                        f"managed service unavailable: {self.binary} at {endpoint[0]}:{endpoint[1]} ({exc})"
+                        f"managed service unavailable: {self.binary} at {where} ({exc})"
                     ) from exc
         binary = self.binary
         candidate = Path(sys.executable).parent / self.binary
@@ -85,17 +203,163 @@ class ProcClient:
 
     async def _read_frame(self) -> dict:
         if self.reader is not None:
-            line = await self.reader.readline()
-            if not line:
+            frame = await self._format.read(self.reader)
+            if frame is None:
                 raise ServiceCrashedError(f"service connection closed: {self.binary}")
-            return json.loads(line.decode("utf-8"))
+            return frame
         assert self.proc and self.proc.stdout
-        line = await self.proc.stdout.readline()
-        if not line:
+        frame = await self._format.read(self.proc.stdout)
+        if frame is None:
             raise ServiceCrashedError("service exited; stderr tail:\n" + "\n".join(self._stderr_tail))
-        return json.loads(line.decode("utf-8"))
+        return frame
+
+    async def _write(self, data: bytes) -> None:
+        async with self._get_write_lock():
+            if self.writer is not None:
+                self.writer.write(data)
+                await self.writer.drain()
+            else:
+                assert self.proc and self.proc.stdin
+                self.proc.stdin.write(data)
+                await self.proc.stdin.drain()
+
+    async def _handshake(self) -> None:
+        # Runs before the reader task exists, so the meta reply is the only frame in flight.
+        # Services that predate negotiation answer without "codec"/"oob_dir" and the link stays plain NDJSON.
+        offered = [] if self.codec == "ndjson" else codec_names() if self.codec == "auto" else [self.codec]
+        payload: dict = {}
+        if offered:
+            payload["codecs"] = offered
+        probe = self._oob_probe()
+        if probe is not None:
+            payload["oob_dir"] = str(probe.parent)
+            payload["oob_probe"] = probe.name
+        if not payload:
+            return
+        req_id = str(uuid.uuid4())
+        try:
+            await self._write(self._format.encode({"id": req_id, "op": "meta", "payload": payload}))
+            frame = await asyncio.wait_for(self._read_frame(), timeout=self.request_timeout_sec)
+        except asyncio.TimeoutError as exc:
+            raise ServiceCrashedError(f"rpc handshake timeout: {self.binary}") from exc
+        except (ConnectionError, ValueError) as exc:
+            raise ServiceCrashedError(f"rpc handshake failed: {self.binary} ({exc})") from exc
+        finally:
+            if probe is not None:
+                probe.unlink(missing_ok=True)
+        if frame.get("id") != req_id:
+            raise ProtocolError(f"unexpected frame id {frame.get('id')} expected {req_id}")
+        result = (frame.get("result") or {}) if frame.get("ok") else {}
+        if isinstance(result.get("idempotent"), list):
+            self.idempotent_ops = {str(op) for op in result["idempotent"]}
+        if result.get("codec") in offered:
+            self._format.use(result["codec"])
+        if probe is not None and result.get("oob_dir") == str(probe.parent):
+            island = service_island(self.binary)
+            self._format.oob = OOBChannel(probe.parent, threshold=self.oob_threshold,
+                                          file_mode=oob_file_mode(island))
+
+    def _oob_probe(self) -> Path | None:
+        # Spill files live in the target's island: that is the trust zone both peers already share,
+        # and the probe lets the service confirm it sees the same directory (not a sandbox tmpfs).
+        if self.oob_threshold <= 0:
+            return None
+        try:
+            return make_probe(oob_dir(service_island(self.binary)))
+        except OSError:
+            return None
+
+    async def _read_loop(self) -> None:
+        try:
+            while True:
+                self._route_frame(await self._read_frame())
+        except asyncio.CancelledError:
+            raise
+        except ServiceCrashedError as exc:
+            self._fail_pending(exc)
+        except Exception as exc:  # noqa: BLE001
+            self._fail_pending(ProtocolError(f"invalid frame from {self.binary}: {exc}"))
+
+    def _route_frame(self, frame: dict) -> None:
+        pending = self._pending.get(frame.get("id"))
+        if pending is None:
+            # Late frames for requests that already timed out are dropped.
+            return
+        pending.frames.put_nowait(frame)
+        if "event" not in frame:
+            self._pending.pop(pending.req_id, None)
+            if not pending.final.done():
+                pending.final.set_result(frame)
+
+    def _fail_pending(self, exc: Exception) -> None:
+        pending = list(self._pending.values())
+        self._pending.clear()
+        for item in pending:
+            item.fail(exc)
+
+    async def _reset_transport(self) -> None:
+        writer = self.writer
+        proc = self.proc
+        self.reader = None
+        self.writer = None
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+        if proc is not None:
+            self.proc = None
+            if proc.returncode is None:
+                try:
+                    proc.kill()
+                except ProcessLookupError:
+                    pass
+
+    def _arm_idle_timer(self, delay: float | None = None) -> None:
+        if self.idle_timeout_sec is None or self._idle_timer is not None or self._local is not None:
+            return
+        self._idle_timer = asyncio.get_running_loop().call_later(
+            self.idle_timeout_sec if delay is None else delay, self._on_idle_timer
+        )
+
+    def _on_idle_timer(self) -> None:
+        self._idle_timer = None
+        if not self._connected():
+            return
+        idle = time.monotonic() - self._last_used
+        if self._pending or idle < self.idle_timeout_sec:
+            self._arm_idle_timer(self.idle_timeout_sec if self._pending else self.idle_timeout_sec - idle)
+            return
+        task = asyncio.create_task(self._close_idle())
+        self._control_tasks.add(task)
+        task.add_done_callback(self._control_tasks.discard)
+
+    async def _close_idle(self) -> None:
+        # Under the connect lock, so a request arriving meanwhile waits for the fresh connection
+        # instead of being failed by this close.
+        async with self._get_lock():
+            if self._pending or not self._connected() or time.monotonic() - self._last_used < self.idle_timeout_sec:
+                return
+            await self.close()
 
     async def close(self) -> None:
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+        reader_task = self._reader_task
+        self._reader_task = None
+        if reader_task is not None and not reader_task.done():
+            reader_task.cancel()
+            try:
+                await reader_task
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                pass
+        self._fail_pending(ServiceCrashedError(f"client closed: {self.binary}"))
+        self._conn_loop = None
+        self._local = None
         reader = self.reader
         writer = self.writer
         proc = self.proc
@@ -155,57 +419,170 @@ class ProcClient:
             except Exception:
                 pass
 
-    async def request(self, op: str, payload: dict, *, stream_events: bool = False):
+    async def _send(self, op: str, payload: dict) -> _PendingRequest:
         await self.start()
-        async with self._get_lock():
-            req_id = str(uuid.uuid4())
-            if self.writer is not None:
-                self.writer.write(encode_frame({"id": req_id, "op": op, "payload": payload}))
-                await self.writer.drain()
-            else:
-                assert self.proc and self.proc.stdin
-                self.proc.stdin.write(encode_frame({"id": req_id, "op": op, "payload": payload}))
-                await self.proc.stdin.drain()
+        self._last_used = time.monotonic()
+        self._arm_idle_timer()
+        req_id = str(uuid.uuid4())
+        # Never wait past the deadline of the request we are serving, if any.
+        pending = _PendingRequest(req_id, effective_deadline(self.request_timeout_sec))
+        self._pending[req_id] = pending
+        trace = outgoing_trace()
+        if self._local is not None:
+            self._dispatch_local(req_id, op, payload, pending.deadline, trace)
+            return pending
+        try:
+            await self._write(self._format.encode(
+                {"id": req_id, "op": op, "payload": payload, "deadline": pending.deadline, "trace": trace}
+            ))
+        except (ConnectionError, AssertionError) as exc:
+            self._pending.pop(req_id, None)
+            raise ServiceCrashedError(f"service connection lost: {self.binary} ({exc})") from exc
+        except BaseException:
+            self._pending.pop(req_id, None)
+            raise
+        return pending
+
+    def _dispatch_local(self, req_id: str, op: str, payload: dict, deadline: float, trace: dict) -> None:
+        # The copy stands in for the serialization boundary: handlers that adjust their payload in
+        # place must not reach back into the caller's dict.
+        frame = {"id": req_id, "op": op, "payload": dict(payload or {}), "deadline": deadline, "trace": trace}
+        task = asyncio.create_task(self._local._dispatch_frame(frame, write_frame=self._deliver_local))
+        self._local_tasks[req_id] = task
+        task.add_done_callback(lambda _t: self._local_tasks.pop(req_id, None))
+
+    async def _deliver_local(self, frame: dict) -> None:
+        self._route_frame(frame)
+
+    def _abandon(self, pending: _PendingRequest) -> None:
+        # Still pending means no terminal frame arrived: tell the service to stop working on it.
+        if self._pending.pop(pending.req_id, None) is not None:
+            self._send_cancel(pending.req_id)
+
+    def _send_cancel(self, req_id: str) -> None:
+        if self._local is not None:
+            task = self._local_tasks.get(req_id)
+            if task is not None:
+                task.cancel()
+            return
+        if not self._connected():
+            return
+        task = asyncio.create_task(self._write_cancel(req_id))
+        self._control_tasks.add(task)
+        task.add_done_callback(self._control_tasks.discard)
+
+    async def _write_cancel(self, req_id: str) -> None:
+        try:
+            await self._write(self._format.encode({"id": req_id, "control": "cancel"}))
+        except Exception:
+            pass
+
+    async def _next_frame(self, pending: _PendingRequest, op: str) -> dict:
+        try:
+            item = await asyncio.wait_for(pending.frames.get(), timeout=remaining(pending.deadline))
+        except asyncio.TimeoutError as e:
+            self._abandon(pending)
+            raise ServiceCrashedError(
+                f"rpc timeout waiting for {self.binary}:{op} (deadline passed); stderr tail:\n"
+                + "\n".join(self._stderr_tail)
+            ) from e
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+    async def request(self, op: str, payload: dict, *, stream_events: bool = False, idempotent: bool | None = None):
+        if stream_events:
+            pending = await self._send(op, payload)
+            return self._iterate_events(pending, op), pending.final
+        # A dropped connection (e.g. the service restarted) is retried for ops that are safe to
+        # repeat; start() reconnects on the next attempt.
+        retry = op in self.idempotent_ops if idempotent is None else idempotent
+        cutoff = effective_deadline(self.request_timeout_sec)
+        attempt = 0
+        while True:
+            try:
+                return await self._request_once(op, payload)
+            except ServiceCrashedError:
+                attempt += 1
+                delay = self._retry_delay(attempt)
+                if not retry or attempt > RPC_RETRY_ATTEMPTS or time.time() + delay >= cutoff:
+                    raise
+            await asyncio.sleep(delay)
+
+    def _retry_delay(self, attempt: int) -> float:
+        delay = RPC_RETRY_BASE_SEC * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+        breaker = self.breaker
+        if breaker is not None:
+            delay = max(delay, breaker.snapshot()["retry_in_sec"])
+        return delay
 
-            if not stream_events:
-                events = []
-                while True:
-                    try:
-                        frame = await asyncio.wait_for(self._read_frame(), timeout=self.request_timeout_sec)
-                    except asyncio.TimeoutError as e:
-                        raise ServiceCrashedError(
-                            f"rpc timeout waiting for {self.binary}:{op} after {self.request_timeout_sec:.0f}s; stderr tail:\n"
-                            + "\n".join(self._stderr_tail)
-                        ) from e
-                    if frame.get("id") != req_id:
-                        raise ProtocolError(f"unexpected frame id {frame.get('id')} expected {req_id}")
-                    if "event" in frame:
-                        events.append(frame)
-                        continue
-                    return events, frame
-
-            frames: list[dict] = []
-            final = None
+    async def _request_once(self, op: str, payload: dict):
+        pending = await self._send(op, payload)
+        try:
+            events = []
             while True:
-                try:
-                    frame = await asyncio.wait_for(self._read_frame(), timeout=self.request_timeout_sec)
-                except asyncio.TimeoutError as e:
-                    raise ServiceCrashedError(
-                        f"rpc timeout waiting for {self.binary}:{op} after {self.request_timeout_sec:.0f}s; stderr tail:\n"
-                        + "\n".join(self._stderr_tail)
-                    ) from e
-                if frame.get("id") != req_id:
-                    raise ProtocolError(f"unexpected frame id {frame.get('id')} expected {req_id}")
+                frame = await self._next_frame(pending, op)
                 if "event" in frame:
-                    frames.append(frame)
+                    events.append(frame)
                     continue
-                final = frame
+                return events, frame
+        finally:
+            self._abandon(pending)
+
+    async def request_many(self, items: list[tuple[str, dict]], *, sequential: bool = False,
+                           stop_on_error: bool = False) -> list[dict]:
+        """Run several ops in one round trip; returns their terminal frames (without ids) in order."""
+        if not items:
+            return []
+        _, final = await self.request("batch", {
+            "items": [{"op": op, "payload": payload} for op, payload in items],
+            "sequential": sequential,
+            "stop_on_error": stop_on_error,
+        }, idempotent=all(op in self.idempotent_ops for op, _ in items))
+        if final.get("ok"):
+            return final["result"]["results"]
+        if final.get("error_type") != "unknown_op":
+            raise ProtocolError(f"batch to {self.binary} failed: {final.get('error')}")
+        # Peer predates the batch op: fall back to one request per item.
+        if not sequential:
+            replies = await asyncio.gather(*(self.request(op, payload) for op, payload in items))
+            return [{k: v for k, v in frame.items() if k != "id"} for _, frame in replies]
+        frames = []
+        for op, payload in items:
+            _, frame = await self.request(op, payload)
+            frames.append({k: v for k, v in frame.items() if k != "id"})
+            if stop_on_error and not frame.get("ok"):
                 break
+        return frames
+
+    async def _iterate_events(self, pending: _PendingRequest, op: str) -> AsyncIterator[dict]:
+        try:
+            while True:
+                try:
+                    frame = await self._next_frame(pending, op)
+                except Exception as exc:
+                    if not pending.final.done():
+                        pending.final.set_exception(exc)
+                    raise
+                if "event" not in frame:
+                    return
+                yield frame
+        finally:
+            self._abandon(pending)
+
+
+class _PendingRequest:
+    __slots__ = ("req_id", "deadline", "frames", "final")
 
-            async def _iterate() -> AsyncIterator[dict]:
-                for frame in frames:
-                    yield frame
+    def __init__(self, req_id: str, deadline: float):
+        self.req_id = req_id
+        self.deadline = deadline
+        self.frames: asyncio.Queue = asyncio.Queue()
+        self.final: asyncio.Future = asyncio.get_running_loop().create_future()
+        # Nobody is obliged to await `final`; keep a failed one from logging "never retrieved".
+        self.final.add_done_callback(lambda fut: fut.cancelled() or fut.exception())
 
-            fut = asyncio.get_running_loop().create_future()
-            fut.set_result(final)
-            return _iterate(), fut
+    def fail(self, exc: Exception) -> None:
+        self.frames.put_nowait(exc)
+        if not self.final.done():
+            self.final.set_exception(exc)
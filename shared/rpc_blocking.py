@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Worker threads per named pool; SHERIFF_RPC_BLOCKING_POOLS="io=8,crypto=2" overrides or adds pools.
+DEFAULT_POOL_SIZES = {"io": 8, "crypto": 2}
+
+
+def _env_pool_sizes() -> dict[str, int]:
+    sizes = dict(DEFAULT_POOL_SIZES)
+    for item in os.environ.get("SHERIFF_RPC_BLOCKING_POOLS", "").split(","):
+        name, _, size = item.partition("=")
+        if name.strip() and size.strip().isdigit():
+            sizes[name.strip()] = max(1, int(size))
+    return sizes
+
+
+def blocking(pool: str = "io"):
+    """Run this op in the service's `pool` worker threads instead of on the event loop.
+
+    For handlers that are `async def` only by convention and do their work synchronously (sqlite,
+    key derivation, file IO). They run on a private loop in the worker thread, so they must not use
+    ProcClient; emit() is relayed back to the connection's loop.
+    """
+
+    def mark(handler):
+        handler.blocking = pool
+        return handler
+
+    return mark
+
+
+class BlockingPools:
+    def __init__(self, sizes: dict[str, int] | None = None):
+        self.sizes = {**_env_pool_sizes(), **(sizes or {})}
+        self._executors: dict[str, ThreadPoolExecutor] = {}
+        self._local = threading.local()
+
+    def executor(self, pool: str) -> ThreadPoolExecutor:
+        executor = self._executors.get(pool)
+        if executor is None:
+            if pool not in self.sizes:
+                raise ValueError(f"unknown blocking pool: {pool}")
+            executor = self._executors[pool] = ThreadPoolExecutor(
+                max_workers=self.sizes[pool], thread_name_prefix=f"rpc-{pool}"
+            )
+        return executor
+
+    def _drive(self, handler, payload, emit, req_id):
+        loop = getattr(self._local, "loop", None)
+        if loop is None:
+            loop = self._local.loop = asyncio.new_event_loop()
+        return loop.run_until_complete(handler(payload, emit, req_id))
+
+    async def run(self, pool: str, handler, payload, emit_event, req_id):
+        loop = asyncio.get_running_loop()
+
+        async def emit(event_name, event_payload):
+            await asyncio.wrap_future(
+                asyncio.run_coroutine_threadsafe(emit_event(event_name, event_payload), loop)
+            )
+
+        # The copied context carries the request's deadline and trace span into the worker.
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(self.executor(pool), ctx.run, self._drive, handler, payload, emit, req_id)
+
+    def shutdown(self) -> None:
+        for executor in self._executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._executors = {}
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+
+RPC_BREAKER_THRESHOLD = int(os.environ.get("SHERIFF_RPC_BREAKER_THRESHOLD", "1"))
+RPC_BREAKER_BASE_SEC = float(os.environ.get("SHERIFF_RPC_BREAKER_BASE_SEC", "0.5"))
+RPC_BREAKER_MAX_SEC = float(os.environ.get("SHERIFF_RPC_BREAKER_MAX_SEC", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Connect health of one service endpoint, shared by every ProcClient in the process.
+
+    After `threshold` consecutive connect failures the breaker opens and callers fail fast until
+    the backoff (doubling, with jitter, up to `max_sec`) runs out. Then exactly one caller gets
+    to probe the endpoint; its outcome closes the breaker or reopens it with a longer backoff.
+    """
+
+    def __init__(self, name: str, *, threshold: int | None = None, base_sec: float | None = None,
+                 max_sec: float | None = None):
+        self.name = name
+        self.threshold = max(1, threshold or RPC_BREAKER_THRESHOLD)
+        self.base_sec = RPC_BREAKER_BASE_SEC if base_sec is None else base_sec
+        self.max_sec = RPC_BREAKER_MAX_SEC if max_sec is None else max_sec
+        self.failures = 0
+        self.opened = 0
+        self.retry_at = 0.0
+        self.probing = False
+        self.last_error = ""
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.failures < self.threshold:
+            return CLOSED
+        if self.probing or time.monotonic() >= self.retry_at:
+            return HALF_OPEN
+        return OPEN
+
+    def allow(self) -> bool:
+        """Whether the caller may attempt a connect; claims the probe slot when half-open."""
+        with self._lock:
+            if self.failures < self.threshold:
+                return True
+            if self.probing or time.monotonic() < self.retry_at:
+                return False
+            self.probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened = 0
+            self.probing = False
+            self.last_error = ""
+
+    def record_failure(self, error: str = "") -> None:
+        with self._lock:
+            self.failures += 1
+            self.probing = False
+            self.last_error = error
+            if self.failures >= self.threshold:
+                backoff = min(self.max_sec, self.base_sec * (2 ** self.opened))
+                self.opened += 1
+                self.retry_at = time.monotonic() + backoff * random.uniform(0.8, 1.2)
+
+    def release(self) -> None:
+        """Give up a claimed probe without an outcome (e.g. the caller was cancelled)."""
+        with self._lock:
+            self.probing = False
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "retry_in_sec": round(max(0.0, self.retry_at - time.monotonic()), 3) if self.failures else 0.0,
+            "last_error": self.last_error,
+        }
+
+
+_BREAKERS: dict[str, CircuitBreaker] = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def breaker_for(service: str) -> CircuitBreaker:
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(service)
+        if breaker is None:
+            breaker = _BREAKERS[service] = CircuitBreaker(service)
+        return breaker
+
+
+def reset_breakers() -> None:
+    with _BREAKERS_LOCK:
+        _BREAKERS.clear()
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import time
+from contextvars import ContextVar
+
+# Absolute wall-clock deadline (epoch seconds) of the RPC request being handled in this context.
+# NDJSONService sets it around each handler; ProcClient caps nested calls with it.
+_DEADLINE: ContextVar[float | None] = ContextVar("sheriff_rpc_deadline", default=None)
+
+
+def current_deadline() -> float | None:
+    return _DEADLINE.get()
+
+
+def set_deadline(deadline: float | None):
+    return _DEADLINE.set(deadline)
+
+
+def reset_deadline(token) -> None:
+    _DEADLINE.reset(token)
+
+
+def effective_deadline(timeout_sec: float) -> float:
+    deadline = time.time() + timeout_sec
+    inherited = _DEADLINE.get()
+    return deadline if inherited is None else min(deadline, inherited)
+
+
+def remaining(deadline: float | None) -> float | None:
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.time())
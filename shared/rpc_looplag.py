@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+import weakref
+
+from shared.rpc_metrics import LatencyHistogram
+
+LOOP_LAG_INTERVAL_SEC = float(os.environ.get("SHERIFF_LOOP_LAG_INTERVAL_SEC", "0.25"))
+LOOP_STALL_MS = float(os.environ.get("SHERIFF_LOOP_STALL_MS", "250"))
+STALL_STACK_FRAMES = 12
+
+
+def _enabled() -> bool:
+    v = os.environ.get("SHERIFF_LOOP_MONITOR", "1").strip().lower()
+    return v not in {"0", "false", "no", "off"}
+
+
+class LoopLagMonitor:
+    """Samples how late the event loop wakes up and catches whatever is blocking it.
+
+    A task sleeps for `interval` and records the overshoot as loop lag. A watchdog thread checks
+    that the task keeps beating; once the loop has been stuck for `stall_ms` it grabs the loop
+    thread's stack, so the op log names the call that blocked it rather than only its duration.
+    """
+
+    def __init__(self, island: str, *, interval: float | None = None, stall_ms: float | None = None):
+        self.island = island
+        self.interval = LOOP_LAG_INTERVAL_SEC if interval is None else interval
+        self.stall_ms = LOOP_STALL_MS if stall_ms is None else stall_ms
+        self.services: set[str] = set()
+        self.lag = LatencyHistogram()
+        self.stalls = 0
+        self.last_stall: dict | None = None
+        self._beat = time.monotonic()
+        self._stalled = False
+        self._loop_thread: int | None = None
+        self._task: asyncio.Task | None = None
+        self._stop: threading.Event | None = None
+        self._log = None
+
+    def _logger(self):
+        if self._log is None:
+            from shared.oplog import get_op_logger
+
+            self._log = get_op_logger("loop-lag", island=self.island)
+        return self._log
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop = threading.Event()
+        self._task = asyncio.get_running_loop().create_task(self._sample())
+        threading.Thread(target=self._watch, args=(self._stop,), name="loop-lag-watchdog", daemon=True).start()
+
+    def stop(self) -> None:
+        if self._stop is not None:
+            self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _sample(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.lag.record(lag)
+            self._beat = time.monotonic()
+            if self._stalled:
+                self._stalled = False
+                if self.last_stall is not None:
+                    self.last_stall["blocked_ms"] = round(lag * 1000, 1)
+                self._logger().warning("event loop of %s recovered after %.0fms",
+                                       ",".join(sorted(self.services)), lag * 1000)
+
+    def _watch(self, stop: threading.Event) -> None:
+        while not stop.wait(self.interval):
+            blocked_ms = (time.monotonic() - self._beat - self.interval) * 1000
+            if self._stalled or blocked_ms < self.stall_ms:
+                continue
+            self._stalled = True
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = "".join(traceback.format_stack(frame)[-STALL_STACK_FRAMES:]) if frame is not None else ""
+            self.stalls += 1
+            self.last_stall = {"at": round(time.time(), 3), "blocked_ms": round(blocked_ms, 1), "stack": stack}
+            self._logger().warning("event loop of %s blocked for >%.0fms; loop thread stack:\n%s",
+                                   ",".join(sorted(self.services)), blocked_ms, stack)
+
+    def snapshot(self) -> dict:
+        return {
+            "lag_p50_ms": round(self.lag.percentile_us(50) / 1000, 3),
+            "lag_p99_ms": round(self.lag.percentile_us(99) / 1000, 3),
+            "lag_max_ms": round(self.lag.max_us / 1000, 3),
+            "stalls": self.stalls,
+            "last_stall": self.last_stall,
+        }
+
+
+# One monitor per event loop: services co-hosted in one process share (and report) the same loop.
+_MONITORS: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def attach_loop_monitor(service: str, island: str) -> LoopLagMonitor | None:
+    if not _enabled():
+        return None
+    loop = asyncio.get_running_loop()
+    monitor = _MONITORS.get(loop)
+    if monitor is None:
+        monitor = _MONITORS[loop] = LoopLagMonitor(island)
+    monitor.services.add(service)
+    monitor.start()
+    return monitor
+
+
+def detach_loop_monitor(monitor: LoopLagMonitor | None, service: str) -> None:
+    if monitor is None:
+        return
+    monitor.services.discard(service)
+    if not monitor.services:
+        monitor.stop()
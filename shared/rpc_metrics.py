@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import math
+import time
+
+# Log-linear buckets in the spirit of HdrHistogram: 2**SUB_BITS linear steps per power of two
+# keep any recorded value within ~3% of its bucket bound while the whole range stays sparse.
+SUB_BITS = 5
+_SUB_MASK = (1 << SUB_BITS) - 1
+
+
+def _bucket_index(value_us: int) -> int:
+    if value_us < (1 << SUB_BITS):
+        return value_us
+    shift = value_us.bit_length() - SUB_BITS
+    return (shift << SUB_BITS) + (value_us >> shift)
+
+
+def _bucket_upper(index: int) -> int:
+    shift = index >> SUB_BITS
+    return (((index & _SUB_MASK) + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    def __init__(self) -> None:
+        self.counts: dict[int, int] = {}
+        self.total = 0
+        self.sum_us = 0
+        self.max_us = 0
+
+    def record(self, seconds: float) -> None:
+        value_us = max(0, int(seconds * 1_000_000))
+        idx = _bucket_index(value_us)
+        self.counts[idx] = self.counts.get(idx, 0) + 1
+        self.total += 1
+        self.sum_us += value_us
+        self.max_us = max(self.max_us, value_us)
+
+    def percentile_us(self, pct: float) -> int:
+        if not self.total:
+            return 0
+        rank = max(1, math.ceil(pct / 100.0 * self.total))
+        seen = 0
+        for idx in sorted(self.counts):
+            seen += self.counts[idx]
+            if seen >= rank:
+                return min(_bucket_upper(idx), self.max_us)
+        return self.max_us
+
+
+class OpStats:
+    def __init__(self) -> None:
+        self.count = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.in_flight = 0
+        self.latency = LatencyHistogram()
+
+    def snapshot(self) -> dict:
+        hist = self.latency
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "in_flight": self.in_flight,
+            "mean_ms": round(hist.sum_us / hist.total / 1000, 3) if hist.total else 0.0,
+            "p50_ms": round(hist.percentile_us(50) / 1000, 3),
+            "p95_ms": round(hist.percentile_us(95) / 1000, 3),
+            "p99_ms": round(hist.percentile_us(99) / 1000, 3),
+            "max_ms": round(hist.max_us / 1000, 3),
+        }
+
+
+class ServiceMetrics:
+    """Per-op counters, in-flight gauges and latency histograms for one NDJSONService."""
+
+    def __init__(self) -> None:
+        self.started_at = time.time()
+        self.ops: dict[str, OpStats] = {}
+
+    def _stats(self, op: str) -> OpStats:
+        stats = self.ops.get(op)
+        if stats is None:
+            stats = self.ops[op] = OpStats()
+        return stats
+
+    def begin(self, op: str) -> float:
+        self._stats(op).in_flight += 1
+        return time.perf_counter()
+
+    def end(self, op: str, started: float, outcome: str = "ok") -> None:
+        stats = self._stats(op)
+        stats.in_flight -= 1
+        stats.count += 1
+        if outcome == "error":
+            stats.errors += 1
+        elif outcome == "cancelled":
+            stats.cancelled += 1
+        stats.latency.record(time.perf_counter() - started)
+
+    def snapshot(self) -> dict:
+        return {
+            "uptime_sec": round(time.time() - self.started_at, 1),
+            "ops": {op: stats.snapshot() for op, stats in sorted(self.ops.items())},
+        }
+
+    def reset(self) -> None:
+        in_flight = {op: stats.in_flight for op, stats in self.ops.items() if stats.in_flight}
+        self.started_at = time.time()
+        self.ops = {}
+        for op, count in in_flight.items():
+            self._stats(op).in_flight = count
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import mmap
+import os
+import time
+import uuid
+from pathlib import Path
+
+from shared.paths import gw_root, llm_root
+
+OOB_KEY = "$oob"
+RPC_OOB_THRESHOLD = int(os.environ.get("SHERIFF_RPC_OOB_THRESHOLD", str(256 * 1024)))
+RPC_OOB_TTL_SEC = float(os.environ.get("SHERIFF_RPC_OOB_TTL_SEC", "3600"))
+
+_swept: set[str] = set()
+
+
+def oob_dir(island: str) -> Path:
+    root = gw_root() if island == "gw" else llm_root()
+    path = root / "run" / "oob"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _dedicated_llm_user() -> bool:
+    if os.environ.get("SHERIFF_AI_WORKER_USER", "").strip():
+        return True
+    try:
+        return bool((gw_root() / "state" / "ai_worker_user.txt").read_text(encoding="utf-8").strip())
+    except OSError:
+        return False
+
+
+def oob_file_mode(island: str) -> int:
+    """Mode of new spill files, which hold prompts and tool output.
+
+    Owner-only, or group-readable when the llm island runs as a dedicated OS user that shares the
+    directory with the gateway. Unlike the island's socket mode, never world-accessible.
+    """
+    if island == "llm" and _dedicated_llm_user():
+        return 0o640
+    return 0o600
+
+
+def _valid_name(name) -> bool:
+    return isinstance(name, str) and bool(name) and "/" not in name and "\\" not in name and not name.startswith(".")
+
+
+def sweep_oob_dir(directory: Path, *, ttl_sec: float = RPC_OOB_TTL_SEC) -> int:
+    """Remove spill files whose last link change is older than ttl_sec (peers that died mid-frame)."""
+    cutoff = time.time() - ttl_sec
+    removed = 0
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_file(follow_symlinks=False) and entry.stat(follow_symlinks=False).st_ctime < cutoff:
+                os.unlink(entry.path)
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+class OOBStr(str):
+    """A string that arrived through a spill file.
+
+    It keeps one hard link to the file for as long as it is alive, so forwarding it to the next
+    hop is a link() instead of a rewrite; the link is dropped when the string is collected.
+    """
+
+    def __del__(self):
+        path = self.__dict__.get("oob_path")
+        if path is not None:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+class OOBChannel:
+    """Moves large strings of a frame into spill files under a directory both peers can reach."""
+
+    def __init__(self, directory: str | os.PathLike, *, threshold: int = RPC_OOB_THRESHOLD, file_mode: int = 0o600):
+        self.directory = Path(directory)
+        self.threshold = max(1, int(threshold))
+        self.file_mode = file_mode
+        key = str(self.directory)
+        if key not in _swept:
+            _swept.add(key)
+            sweep_oob_dir(self.directory)
+
+    def spill(self, frame: dict) -> dict:
+        # Copy-on-write: containers are only copied along the path to a spilled string, so the
+        # caller's objects are never modified.
+        return self._spill_value(frame)
+
+    def _spill_value(self, value):
+        if isinstance(value, str):
+            return self._spill_str(value) if len(value) >= self.threshold else value
+        if isinstance(value, dict):
+            out = None
+            for key, item in value.items():
+                new = self._spill_value(item)
+                if new is not item:
+                    if out is None:
+                        out = dict(value)
+                    out[key] = new
+            return value if out is None else out
+        if isinstance(value, list):
+            out = None
+            for idx, item in enumerate(value):
+                new = self._spill_value(item)
+                if new is not item:
+                    if out is None:
+                        out = list(value)
+                    out[idx] = new
+            return value if out is None else out
+        return value
+
+    def _spill_str(self, value: str) -> dict:
+        name = f"{uuid.uuid4().hex}.oob"
+        target = self.directory / name
+        source = value.__dict__.get("oob_path") if isinstance(value, OOBStr) else None
+        if source is not None:
+            try:
+                os.link(source, target)
+                return {OOB_KEY: name, "size": value.oob_size}
+            except OSError:
+                pass
+        data = value.encode("utf-8")
+        fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_EXCL, self.file_mode)
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        return {OOB_KEY: name, "size": len(data)}
+
+    def restore(self, frame):
+        # Received frames are freshly decoded and owned by the reader, so handles are replaced in place.
+        if isinstance(frame, dict):
+            if OOB_KEY in frame and len(frame) == 2 and "size" in frame:
+                return self._load(frame)
+            for key, item in frame.items():
+                if isinstance(item, (dict, list)):
+                    frame[key] = self.restore(item)
+        elif isinstance(frame, list):
+            for idx, item in enumerate(frame):
+                if isinstance(item, (dict, list)):
+                    frame[idx] = self.restore(item)
+        return frame
+
+    def _load(self, handle: dict) -> OOBStr:
+        name = handle.get(OOB_KEY)
+        if not _valid_name(name):
+            raise ValueError(f"invalid oob handle: {name!r}")
+        path = self.directory / name
+        try:
+            # O_NOFOLLOW: a peer must not be able to point a handle at another file through a symlink.
+            fd = os.open(path, os.O_RDONLY | os.O_NOFOLLOW)
+            with os.fdopen(fd, "rb") as fh:
+                with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    with memoryview(mm) as view:
+                        text = OOBStr(view, "utf-8")
+        except OSError as exc:
+            raise ValueError(f"oob payload unavailable: {name} ({exc})") from exc
+        text.oob_path = str(path)
+        text.oob_size = int(handle.get("size") or 0)
+        return text
+
+
+def make_probe(directory: Path) -> Path:
+    probe = directory / f"probe-{uuid.uuid4().hex}"
+    fd = os.open(probe, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    os.close(fd)
+    return probe
+
+
+def accept_oob(payload: dict, expected: Path, *, threshold: int = RPC_OOB_THRESHOLD,
+               file_mode: int = 0o600) -> OOBChannel | None:
+    """Server side of the handshake: use the offered directory only if it is our island's spill
+    directory (`expected`) and we see the client's probe in it."""
+    if threshold <= 0:
+        return None
+    directory = payload.get("oob_dir")
+    probe = payload.get("oob_probe")
+    if not isinstance(directory, str) or not _valid_name(probe):
+        return None
+    try:
+        if Path(directory).resolve() != expected.resolve():
+            return None
+    except OSError:
+        return None
+    probe_path = expected / probe
+    if probe_path.is_symlink() or not probe_path.is_file() or not os.access(expected, os.R_OK | os.W_OK | os.X_OK):
+        return None
+    return OOBChannel(expected, threshold=threshold, file_mode=file_mode)
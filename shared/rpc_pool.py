@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import os
+import threading
+
+from shared.proc_rpc import ProcClient
+
+RPC_POOL_IDLE_SEC = float(os.environ.get("SHERIFF_RPC_POOL_IDLE_SEC", "300"))
+
+_CLIENTS: dict[tuple[str, bool, bool], ProcClient] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def pooled_client(service: str, *, spawn_fallback: bool = False, circuit_breaker: bool = True) -> ProcClient:
+    """The process-wide client for `service`.
+
+    Every caller in the process shares one multiplexed connection per service instead of opening
+    (and often leaking) its own. Don't close the returned client: its connection is closed after
+    SHERIFF_RPC_POOL_IDLE_SEC without traffic and reopened on the next request.
+    """
+    key = (service, spawn_fallback, circuit_breaker)
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            client = ProcClient(service, spawn_fallback=spawn_fallback, circuit_breaker=circuit_breaker)
+            client.idle_timeout_sec = RPC_POOL_IDLE_SEC
+            _CLIENTS[key] = client
+        return client
+
+
+async def close_pool() -> None:
+    with _CLIENTS_LOCK:
+        clients = list(_CLIENTS.values())
+        _CLIENTS.clear()
+    for client in clients:
+        await client.close()
+
+
+def reset_pool() -> None:
+    """Forget pooled clients without closing them (their loop may already be gone)."""
+    with _CLIENTS_LOCK:
+        _CLIENTS.clear()
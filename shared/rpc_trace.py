@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from shared.paths import gw_root, llm_root
+
+# (trace_id, span_id) of the span running in this context: set around each RPC handler by
+# NDJSONService and read by ProcClient to stamp outgoing frames.
+_SPAN: ContextVar[tuple[str, str] | None] = ContextVar("sheriff_rpc_span", default=None)
+
+
+def _enabled() -> bool:
+    v = os.environ.get("SHERIFF_TRACE_ENABLED", "1").strip().lower()
+    return v not in {"0", "false", "no", "off"}
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+def new_span_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def current_trace_id() -> str | None:
+    span = _SPAN.get()
+    return span[0] if span is not None else None
+
+
+def outgoing_trace() -> dict:
+    """Trace context for a new request frame; starts a fresh trace outside of any span."""
+    span = _SPAN.get()
+    if span is None:
+        return {"trace_id": new_trace_id()}
+    return {"trace_id": span[0], "parent_span_id": span[1]}
+
+
+def trace_dirs() -> list[Path]:
+    return [gw_root() / "logs" / "trace", llm_root() / "logs" / "trace"]
+
+
+class SpanRecorder:
+    """Appends finished spans of one service to <island>/logs/trace/<service>.jsonl."""
+
+    def __init__(self, service: str, island: str):
+        self.service = service
+        self.island = island
+        self._log = None
+
+    def _file(self):
+        if self._log is None:
+            # oplog stamps trace ids from this module, so import it lazily to keep the graph acyclic.
+            from shared.oplog import RotatingTextLog
+
+            root = gw_root() if self.island == "gw" else llm_root()
+            self._log = RotatingTextLog(root / "logs" / "trace" / f"{self.service}.jsonl")
+        return self._log
+
+    def record(self, row: dict) -> None:
+        if _enabled():
+            self._file().append(json.dumps(row, ensure_ascii=False) + "\n")
+
+    @contextmanager
+    def span(self, op: str, trace: dict | None):
+        trace = trace if isinstance(trace, dict) else {}
+        trace_id = str(trace.get("trace_id") or "") or new_trace_id()
+        span_id = new_span_id()
+        row = {
+            "trace_id": trace_id,
+            "span_id": span_id,
+            "parent_span_id": trace.get("parent_span_id"),
+            "service": self.service,
+            "op": op,
+            "start": time.time(),
+            "outcome": "ok",
+        }
+        token = _SPAN.set((trace_id, span_id))
+        started = time.perf_counter()
+        try:
+            yield row
+        finally:
+            _SPAN.reset(token)
+            row["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+            self.record(row)
+
+
+@contextmanager
+def root_span(recorder: SpanRecorder, op: str):
+    """Open a new trace for work that does not start from an RPC request (e.g. an inbound chat message)."""
+    with recorder.span(op, None) as row:
+        yield row
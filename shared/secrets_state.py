@@ -6,6 +6,7 @@ import os
 import random
 import sqlite3
 import string
+import threading
 import time
 from pathlib import Path
 
@@ -24,6 +25,9 @@ class SecretsState:
         self.verifier_path = verifier_path if not self.debug_mode else verifier_path.with_name("master.debug.json")
         self.session_path = verifier_path.parent / "secrets_session.json"
         self._password: str | None = None
+        # Serializes writers: ops run concurrently on the service's worker threads, and the secrets
+        # and identity blobs are read-modify-write.
+        self._write_lock = threading.RLock()
         self._load_session_unlock()
 
     @staticmethod
@@ -67,16 +71,18 @@ class SecretsState:
         )
         return conn
 
-    def _db_set(self, key: str, value) -> None:
-        self._require()
+    def _db_set(self, key: str, value, password: str | None = None) -> None:
+        if password is None:
+            self._require()
+            password = self._password
         if self.debug_mode:
             k_enc = key
             v_enc = json.dumps(self._sanitize_for_debug(key, value), ensure_ascii=False)
         else:
-            assert self._password is not None
-            k_enc = encrypt_text(key, self._password)
-            v_enc = encrypt_text(json.dumps(value), self._password)
-        with self._db_connect() as conn:
+            assert password is not None
+            k_enc = encrypt_text(key, password)
+            v_enc = encrypt_text(json.dumps(value), password)
+        with self._write_lock, self._db_connect() as conn:
             conn.execute(
                 """
                 INSERT INTO kv(key_hash, key_enc, value_enc, updated_at)
@@ -150,9 +156,8 @@ class SecretsState:
         with self._db_connect() as conn:
             conn.execute("DELETE FROM kv")
             conn.commit()
-        self._password = password
         for k, v in legacy.items():
-            self._db_set(k, v)
+            self._db_set(k, v, password)
 
     def _save_session_unlock(self, password: str) -> None:
         self.session_path.parent.mkdir(parents=True, exist_ok=True)
@@ -180,21 +185,22 @@ class SecretsState:
     def initialize(self, payload: dict) -> None:
         password = "debug" if self.debug_mode else payload["master_password"]
         state = self._default_state(payload)
-        self.verifier_path.parent.mkdir(parents=True, exist_ok=True)
-        self.verifier_path.write_text(json.dumps({"hash": self._hash(password)}), encoding="utf-8")
+        with self._write_lock:
+            self.verifier_path.parent.mkdir(parents=True, exist_ok=True)
+            self.verifier_path.write_text(json.dumps({"hash": self._hash(password)}), encoding="utf-8")
 
-        # fresh sqlite init
-        if self.db_path.exists() and not self._is_sqlite():
-            self.db_path.unlink(missing_ok=True)
-        with self._db_connect() as conn:
-            conn.execute("DELETE FROM kv")
-            conn.commit()
+            # fresh sqlite init
+            if self.db_path.exists() and not self._is_sqlite():
+                self.db_path.unlink(missing_ok=True)
+            with self._db_connect() as conn:
+                conn.execute("DELETE FROM kv")
+                conn.commit()
 
-        self._password = password
-        for k, v in state.items():
-            self._db_set(k, v)
-        self._password = None
-        self._clear_session_unlock()
+            # Written with the new password directly, so the vault never reads as unlocked meanwhile.
+            for k, v in state.items():
+                self._db_set(k, v, password)
+            self._password = None
+            self._clear_session_unlock()
 
     def verify_master_password(self, password: str) -> bool:
         if self.debug_mode:
@@ -232,18 +238,20 @@ class SecretsState:
     def unlock(self, password: str) -> bool:
         if not self.verify_master_password(password):
             return False
-        self._migrate_legacy_if_needed(password)
-        if not self.db_path.exists():
-            # initialize empty schema
-            with self._db_connect() as conn:
-                conn.commit()
-        self._password = password
-        self._save_session_unlock(password)
+        with self._write_lock:
+            self._migrate_legacy_if_needed(password)
+            if not self.db_path.exists():
+                # initialize empty schema
+                with self._db_connect() as conn:
+                    conn.commit()
+            self._password = password
+            self._save_session_unlock(password)
         return True
 
     def lock(self) -> None:
-        self._password = None
-        self._clear_session_unlock()
+        with self._write_lock:
+            self._password = None
+            self._clear_session_unlock()
 
     def is_unlocked(self) -> bool:
         if self._password is None:
@@ -269,9 +277,10 @@ class SecretsState:
         return secrets.get(handle)
 
     def set_secret(self, handle: str, value: str) -> None:
-        secrets = self._db_get("secrets", {})
-        secrets[handle] = value
-        self._db_set("secrets", secrets)
+        with self._write_lock:
+            secrets = self._db_get("secrets", {})
+            secrets[handle] = value
+            self._db_set("secrets", secrets)
 
     def ensure_handle(self, handle: str) -> bool:
         secrets = self._db_get("secrets", {})
@@ -316,24 +325,26 @@ class SecretsState:
         return ident
 
     def create_activation_code(self, bot_role: str, user_id: str) -> str:
-        ident = self._ensure_identity_shape()
-        pending = ident["pending_activation"].setdefault(bot_role, {})
-        alphabet = string.ascii_uppercase + string.digits
-        code = "".join(random.choice(alphabet) for _ in range(6))
-        pending[code] = str(user_id)
-        self.save_identity(ident)
+        with self._write_lock:
+            ident = self._ensure_identity_shape()
+            pending = ident["pending_activation"].setdefault(bot_role, {})
+            alphabet = string.ascii_uppercase + string.digits
+            code = "".join(random.choice(alphabet) for _ in range(6))
+            pending[code] = str(user_id)
+            self.save_identity(ident)
         return code
 
     def activate_with_code(self, bot_role: str, code: str) -> str | None:
-        ident = self._ensure_identity_shape()
-        pending = ident["pending_activation"].setdefault(bot_role, {})
-        user_id = pending.pop(code, None)
-        if user_id is None:
-            return None
-        ident["bot_bindings"][bot_role] = str(user_id)
-        if str(user_id) not in ident["allowed_ids"]:
-            ident["allowed_ids"].append(str(user_id))
-        self.save_identity(ident)
+        with self._write_lock:
+            ident = self._ensure_identity_shape()
+            pending = ident["pending_activation"].setdefault(bot_role, {})
+            user_id = pending.pop(code, None)
+            if user_id is None:
+                return None
+            ident["bot_bindings"][bot_role] = str(user_id)
+            if str(user_id) not in ident["allowed_ids"]:
+                ident["allowed_ids"].append(str(user_id))
+            self.save_identity(ident)
         return str(user_id)
 
     def get_bound_user(self, bot_role: str) -> str | None:
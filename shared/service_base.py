@@ -4,34 +4,193 @@ import asyncio
 import json
 import os
 import sys
+import time
 import traceback
 from collections.abc import Awaitable, Callable
+from pathlib import Path
 from typing import Any
 
-from shared.ndjson import encode_frame
+from shared.ndjson import FrameFormat, choose_codec, codec_names
 from shared.protocol import error_response, ok_response
+from shared.rpc_blocking import BlockingPools
+from shared.rpc_deadline import current_deadline, remaining, reset_deadline, set_deadline
+from shared.rpc_looplag import attach_loop_monitor, detach_loop_monitor
+from shared.rpc_metrics import ServiceMetrics
+from shared.rpc_trace import SpanRecorder, outgoing_trace
+from shared.rpc_oob import accept_oob, oob_dir, oob_file_mode
+from shared.service_registry import rpc_socket_mode
 
 Handler = Callable[[dict[str, Any], Callable[[str, dict[str, Any]], Awaitable[None]], str], Awaitable[dict[str, Any]]]
 RPC_STREAM_LIMIT = 10 * 1024 * 1024
+RPC_MAX_CONCURRENCY = int(os.environ.get("SHERIFF_RPC_MAX_CONCURRENCY", "64"))
+RPC_BATCH_MAX_ITEMS = int(os.environ.get("SHERIFF_RPC_BATCH_MAX_ITEMS", "256"))
+RPC_WRITE_HIGH_WATER = int(os.environ.get("SHERIFF_RPC_WRITE_HIGH_WATER", str(1024 * 1024)))
+RPC_WRITE_FLUSH_SEC = 5.0
+
+
+def idempotent(handler):
+    """Mark an op handler as safe to run twice; clients learn this from `meta` and retry it on reconnect."""
+    handler.idempotent = True
+    return handler
+
+
+class OutboundQueue:
+    """Per-connection outbound frames, written by one task so that bursts go out in a single write.
+
+    `send` only queues; once more than `high_water` bytes are waiting it blocks the sender (and so
+    the handler's `emit`) until the writer catches up.
+    """
+
+    def __init__(self, write_bytes: Callable[[bytes], Awaitable[None]], *, high_water: int | None = None):
+        self._write_bytes = write_bytes
+        self.high_water = max(1, high_water or RPC_WRITE_HIGH_WATER)
+        self._chunks: list[bytes] = []
+        self._size = 0
+        self._ready = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._error: BaseException | None = None
+        self._closing = False
+        self._task: asyncio.Task | None = None
+
+    def put(self, data: bytes) -> None:
+        if self._error is not None:
+            raise ConnectionResetError(f"connection lost: {self._error}")
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        self._chunks.append(data)
+        self._size += len(data)
+        self._ready.set()
+        if self._size > self.high_water:
+            self._drained.clear()
+
+    async def send(self, data: bytes) -> None:
+        self.put(data)
+        await self._drained.wait()
+        if self._error is not None:
+            raise ConnectionResetError(f"connection lost: {self._error}")
+
+    async def _run(self) -> None:
+        while True:
+            if not self._chunks:
+                if self._closing:
+                    return
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            data = b"".join(self._chunks) if len(self._chunks) > 1 else self._chunks[0]
+            self._chunks = []
+            self._size = 0
+            try:
+                await self._write_bytes(data)
+            except Exception as exc:  # noqa: BLE001
+                self._error = exc
+                self._chunks = []
+                self._drained.set()
+                return
+            if self._size <= self.high_water:
+                self._drained.set()
+
+    async def close(self, timeout: float = RPC_WRITE_FLUSH_SEC) -> None:
+        """Flush what is queued (for at most `timeout` seconds), then stop the writer task."""
+        task = self._task
+        if task is None:
+            return
+        self._closing = True
+        self._ready.set()
+        try:
+            await asyncio.wait_for(task, timeout)
+        except asyncio.TimeoutError:
+            pass
 
 
 class NDJSONService:
-    def __init__(self, *, name: str, island: str, kind: str, version: str, ops: dict[str, Handler]):
+    def __init__(
+            self,
+            *,
+            name: str,
+            island: str,
+            kind: str,
+            version: str,
+            ops: dict[str, Handler],
+            max_concurrency: int | None = None,
+            blocking_pools: dict[str, int] | None = None,
+    ):
         self.name = name
         self.island = island
         self.kind = kind
         self.version = version
         self.debug_mode = os.environ.get("SHERIFF_DEBUG", "").strip().lower() in {"1", "true", "yes"}
+        self.max_concurrency = max(1, int(max_concurrency or RPC_MAX_CONCURRENCY))
+        self.metrics = ServiceMetrics()
+        self.tracer = SpanRecorder(name, island)
+        self.blocking = BlockingPools(blocking_pools)
+        self.loop_monitor = None
         self.ops = dict(ops)
         self.ops.setdefault("meta", self._meta)
         self.ops.setdefault("health", self._health)
+        self.ops.setdefault("metrics", self._metrics)
+        self.ops.setdefault("batch", self._batch)
+
+    def idempotent_ops(self) -> list[str]:
+        return sorted(op for op, handler in self.ops.items() if getattr(handler, "idempotent", False))
 
+    @idempotent
     async def _meta(self, payload: dict, emit_event, req_id: str) -> dict:
         return {"name": self.name, "island": self.island, "kind": self.kind, "version": self.version,
-                "ops": sorted(self.ops.keys())}
+                "ops": sorted(self.ops.keys()), "idempotent": self.idempotent_ops(), "codecs": codec_names()}
 
+    @idempotent
     async def _health(self, payload: dict, emit_event, req_id: str) -> dict:
-        return {"status": "ok"}
+        if self.loop_monitor is None:
+            return {"status": "ok"}
+        loop = self.loop_monitor.snapshot()
+        return {"status": "ok", "loop": {"lag_p99_ms": loop["lag_p99_ms"], "stalls": loop["stalls"]}}
+
+    async def _metrics(self, payload: dict, emit_event, req_id: str) -> dict:
+        snapshot = {"name": self.name, **self.metrics.snapshot()}
+        if self.loop_monitor is not None:
+            snapshot["loop"] = self.loop_monitor.snapshot()
+        if payload.get("reset"):
+            self.metrics.reset()
+        return snapshot
+
+    async def _batch(self, payload: dict, emit_event, req_id: str) -> dict:
+        items = payload.get("items")
+        if not isinstance(items, list):
+            raise ValueError("batch items must be a list")
+        if len(items) > RPC_BATCH_MAX_ITEMS:
+            raise ValueError(f"batch of {len(items)} items exceeds the limit of {RPC_BATCH_MAX_ITEMS}")
+        results: list[dict[str, Any] | None] = [None] * len(items)
+
+        async def run(index: int, item: Any) -> None:
+            if not isinstance(item, dict) or item.get("op") == "batch":
+                results[index] = error_response("", "batch items must be {op, payload} objects", "protocol_error")
+                return
+
+            async def capture(frame: dict[str, Any]) -> None:
+                if "event" in frame:
+                    await emit_event(frame["event"], {**frame["payload"], "batch_index": index})
+                    return
+                frame.pop("id", None)
+                results[index] = frame
+
+            # Each item is dispatched like a request of its own (span, metrics, deadline) under the
+            # batch's deadline and as a child of the batch span.
+            await self._dispatch_frame(
+                {"id": f"{req_id}:{index}", "op": item.get("op"), "payload": item.get("payload") or {},
+                 "deadline": current_deadline(), "trace": outgoing_trace()},
+                write_frame=capture,
+            )
+
+        if payload.get("sequential"):
+            for index, item in enumerate(items):
+                await run(index, item)
+                if payload.get("stop_on_error") and not results[index].get("ok"):
+                    break
+        else:
+            await asyncio.gather(*(run(index, item) for index, item in enumerate(items)))
+        return {"results": [frame for frame in results if frame is not None]}
 
     async def _dispatch_line(
             self,
@@ -39,66 +198,220 @@ class NDJSONService:
             *,
             write_frame: Callable[[dict[str, Any]], Awaitable[None]],
     ) -> None:
-        req = json.loads(text)
+        try:
+            req = json.loads(text)
+        except ValueError as exc:
+            await write_frame(error_response("", f"invalid frame: {exc}", "protocol_error"))
+            return
+        await self._dispatch_frame(req, write_frame=write_frame)
+
+    async def _dispatch_frame(
+            self,
+            req: dict[str, Any],
+            *,
+            write_frame: Callable[[dict[str, Any]], Awaitable[None]],
+    ) -> None:
         req_id = req.get("id", "")
         op = req.get("op")
         payload = req.get("payload") or {}
+        deadline = req.get("deadline")
+        if isinstance(deadline, bool) or not isinstance(deadline, (int, float)):
+            deadline = None
         handler = self.ops.get(op)
         if not handler:
             await write_frame(error_response(req_id, f"unknown op: {op}", "unknown_op"))
             return
+        if deadline is not None and deadline <= time.time():
+            await write_frame(error_response(req_id, f"deadline exceeded before {op} started", "deadline_exceeded"))
+            return
 
         async def emit(event_name: str, event_payload: dict[str, Any]) -> None:
             await write_frame({"id": req_id, "event": event_name, "payload": event_payload})
 
+        # Nested ProcClient calls made by the handler inherit the caller's deadline and trace.
+        with self.tracer.span(op, req.get("trace")) as span:
+            token = set_deadline(deadline)
+            started = self.metrics.begin(op)
+            outcome = "error"
+            try:
+                pool = getattr(handler, "blocking", None)
+                call = (self.blocking.run(pool, handler, payload, emit, req_id) if pool
+                        else handler(payload, emit, req_id))
+                result = await asyncio.wait_for(call, remaining(deadline))
+                outcome = "ok"
+                await write_frame(ok_response(req_id, result or {}))
+            except asyncio.CancelledError:
+                outcome = "cancelled"
+                raise
+            except Exception as exc:  # noqa: BLE001
+                if isinstance(exc, asyncio.TimeoutError) and deadline is not None and time.time() >= deadline:
+                    outcome = "deadline_exceeded"
+                    await write_frame(
+                        error_response(req_id, f"deadline exceeded while handling {op}", "deadline_exceeded")
+                    )
+                    return
+                print(traceback.format_exc(), file=sys.stderr)
+                await write_frame(error_response(req_id, str(exc), exc.__class__.__name__))
+            finally:
+                span["outcome"] = outcome
+                self.metrics.end(op, started, "error" if outcome == "deadline_exceeded" else outcome)
+                reset_deadline(token)
+
+    async def _serve_connection(
+            self,
+            reader: asyncio.StreamReader,
+            write_bytes: Callable[[bytes], Awaitable[None]],
+    ) -> None:
+        # Each request runs in its own task so a slow handler never stalls later requests on the
+        # same connection. The semaphore bounds running handlers; it is taken inside the task so the
+        # read loop keeps reading cancel and meta frames while every slot is busy.
+        fmt = FrameFormat()
+        outbox = OutboundQueue(write_bytes)
+        slots = asyncio.Semaphore(self.max_concurrency)
+        tasks: set[asyncio.Task] = set()
+        running: dict[str, asyncio.Task] = {}
+
+        async def write_frame(frame: dict[str, Any]) -> None:
+            # Encoding and queueing happen without a suspension point, so frames keep their order.
+            await outbox.send(fmt.encode(frame))
+
+        async def dispatch(req: dict[str, Any]) -> None:
+            async with slots:
+                await self._dispatch_frame(req, write_frame=write_frame)
+
+        def _done(task: asyncio.Task, req_id: str) -> None:
+            tasks.discard(task)
+            if running.get(req_id) is task:
+                del running[req_id]
+
         try:
-            result = await handler(payload, emit, req_id)
-            await write_frame(ok_response(req_id, result or {}))
-        except Exception as exc:  # noqa: BLE001
-            print(traceback.format_exc(), file=sys.stderr)
-            await write_frame(error_response(req_id, str(exc), exc.__class__.__name__))
+            while True:
+                try:
+                    req = await fmt.read(reader)
+                except ValueError as exc:
+                    await write_frame(error_response("", f"invalid frame: {exc}", "protocol_error"))
+                    continue
+                if req is None:
+                    break
+                if not isinstance(req, dict):
+                    await write_frame(error_response("", "invalid frame: expected an object", "protocol_error"))
+                    continue
+                if req.get("control") == "cancel":
+                    # The caller gave up (timeout, disconnect of its own caller); stop the work.
+                    target = running.get(str(req.get("id", "")))
+                    if target is not None:
+                        target.cancel()
+                    continue
+                if req.get("op") == "meta" and {"codecs", "oob_dir"} & set(req.get("payload") or {}):
+                    await self._handshake(req, fmt, outbox)
+                    continue
+                req_id = str(req.get("id", ""))
+                task = asyncio.create_task(dispatch(req))
+                tasks.add(task)
+                running[req_id] = task
+                task.add_done_callback(lambda t, rid=req_id: _done(t, rid))
+                # Don't pin the last request (and any spill files it holds) while the connection idles.
+                req = task = None
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            for task in list(tasks):
+                task.cancel()
+            await outbox.close()
+
+    async def _handshake(self, req: dict[str, Any], fmt: FrameFormat, outbox: OutboundQueue) -> None:
+        # Handled inline: the reply is queued in the old format and every frame after it, in both
+        # directions, uses the chosen codec and out-of-band channel.
+        payload = req.get("payload") or {}
+        offered = payload.get("codecs") or []
+        chosen = choose_codec([str(name) for name in offered]) if fmt.codec is None else None
+        oob = None
+        if fmt.oob is None:
+            oob = accept_oob(payload, oob_dir(self.island), file_mode=oob_file_mode(self.island))
+        result = await self._meta({}, None, req.get("id", ""))
+        result["codec"] = chosen or fmt.codec_name
+        if oob is not None:
+            result["oob_dir"] = str(oob.directory)
+        outbox.put(fmt.encode(ok_response(req.get("id", ""), result)))
+        if chosen is not None:
+            fmt.use(chosen)
+        if oob is not None:
+            fmt.oob = oob
+
+    def _attach_loop_monitor(self) -> None:
+        self.loop_monitor = attach_loop_monitor(self.name, self.island)
+
+    def _detach_loop_monitor(self) -> None:
+        detach_loop_monitor(self.loop_monitor, self.name)
+        self.loop_monitor = None
 
     async def run_stdio(self) -> None:
+        self._attach_loop_monitor()
+        try:
+            await self._run_stdio()
+        finally:
+            self._detach_loop_monitor()
+
+    async def _run_stdio(self) -> None:
+        loop = asyncio.get_running_loop()
         reader = asyncio.StreamReader(limit=RPC_STREAM_LIMIT)
         protocol = asyncio.StreamReaderProtocol(reader)
-        await asyncio.get_running_loop().connect_read_pipe(lambda: protocol, sys.stdin)
-        stdout = sys.stdout.buffer
-
-        async def write_frame(frame: dict[str, Any]) -> None:
-            stdout.write(encode_frame(frame))
-            stdout.flush()
+        await loop.connect_read_pipe(lambda: protocol, sys.stdin)
+        try:
+            # A non-blocking pipe transport gives writes real flow control instead of blocking the loop.
+            transport, flow = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, sys.stdout)
+        except (OSError, ValueError):
+            # stdout redirected to a regular file: nothing to wait on, write it directly.
+            stdout = sys.stdout.buffer
 
-        while True:
-            line = await reader.readline()
-            if not line:
-                return
-            if not line.strip():
-                continue
-            text = line.decode("utf-8") if isinstance(line, (bytes, bytearray)) else line
-            await self._dispatch_line(text, write_frame=write_frame)
+            async def write_bytes(data: bytes) -> None:
+                stdout.write(data)
+                stdout.flush()
+        else:
+            writer = asyncio.StreamWriter(transport, flow, reader, loop)
 
-    async def run_tcp(self, host: str, port: int) -> None:
-        async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
-            async def write_frame(frame: dict[str, Any]) -> None:
-                writer.write(encode_frame(frame))
+            async def write_bytes(data: bytes) -> None:
+                writer.write(data)
                 await writer.drain()
 
+        await self._serve_connection(reader, write_bytes)
+
+    async def _handle_stream_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        async def write_bytes(data: bytes) -> None:
+            writer.write(data)
+            await writer.drain()
+
+        try:
+            await self._serve_connection(reader, write_bytes)
+        finally:
+            writer.close()
             try:
-                while True:
-                    line = await reader.readline()
-                    if not line:
-                        return
-                    if not line.strip():
-                        continue
-                    text = line.decode("utf-8") if isinstance(line, (bytes, bytearray)) else line
-                    await self._dispatch_line(text, write_frame=write_frame)
-            finally:
-                writer.close()
-                try:
-                    await writer.wait_closed()
-                except Exception:
-                    pass
+                await writer.wait_closed()
+            except Exception:
+                pass
 
-        server = await asyncio.start_server(handle_client, host, port, limit=RPC_STREAM_LIMIT)
-        async with server:
-            await server.serve_forever()
+    async def run_tcp(self, host: str, port: int) -> None:
+        server = await asyncio.start_server(self._handle_stream_client, host, port, limit=RPC_STREAM_LIMIT)
+        self._attach_loop_monitor()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self._detach_loop_monitor()
+
+    async def run_unix(self, path: str | os.PathLike) -> None:
+        sock_path = Path(path)
+        sock_path.parent.mkdir(parents=True, exist_ok=True)
+        # A socket file left behind by a crashed instance would make bind() fail.
+        if sock_path.is_socket():
+            sock_path.unlink()
+        server = await asyncio.start_unix_server(self._handle_stream_client, path=str(sock_path),
+                                                 limit=RPC_STREAM_LIMIT)
+        os.chmod(sock_path, rpc_socket_mode(self.island))
+        self._attach_loop_monitor()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self._detach_loop_monitor()
+            sock_path.unlink(missing_ok=True)
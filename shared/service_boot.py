@@ -3,13 +3,38 @@ from __future__ import annotations
 import asyncio
 import os
 
+from shared.rpc_pool import close_pool
 from shared.service_base import NDJSONService
+from shared.service_registry import rpc_endpoint, rpc_socket_path
 
 
-def run_service(app: NDJSONService) -> None:
-    host = os.environ.get("SHERIFF_RPC_HOST", "").strip()
-    port = os.environ.get("SHERIFF_RPC_PORT", "").strip()
-    if host and port:
-        asyncio.run(app.run_tcp(host, int(port)))
+async def serve_app(app: NDJSONService) -> None:
+    try:
+        socket_path = os.environ.get("SHERIFF_RPC_SOCKET", "").strip()
+        if socket_path:
+            await app.run_unix(socket_path)
+            return
+        host = os.environ.get("SHERIFF_RPC_HOST", "").strip()
+        port = os.environ.get("SHERIFF_RPC_PORT", "").strip()
+        if host and port:
+            await app.run_tcp(host, int(port))
+            return
+        await app.run_stdio()
+    finally:
+        await close_pool()
+
+
+async def serve_registered(service: str, app: NDJSONService) -> None:
+    """Serve app on the socket or port the registry assigns to service (used when several share a process)."""
+    socket_path = rpc_socket_path(service)
+    if socket_path is not None:
+        await app.run_unix(socket_path)
         return
-    asyncio.run(app.run_stdio())
+    endpoint = rpc_endpoint(service)
+    if endpoint is None:
+        raise ValueError(f"no rpc endpoint registered for {service}")
+    await app.run_tcp(*endpoint)
+
+
+def run_service(app: NDJSONService) -> None:
+    asyncio.run(serve_app(app))
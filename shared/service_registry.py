@@ -1,5 +1,11 @@
 from __future__ import annotations
 
+import os
+import socket
+from pathlib import Path
+
+from shared.paths import gw_root, llm_root
+
 
 SERVICE_PORTS: dict[str, int] = {
     "sheriff-secrets": 47601,
@@ -17,6 +23,12 @@ SERVICE_PORTS: dict[str, int] = {
     "sheriff-chat-proxy": 47613,
 }
 
+RPC_TRANSPORTS = ("tcp", "unix")
+
+# gw sockets are private to the Sheriff user; llm sockets must stay reachable from the gw island,
+# which connects into codex-mcp-host even when it runs under a dedicated OS user.
+ISLAND_SOCKET_MODES: dict[str, int] = {"gw": 0o600, "llm": 0o666}
+
 
 def rpc_endpoint(service: str) -> tuple[str, int] | None:
     port = SERVICE_PORTS.get(service)
@@ -27,3 +39,28 @@ def rpc_endpoint(service: str) -> tuple[str, int] | None:
 
 def rpc_service_names() -> list[str]:
     return list(SERVICE_PORTS.keys())
+
+
+def service_island(service: str) -> str:
+    return "gw" if service.startswith("sheriff-") else "llm"
+
+
+def rpc_transport(service: str) -> str:
+    env_key = "SHERIFF_RPC_TRANSPORT_" + service.upper().replace("-", "_")
+    value = (os.environ.get(env_key) or os.environ.get("SHERIFF_RPC_TRANSPORT") or "tcp").strip().lower()
+    if value not in RPC_TRANSPORTS:
+        return "tcp"
+    if value == "unix" and not hasattr(socket, "AF_UNIX"):
+        return "tcp"
+    return value
+
+
+def rpc_socket_path(service: str) -> Path | None:
+    if service not in SERVICE_PORTS or rpc_transport(service) != "unix":
+        return None
+    root = gw_root() if service_island(service) == "gw" else llm_root()
+    return root / "run" / f"{service}.sock"
+
+
+def rpc_socket_mode(island: str) -> int:
+    return ISLAND_SOCKET_MODES.get(island, 0o600)
@@ -14,3 +14,8 @@ def session_key_for_message(channel: str, payload: dict) -> str:
             return f"group_{chat_id}_topic_main"
     principal_id = str(payload.get("principal_external_id") or "unknown").strip() or "unknown"
     return f"{channel}_{principal_id}"
+
+
+def update_idempotency_key(channel: str, chat_id, update_id) -> str:
+    """Key under which the gateway recognizes a redelivered chat update (e.g. a Telegram update_id)."""
+    return f"{channel}:{chat_id}:{update_id}"
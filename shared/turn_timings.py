@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from shared.oplog import RotatingTextLog
+from shared.paths import gw_root
+from shared.rpc_metrics import LatencyHistogram
+
+# Timer of the gateway turn running in this context: set by handle_user_message so that the
+# phases of _process_message and _route_tool land in the same record without extra arguments.
+_TURN: ContextVar[TurnTimer | None] = ContextVar("sheriff_turn_timer", default=None)
+
+# Phases spent waiting on Codex rather than on this host; everything else in a turn is ours.
+CODEX_PHASES = ("codex",)
+PERCENTILES = (50, 95, 99)
+
+
+def turn_timings_file() -> Path:
+    return gw_root() / "state" / "turn_timings.jsonl"
+
+
+class TurnTimer:
+    """Accumulates wall time per phase of one gateway turn."""
+
+    def __init__(self) -> None:
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.phases: dict[str, float] = {}
+        self.tools: list[tuple[str, float]] = []
+
+    def add(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + max(0.0, seconds)
+
+    def add_tool(self, tool_name: str, seconds: float) -> None:
+        self.tools.append((tool_name, max(0.0, seconds)))
+        self.add("tools", seconds)
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started
+
+    def row(self, **fields) -> dict:
+        return {
+            "at": round(self.started_at, 3),
+            **fields,
+            "total_ms": round(self.elapsed() * 1000, 3),
+            "phases": {name: round(sec * 1000, 3) for name, sec in self.phases.items()},
+            "tools": [[name, round(sec * 1000, 3)] for name, sec in self.tools],
+        }
+
+
+def current_turn() -> TurnTimer | None:
+    return _TURN.get()
+
+
+@contextmanager
+def begin_turn():
+    timer = TurnTimer()
+    token = _TURN.set(timer)
+    try:
+        yield timer
+    finally:
+        _TURN.reset(token)
+
+
+@contextmanager
+def turn_phase(name: str):
+    """Time a block into the current turn; a no-op outside of one."""
+    timer = _TURN.get()
+    if timer is None:
+        yield
+        return
+    with timer.phase(name):
+        yield
+
+
+class TurnTimingStore:
+    """Compact JSONL store of per-turn timing rows, rotated like the op logs."""
+
+    def __init__(self, path: Path | None = None, *, max_bytes: int = 2 * 1024 * 1024, backup_count: int = 2):
+        self.path = path or turn_timings_file()
+        self.backup_count = backup_count
+        self._log = None
+        self._max_bytes = max_bytes
+
+    def append(self, row: dict) -> None:
+        if self._log is None:
+            self._log = RotatingTextLog(self.path, max_bytes=self._max_bytes, backup_count=self.backup_count)
+        self._log.append(json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def load(self, limit: int | None = None, *, since: float | None = None) -> list[dict]:
+        paths = [self.path.with_name(f"{self.path.name}.{idx}") for idx in range(self.backup_count, 0, -1)]
+        rows: list[dict] = []
+        for path in [*paths, self.path]:
+            try:
+                lines = path.read_text(encoding="utf-8", errors="replace").splitlines()
+            except OSError:
+                continue
+            for line in lines:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(row, dict) or not isinstance(row.get("phases"), dict):
+                    continue
+                if since is not None and float(row.get("at") or 0) < since:
+                    continue
+                rows.append(row)
+        if limit is not None and limit > 0:
+            rows = rows[-limit:]
+        return rows
+
+
+def summarize(rows: list[dict]) -> dict[str, dict]:
+    """Percentiles per phase plus the host/Codex split of the whole turn, in milliseconds."""
+    hists: dict[str, LatencyHistogram] = {}
+
+    def _record(name: str, ms: float) -> None:
+        hist = hists.get(name)
+        if hist is None:
+            hist = hists[name] = LatencyHistogram()
+        hist.record(ms / 1000)
+
+    for row in rows:
+        phases = row.get("phases") or {}
+        for name, ms in phases.items():
+            _record(name, float(ms))
+        for tool_name, ms in row.get("tools") or []:
+            _record(f"tool:{tool_name}", float(ms))
+        total = float(row.get("total_ms") or 0)
+        codex = sum(float(phases.get(name, 0)) for name in CODEX_PHASES)
+        _record("host", max(0.0, total - codex))
+        _record("total", total)
+
+    out = {}
+    for name, hist in hists.items():
+        stats = {"count": hist.total}
+        for pct in PERCENTILES:
+            stats[f"p{pct}_ms"] = round(hist.percentile_us(pct) / 1000, 3)
+        stats["max_ms"] = round(hist.max_us / 1000, 3)
+        out[name] = stats
+    return out
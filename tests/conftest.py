@@ -5,6 +5,9 @@ from pathlib import Path
 
 import pytest
 
+from shared.rpc_breaker import reset_breakers
+from shared.rpc_pool import reset_pool
+
 # Add the repository root to sys.path so we can import 'services' and 'shared'
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
@@ -15,3 +18,14 @@ os.environ.setdefault("SHERIFFCLAW_ROOT", str((Path(tempfile.gettempdir()) / "sh
 @pytest.fixture(autouse=True)
 def _enable_debug_mode(monkeypatch):
     monkeypatch.setenv("SHERIFF_DEBUG", "1")
+
+
+@pytest.fixture(autouse=True)
+def _reset_process_wide_rpc_state():
+    # Breakers and pooled clients are process-wide; don't let one test's dead endpoint or mocked
+    # client leak into the next one.
+    reset_breakers()
+    reset_pool()
+    yield
+    reset_breakers()
+    reset_pool()
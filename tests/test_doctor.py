@@ -84,3 +84,26 @@ def test_report_includes_codex_resolution(monkeypatch, tmp_path):
     report = doctor.asyncio.run(doctor._report_async(1))
     assert "resolved_codex_binary: /opt/homebrew/bin/codex" in report
     assert "augmented_path: /usr/bin:/opt/homebrew/bin" in report
+
+
+def test_latency_lines_report_percentiles_for_busy_ops(monkeypatch):
+    class FakeClient:
+        def __init__(self, service, **kwargs):
+            self.request_timeout_sec = None
+
+        async def request(self, op, payload, stream_events=False):
+            assert op == "metrics"
+            return [], {"result": {"ops": {
+                "health": {"count": 3, "p50_ms": 0.1, "p95_ms": 0.1, "p99_ms": 0.1, "max_ms": 0.1},
+                "secrets.get_secret": {"count": 10, "errors": 1, "in_flight": 0, "p50_ms": 1.5, "p95_ms": 4.0,
+                                       "p99_ms": 9.0, "max_ms": 9.5},
+            }}}
+
+        async def close(self):
+            pass
+
+    monkeypatch.setattr(doctor, "ProcClient", FakeClient)
+    lines = doctor.asyncio.run(doctor._latency_lines("sheriff-secrets"))
+    assert lines == [
+        "sheriff-secrets secrets.get_secret: n=10 err=1 in_flight=0 p50=1.5ms p95=4.0ms p99=9.0ms max=9.5ms"
+    ]
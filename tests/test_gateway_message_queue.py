@@ -0,0 +1,176 @@
+import asyncio
+
+import pytest
+
+from services.sheriff_gateway import message_queue as mq
+from services.sheriff_gateway.message_queue import DurableMessageQueue
+from services.sheriff_gateway.service import SheriffGatewayService
+
+
+def test_enqueue_dedupes_by_key_and_drops_transient_fields(tmp_path):
+    store = DurableMessageQueue(tmp_path / "q.db")
+    row, created = store.enqueue("telegram:1:10", "p1", "telegram", {"text": "hi", "master_password": "pw"},
+                                 owner="a", visibility=60)
+    assert created
+    assert row["payload"] == {"text": "hi"}
+    again, created = store.enqueue("telegram:1:10", "p1", "telegram", {"text": "hi"}, owner="a", visibility=60)
+    assert not created
+    assert again["id"] == row["id"]
+    assert store.db_path.with_name("q.db-wal").exists()
+
+
+def test_claim_lease_and_redelivery(tmp_path):
+    store = DurableMessageQueue(tmp_path / "q.db")
+    row, _ = store.enqueue("k1", "p1", "cli", {"text": "hi"}, owner="a", visibility=60)
+
+    assert store.claim(row["id"], owner="a", visibility=60, max_attempts=3)["status"] == mq.RUNNING
+    # Running under a live lease: neither the same owner nor the sweep may take it again.
+    assert store.claim(row["id"], owner="a", visibility=60, max_attempts=3) is None
+    assert store.reclaimable(owner="a") == []
+
+    # Another process (the restarted gateway) sees it as abandoned right away.
+    assert [r["id"] for r in store.reclaimable(owner="b")] == [row["id"]]
+    claimed = store.claim(row["id"], owner="b", visibility=60, max_attempts=3)
+    assert claimed["owner"] == "b" and claimed["attempts"] == 2
+
+    store.finish(row["id"], mq.DONE, result={"status": "done"})
+    assert store.get(row["id"])["result"] == {"status": "done"}
+    assert store.claim(row["id"], owner="c", visibility=60, max_attempts=3) is None
+
+
+def test_expired_lease_is_reclaimable_and_attempts_are_capped(tmp_path):
+    store = DurableMessageQueue(tmp_path / "q.db")
+    row, _ = store.enqueue("k1", "p1", "cli", {"text": "hi"}, owner="a", visibility=60)
+    store.claim(row["id"], owner="a", visibility=-1, max_attempts=2)
+    assert [r["id"] for r in store.reclaimable(owner="a")] == [row["id"]]
+
+    store.claim(row["id"], owner="a", visibility=-1, max_attempts=2)
+    assert store.claim(row["id"], owner="a", visibility=60, max_attempts=2) is None
+    assert store.get(row["id"])["status"] == mq.FAILED
+    assert store.reclaimable(owner="a") == []
+
+
+def _gateway(tmp_path, processed):
+    svc = SheriffGatewayService()
+    svc.message_queue = DurableMessageQueue(tmp_path / "q.db")
+
+    async def fake_process(principal_id, payload, emit_event):
+        processed.append(payload["text"])
+        await emit_event("assistant.final", {"text": f"re: {payload['text']}"})
+        return {"status": "done", "session_handle": "s1"}
+
+    svc._process_message = fake_process
+    return svc
+
+
+async def _emit(event, payload):
+    return None
+
+
+@pytest.mark.asyncio
+async def test_redelivered_update_is_processed_once(tmp_path):
+    processed = []
+    svc = _gateway(tmp_path, processed)
+    msg = {"channel": "telegram", "principal_external_id": "u1", "text": "hi", "chat_id": 7, "update_id": 100}
+
+    assert (await svc.handle_user_message(dict(msg), _emit, "r1"))["status"] == "done"
+    out = await svc.handle_user_message(dict(msg), _emit, "r2")
+
+    assert out["status"] == "duplicate"
+    assert processed == ["hi"]
+
+
+@pytest.mark.asyncio
+async def test_messages_queued_at_restart_are_replayed_on_boot(tmp_path, monkeypatch):
+    processed = []
+    before = _gateway(tmp_path, processed)
+    await before.queue_control({"pause": True, "reason": "update"}, None, "r0")
+    msgs = [{"channel": "telegram", "principal_external_id": "u1", "text": t, "chat_id": 7, "update_id": i,
+             "chat_type": "private"} for i, t in enumerate(["one", "two"])]
+    waiting = [asyncio.create_task(before.handle_user_message(m, _emit, f"r{i}")) for i, m in enumerate(msgs)]
+    await asyncio.sleep(0.05)
+    # The update restarts the gateway: the old process dies (nothing of it runs any more) with both
+    # messages still queued.
+    assert processed == []
+
+    after = _gateway(tmp_path, processed)
+    delivered = []
+
+    async def fake_send(text, *, chat_id=None, message_thread_id=None):
+        delivered.append((chat_id, text))
+
+    monkeypatch.setattr(after, "_send_llm_telegram", fake_send)
+    after._sweep_queue()
+    await asyncio.gather(*list(after._replays))
+
+    assert processed == ["one", "two"]
+    assert delivered == [(7, "re: one"), (7, "re: two")]
+    assert after.message_queue.counts() == {"done": 2}
+    # The listener resending an update after the restart gets a duplicate, not a second answer.
+    assert (await after.handle_user_message(dict(msgs[0]), _emit, "r9"))["status"] == "duplicate"
+    for task in waiting:
+        task.cancel()
+    await asyncio.gather(*waiting, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_turn_is_closed_and_not_replayed(tmp_path):
+    processed = []
+    svc = _gateway(tmp_path, processed)
+    started = asyncio.Event()
+
+    async def slow_process(principal_id, payload, emit_event):
+        processed.append(payload["text"])
+        started.set()
+        await asyncio.sleep(10)
+
+    svc._process_message = slow_process
+    running = asyncio.create_task(
+        svc.handle_user_message({"channel": "cli", "principal_external_id": "u1", "text": "hi"}, _emit, "r1"))
+    await started.wait()
+    await svc.queue_control({"pause": True, "reason": "update"}, None, "r2")
+    queued = asyncio.create_task(
+        svc.handle_user_message({"channel": "cli", "principal_external_id": "u1", "text": "later"}, _emit, "r3"))
+    await asyncio.sleep(0.05)
+    # The caller's deadline ran out on both: the running turn and the one still waiting for its slot.
+    running.cancel()
+    queued.cancel()
+    await asyncio.gather(running, queued, return_exceptions=True)
+
+    assert svc.message_queue.counts() == {"cancelled": 2}
+    rows = [svc.message_queue.get(i) for i in (1, 2)]
+    for row in rows:
+        # Past the visibility timeout nothing is picked up again.
+        svc.message_queue._db().execute("UPDATE messages SET lease_until=0 WHERE id=?", (row["id"],))
+    svc._sweep_queue()
+    assert not svc._replays
+    assert processed == ["hi"]
+
+
+@pytest.mark.asyncio
+async def test_resubmitted_cancelled_update_runs_again(tmp_path):
+    processed = []
+    svc = _gateway(tmp_path, processed)
+    msg = {"channel": "telegram", "principal_external_id": "u1", "text": "hi", "chat_id": 7, "update_id": 5}
+    await svc.queue_control({"pause": True, "reason": "update"}, None, "r0")
+    task = asyncio.create_task(svc.handle_user_message(dict(msg), _emit, "r1"))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await svc.queue_control({"pause": False}, None, "r2")
+
+    assert (await svc.handle_user_message(dict(msg), _emit, "r3"))["status"] == "done"
+    assert processed == ["hi"]
+
+
+@pytest.mark.asyncio
+async def test_abandoned_cli_message_is_not_replayed(tmp_path):
+    processed = []
+    before = _gateway(tmp_path, processed)
+    before.message_queue.enqueue("msg:1", "cli:u1", "cli", {"channel": "cli", "principal_external_id": "u1",
+                                                            "text": "hi"}, owner=before.boot_id, visibility=60)
+    after = _gateway(tmp_path, processed)
+    after._sweep_queue()
+
+    assert not after._replays
+    assert after.message_queue.counts() == {"failed": 1}
@@ -2,6 +2,7 @@ import asyncio
 
 import pytest
 
+from services.sheriff_gateway.message_queue import DurableMessageQueue
 from services.sheriff_gateway.service import SheriffGatewayService
 
 
@@ -39,3 +40,139 @@ async def test_handle_user_message_queues_when_paused(monkeypatch):
     await svc.queue_control({"pause": False}, None, "r4")
     out = await task
     assert out["status"] == "done"
+
+
+@pytest.mark.asyncio
+async def test_cancelled_queued_message_leaves_the_queue(monkeypatch):
+    svc = SheriffGatewayService()
+
+    async def fake_process(principal_id, payload, emit_event):
+        return {"status": "done", "session_handle": "s1"}
+
+    monkeypatch.setattr(svc, "_process_message", fake_process)
+    await svc.queue_control({"pause": True, "reason": "update"}, None, "r1")
+
+    task = asyncio.create_task(
+        svc.handle_user_message({"channel": "cli", "principal_external_id": "u1", "text": "hi"}, None, "r2"))
+    await asyncio.sleep(0.1)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    st = await svc.queue_status({}, None, "r3")
+    assert st["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_group_topics_of_one_principal_run_in_parallel(monkeypatch):
+    svc = SheriffGatewayService()
+    svc.lane_key = "session"
+    running = []
+    peak = 0
+    gate = asyncio.Event()
+
+    async def fake_process(principal_id, payload, emit_event):
+        nonlocal peak
+        running.append(payload["message_thread_id"])
+        peak = max(peak, len(running))
+        await gate.wait()
+        running.remove(payload["message_thread_id"])
+        return {"status": "done", "session_handle": "s"}
+
+    monkeypatch.setattr(svc, "_process_message", fake_process)
+
+    def msg(thread):
+        return {"channel": "telegram", "principal_external_id": "u1", "text": "hi", "chat_id": -100,
+                "chat_type": "supergroup", "message_thread_id": thread}
+
+    tasks = [asyncio.create_task(svc.handle_user_message(msg(t), None, f"r{t}")) for t in (1, 2, 1)]
+    await asyncio.sleep(0.05)
+    assert peak == 2
+    st = await svc.queue_status({}, None, "s")
+    assert st["processing"] == 2 and st["waiting"] == 1
+
+    gate.set()
+    assert [out["status"] for out in await asyncio.gather(*tasks)] == ["done"] * 3
+
+
+@pytest.mark.asyncio
+async def test_burst_behind_a_running_turn_is_coalesced(monkeypatch, tmp_path):
+    monkeypatch.setattr("services.sheriff_gateway.service.GW_COALESCE", True)
+    svc = SheriffGatewayService()
+    svc.message_queue = DurableMessageQueue(tmp_path / "q.db")
+    prompts = []
+    gate = asyncio.Event()
+
+    async def fake_process(principal_id, payload, emit_event):
+        prompts.append(payload)
+        await gate.wait()
+        return {"status": "done", "session_handle": "s1"}
+
+    monkeypatch.setattr(svc, "_process_message", fake_process)
+
+    def msg(text, update_id):
+        return {"channel": "telegram", "principal_external_id": "u1", "text": text, "chat_id": 7,
+                "update_id": update_id}
+
+    first = asyncio.create_task(svc.handle_user_message(msg("one", 1), None, "r1"))
+    await asyncio.sleep(0.05)
+    burst = [asyncio.create_task(svc.handle_user_message(msg(t, i), None, f"r{i}"))
+             for i, t in ((2, "two"), (3, "three"))]
+    await asyncio.sleep(0.05)
+    gate.set()
+    await first
+
+    outs = await asyncio.gather(*burst)
+    assert len(prompts) == 2
+    merged = prompts[1]
+    assert merged["text"].index("two") < merged["text"].index("three")
+    assert "message 2" in merged["text"]
+    assert [m["update_id"] for m in merged["coalesced"]] == [2, 3]
+    assert [out["status"] for out in outs] == ["done", "coalesced"]
+    assert outs[1]["session_handle"] == "s1"
+    assert svc.message_queue.counts() == {"done": 3}
+
+
+@pytest.mark.asyncio
+async def test_absorbed_message_stays_leased_when_its_caller_leaves(monkeypatch, tmp_path):
+    monkeypatch.setattr("services.sheriff_gateway.service.GW_COALESCE", True)
+    svc = SheriffGatewayService()
+    svc.message_queue = DurableMessageQueue(tmp_path / "q.db")
+    first_gate, burst_gate = asyncio.Event(), asyncio.Event()
+    prompts = []
+
+    async def fake_process(principal_id, payload, emit_event):
+        prompts.append(payload["text"])
+        await (first_gate if len(prompts) == 1 else burst_gate).wait()
+        return {"status": "done", "session_handle": "s1"}
+
+    monkeypatch.setattr(svc, "_process_message", fake_process)
+
+    def msg(text):
+        return {"channel": "cli", "principal_external_id": "u1", "text": text}
+
+    first = asyncio.create_task(svc.handle_user_message(msg("one"), None, "r1"))
+    await asyncio.sleep(0.05)
+    leader = asyncio.create_task(svc.handle_user_message(msg("two"), None, "r2"))
+    follower = asyncio.create_task(svc.handle_user_message(msg("three"), None, "r3"))
+    await asyncio.sleep(0.05)
+    first_gate.set()
+    await first
+    await asyncio.sleep(0.05)
+    assert len(prompts) == 2 and "three" in prompts[1]
+
+    follower.cancel()
+    await asyncio.gather(follower, return_exceptions=True)
+    # Still part of the leader's running turn: leased, extended by the sweep, never replayed.
+    assert 3 in svc._inflight
+    svc.message_queue._db().execute("UPDATE messages SET lease_until=0 WHERE id=3")
+    svc._sweep_queue()
+    assert not svc._replays
+    assert svc.message_queue.get(3)["status"] == "running"
+
+    burst_gate.set()
+    assert (await leader)["status"] == "done"
+    await asyncio.sleep(0)
+    assert 3 not in svc._inflight
+    assert svc.message_queue.get(3)["status"] == "done"
+    assert len(prompts) == 2
@@ -1,10 +1,12 @@
 from unittest.mock import AsyncMock
 
 import asyncio
+import time
 import pytest
 
 from services.sheriff_gateway import service as gateway_service
 from services.sheriff_gateway.service import SheriffGatewayService
+from shared.rpc_deadline import current_deadline
 
 
 # Mock ProcClient since we can't spawn real processes in unit tests
@@ -65,6 +67,8 @@ async def test_gateway_opens_session_and_forwards_message():
         "text": "hello"
     }, emit, "req-1")
 
+    await svc.writes.drain()
+
     # Verify events passed through
     assert ("assistant.delta", {"text": "hi"}) in events
     called_ops = [call.args[0] for call in svc.ai.request.call_args_list]
@@ -294,7 +298,7 @@ async def test_notify_request_resolved_uses_sheriff_wording_for_secret(monkeypat
     svc.handle_user_message = fake_handle
 
     await svc.notify_request_resolved({"type": "secret", "key": "GIT_TOKEN", "status": "approved"}, None, "r1")
-    await asyncio.sleep(0)
+    await svc.resolutions.flush()
     assert 'Sheriff: user provided secret "GIT_TOKEN"' in captured["text"]
 
 
@@ -434,3 +438,167 @@ async def test_gateway_uses_final_rpc_payload_text_when_no_events():
 
     assert out["status"] == "done"
     assert ("assistant.final", {"text": "hello from final payload"}) in events
+
+
+@pytest.mark.asyncio
+async def test_resolution_burst_wakes_the_blocked_session_once(monkeypatch):
+    svc = SheriffGatewayService()
+    svc.resolutions.window = 0.05
+    svc._session_origins["group_-100_topic_7"] = {"channel": "telegram", "principal_external_id": "u1",
+                                                 "chat_id": -100, "chat_type": "supergroup", "message_thread_id": 7}
+    svc._session_origins["private_main"] = {"channel": "telegram", "principal_external_id": "u1",
+                                           "chat_type": "private"}
+    for tool_name, result in (("tools.exec", {"status": "needs_tool_approval", "tool": "git"}),
+                              ("secure.web.request", {"status": "needs_domain_approval", "host": "example.com"}),
+                              ("tools.exec", {"status": "needs_secret", "missing_handles": ["A", "B"]})):
+        svc._route_tool_call = AsyncMock(return_value=result)
+        await svc._route_tool("u1", {"tool_name": tool_name, "payload": {}}, session="group_-100_topic_7")
+
+    turns = []
+
+    async def fake_handle(payload, emit_event, req_id):
+        turns.append(payload)
+        return {"status": "done"}
+
+    monkeypatch.setattr("services.sheriff_gateway.service.append_jsonl", lambda *args, **kwargs: None)
+    svc.handle_user_message = fake_handle
+
+    for req_type, key in (("tool", "git"), ("domain", "example.com"), ("secret", "A"), ("secret", "B")):
+        out = await svc.notify_request_resolved({"type": req_type, "key": key, "status": "approved"}, None, "r")
+        assert out["session_handle"] == "group_-100_topic_7"
+    assert out["batched"] == 4
+    await asyncio.sleep(0.2)
+
+    assert len(turns) == 1
+    assert turns[0]["message_thread_id"] == 7
+    assert "4 requests were resolved" in turns[0]["text"]
+    assert 'approved tool "git"' in turns[0]["text"] and "key: B" in turns[0]["text"]
+
+
+@pytest.mark.asyncio
+async def test_preflight_runs_session_and_vault_reads_concurrently():
+    svc = SheriffGatewayService()
+    svc._provider_hint = "openai-codex"
+    svc.vault.known_unlocked = lambda: True
+    started = []
+    gate = asyncio.Event()
+
+    async def ai_stream():
+        yield {"event": "assistant.final", "payload": {"text": "ok"}}
+
+    async def ai_request(op, payload, stream_events=False):
+        if op == "codex.session.send":
+            return ai_stream(), {"ok": True, "result": {}}
+        if op == "codex.session.ensure":
+            started.append(op)
+            await gate.wait()
+        return [], {"ok": True, "result": {}}
+
+    async def secrets_request(op, payload, stream_events=False):
+        if op == "secrets.watch":
+            return [], {"ok": False, "error": "unknown op", "error_type": "unknown_op"}
+        started.append(op)
+        await gate.wait()
+        values = {"secrets.is_unlocked": {"unlocked": True}, "secrets.get_llm_provider": {"provider": "openai-codex"},
+                  "secrets.get_llm_api_key": {"api_key": "sk-1"}}
+        return [], {"ok": True, "result": values.get(op, {})}
+
+    svc.ai.request = AsyncMock(side_effect=ai_request)
+    svc.secrets.request = AsyncMock(side_effect=secrets_request)
+
+    async def emit(e, p):
+        return
+
+    task = asyncio.create_task(
+        svc.handle_user_message({"channel": "cli", "principal_external_id": "u1", "text": "hi"}, emit, "r1"))
+    for _ in range(20):
+        await asyncio.sleep(0)
+    assert sorted(started) == ["codex.session.ensure", "secrets.get_llm_api_key", "secrets.get_llm_provider",
+                               "secrets.is_unlocked"]
+    gate.set()
+    assert (await task)["status"] == "done"
+    send = next(call.args[1] for call in svc.ai.request.call_args_list if call.args[0] == "codex.session.send")
+    assert send["api_key"] == "sk-1"
+    await svc.writes.drain()
+    assert "codex.memory.inbox.append" in [call.args[0] for call in svc.ai.request.call_args_list]
+
+
+@pytest.mark.asyncio
+async def test_preflight_reads_no_config_from_a_vault_not_known_unlocked():
+    svc = SheriffGatewayService()
+    svc._provider_hint = "openai-codex"
+    svc.ai.request = AsyncMock(return_value=([], {"ok": True, "result": {}}))
+
+    async def secrets_request(op, payload, stream_events=False):
+        if op == "secrets.watch":
+            return [], {"ok": False, "error": "unknown op", "error_type": "unknown_op"}
+        if op == "secrets.is_unlocked":
+            return [], {"ok": True, "result": {"unlocked": False}}
+        return [], {"ok": False, "error": "secrets are locked", "error_type": "RuntimeError"}
+
+    svc.secrets.request = AsyncMock(side_effect=secrets_request)
+
+    async def emit(e, p):
+        return
+
+    res = await svc.handle_user_message({"channel": "cli", "principal_external_id": "u1", "text": "hi"}, emit, "r1")
+    assert res["status"] == "locked"
+    assert [call.args[0] for call in svc.secrets.request.call_args_list if call.args[0] != "secrets.watch"] == [
+        "secrets.is_unlocked"]
+
+
+@pytest.mark.asyncio
+async def test_tool_calls_of_one_turn_are_routed_concurrently():
+    svc = SheriffGatewayService()
+    both_running = asyncio.Event()
+    running = []
+
+    async def ai_stream():
+        yield {"event": "tool.call", "payload": {"tool_name": "secure.web.request", "call_id": "c1",
+                                                 "payload": {"host": "a.example"}}}
+        yield {"event": "tool.call", "payload": {"tool_name": "secure.web.request", "call_id": "c2",
+                                                 "payload": {"host": "b.example"}}}
+        yield {"event": "assistant.final", "payload": {"text": "done"}}
+
+    async def ai_request(op, payload, stream_events=False):
+        if op == "codex.session.send":
+            return ai_stream(), {"ok": True, "result": {}}
+        return [], {"ok": True, "result": {}}
+
+    async def web_request(op, payload, stream_events=False):
+        running.append(payload["host"])
+        if len(running) == 2:
+            both_running.set()
+        # Serial routing would never see the second call while the first one waits here.
+        await asyncio.wait_for(both_running.wait(), 1)
+        return [], {"result": {"status": "executed", "host": payload["host"]}}
+
+    svc.ai.request = AsyncMock(side_effect=ai_request)
+    svc.web.request = AsyncMock(side_effect=web_request)
+    svc.secrets.request = AsyncMock(return_value=([], {"ok": True, "result": {"unlocked": True, "provider": "stub"}}))
+    events = []
+
+    async def emit(e, p):
+        events.append((e, p))
+
+    out = await svc.handle_user_message({"channel": "cli", "principal_external_id": "u1", "text": "hi",
+                                         "tool_results_in_order": True}, emit, "r1")
+    assert out["status"] == "done"
+    results = [p for e, p in events if e == "tool.result"]
+    assert [(r["call_id"], r["host"]) for r in results] == [("c1", "a.example"), ("c2", "b.example")]
+
+
+@pytest.mark.asyncio
+async def test_inbox_append_runs_under_its_own_short_deadline(monkeypatch):
+    monkeypatch.setattr("services.sheriff_gateway.service.GW_INBOX_APPEND_TIMEOUT_SEC", 2.0)
+    svc = SheriffGatewayService()
+    deadlines = []
+
+    async def ai_request(op, payload, stream_events=False):
+        deadlines.append(current_deadline())
+        return [], {"ok": True, "result": {}}
+
+    svc.ai.request = AsyncMock(side_effect=ai_request)
+    svc._append_inbox("cli:u1", "cli:u1", {"text": "hi"})
+    await svc.writes.drain()
+    assert len(deadlines) == 1 and 0 < deadlines[0] - time.time() <= 2.0
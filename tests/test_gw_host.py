@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import pytest
+
+from services.sheriff_ctl import service_runner
+from services.sheriff_gw_host.host import GW_SERVICES, GwHost
+from shared.local_rpc import local_service
+from shared.proc_rpc import ProcClient
+
+
+def test_gw_host_covers_every_gw_service_in_start_order():
+    assert list(GW_SERVICES) == service_runner.GW_ORDER
+
+
+@pytest.mark.asyncio
+async def test_gw_host_wires_co_hosted_services_in_process(monkeypatch):
+    monkeypatch.setattr("shared.proc_rpc.rpc_endpoint", lambda service: pytest.fail("must not open a socket"))
+    host = GwHost(["sheriff-secrets", "sheriff-policy"])
+    host.register()
+    client = ProcClient("sheriff-secrets", spawn_fallback=False)
+    try:
+        _, res = await client.request("health", {})
+        assert res["result"] == {"status": "ok"}
+        _, res = await client.request("meta", {})
+        assert res["result"]["name"] == "gw.secrets"
+    finally:
+        host.unregister()
+        await client.close()
+    assert local_service("sheriff-secrets") is None
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from shared.ndjson import FRAME_CODECS, FrameFormat, choose_codec, encode_frame
+
+
+async def _roundtrip(fmt: FrameFormat, frames: list[dict]) -> list[dict]:
+    reader = asyncio.StreamReader()
+    for frame in frames:
+        reader.feed_data(fmt.encode(frame))
+    reader.feed_eof()
+    out = []
+    while True:
+        frame = await fmt.read(reader)
+        if frame is None:
+            return out
+        out.append(frame)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("codec", sorted(FRAME_CODECS))
+async def test_length_prefixed_codecs_roundtrip(codec):
+    fmt = FrameFormat()
+    fmt.use(codec)
+    frames = [
+        {"id": "r1", "event": "assistant.delta", "payload": {"text": "line one\nline two ✓"}},
+        {"id": "r1", "ok": True, "result": {"stdout": "x" * 100_000, "code": 0}},
+    ]
+    assert await _roundtrip(fmt, frames) == frames
+
+
+@pytest.mark.asyncio
+async def test_ndjson_format_skips_blank_lines():
+    fmt = FrameFormat()
+    reader = asyncio.StreamReader()
+    reader.feed_data(b"\n" + encode_frame({"id": "a"}) + b"\n")
+    reader.feed_eof()
+    assert await fmt.read(reader) == {"id": "a"}
+    assert await fmt.read(reader) is None
+    assert fmt.codec_name == "ndjson"
+
+
+def test_choose_codec_honours_client_preference_and_falls_back():
+    assert choose_codec(["zstd-magic", "json"]) == "json"
+    assert choose_codec(["zstd-magic"]) is None
@@ -96,3 +96,8 @@ async def test_policy_approval_request(policy_svc):
     # Check consumed
     consumed = await policy_svc.consume_one_off({"approval_id": approval_id}, None, "r4")
     assert consumed["approved"] is True
+
+
+def test_apply_callback_runs_on_the_loop_with_the_gate(policy_svc):
+    # The gate's dicts are shared with the on-loop ops, so no worker thread may mutate them.
+    assert getattr(policy_svc.apply_callback, "blocking", None) is None
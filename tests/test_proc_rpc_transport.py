@@ -1,12 +1,20 @@
 from __future__ import annotations
 
 import asyncio
+import gc
+import json
 import socket
+import time
 
 import pytest
 
+from shared.errors import ServiceCrashedError
+from shared.local_rpc import register_local_service, unregister_local_service
+from shared.ndjson import codec_names, encode_frame
 from shared.proc_rpc import ProcClient
-from shared.service_base import NDJSONService
+from shared.rpc_deadline import current_deadline
+from shared.rpc_oob import OOBStr
+from shared.service_base import NDJSONService, OutboundQueue
 
 
 def _free_port() -> int:
@@ -106,3 +114,620 @@ async def test_proc_client_tcp_handles_large_ndjson_frame(monkeypatch):
         server_task.cancel()
         with pytest.raises(asyncio.CancelledError):
             await server_task
+
+
+@pytest.mark.asyncio
+async def test_proc_client_multiplexes_concurrent_requests(monkeypatch):
+    port = _free_port()
+    release = asyncio.Event()
+
+    async def slow(payload, emit, req_id):
+        await release.wait()
+        return {"op": "slow"}
+
+    async def fast(payload, emit, req_id):
+        await emit("progress", {"n": payload["n"]})
+        return {"n": payload["n"]}
+
+    app = NDJSONService(name="test", island="gw", kind="service", version="1", ops={"slow": slow, "fast": fast})
+    server_task = asyncio.create_task(app.run_tcp("127.0.0.1", port))
+    await asyncio.sleep(0.1)
+    monkeypatch.setattr("shared.proc_rpc.rpc_endpoint", lambda service: ("127.0.0.1", port) if service == "dummy" else None)
+    client = ProcClient("dummy", spawn_fallback=False)
+    try:
+        fast_results = await asyncio.gather(*(client.request("fast", {"n": n}) for n in range(5)))
+        for n, (events, res) in enumerate(fast_results):
+            assert res["result"]["n"] == n
+            assert events == [{"id": res["id"], "event": "progress", "payload": {"n": n}}]
+        assert len({res["id"] for _, res in fast_results}) == 5
+        release.set()
+        _, res = await client.request("slow", {})
+        assert res["result"]["op"] == "slow"
+    finally:
+        await client.close()
+        server_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await server_task
+
+
+@pytest.mark.asyncio
+async def test_proc_client_fails_in_flight_requests_when_connection_drops(monkeypatch):
+    port = _free_port()
+
+    async def handle(reader, writer):
+        await reader.readline()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", port)
+    monkeypatch.setattr("shared.proc_rpc.rpc_endpoint", lambda service: ("127.0.0.1", port) if service == "dummy" else None)
+    client = ProcClient("dummy", spawn_fallback=False)
+    try:
+        with pytest.raises(ServiceCrashedError):
+            await client.request("echo", {})
+    finally:
+        await client.close()
+        server.close()
+        await server.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_proc_client_streams_events_before_final(monkeypatch):
+    port = _free_port()
+    release = asyncio.Event()
+
+    async def turn(payload, emit, req_id):
+        await emit("assistant.delta", {"text": "first"})
+        await release.wait()
+        await emit("assistant.final", {"text": "done"})
+        return {"status": "done"}
+
+    app = NDJSONService(name="test", island="gw", kind="service", version="1", ops={"turn": turn})
+    server_task = asyncio.create_task(app.run_tcp("127.0.0.1", port))
+    await asyncio.sleep(0.1)
+    monkeypatch.setattr("shared.proc_rpc.rpc_endpoint", lambda service: ("127.0.0.1", port) if service == "dummy" else None)
+    client = ProcClient("dummy", spawn_fallback=False)
+    try:
+        stream, final = await client.request("turn", {}, stream_events=True)
+        first = await asyncio.wait_for(stream.__anext__(), timeout=1.0)
+        assert first["payload"] == {"text": "first"}
+        assert not final.done()
+        release.set()
+        rest = [frame async for frame in stream]
+        assert [frame["event"] for frame in rest] == ["assistant.final"]
+        assert (await final)["result"] == {"status": "done"}
+    finally:
+        await client.close()
+        server_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await server_task
+
+
+@pytest.mark.asyncio
+async def test_service_dispatches_requests_on_one_connection_concurrently(monkeypatch):
+    port = _free_port()
+    release = asyncio.Event()
+
+    async def slow(payload, emit, req_id):
+        await release.wait()
+        return {"op": "slow"}
+
+    async def status(payload, emit, req_id):
+        return {"op": "status"}
+
+    app = NDJSONService(name="test", island="gw", kind="service", version="1", ops={"slow": slow, "status": status})
+    server_task = asyncio.create_task(app.run_tcp("127.0.0.1", port))
+    await asyncio.sleep(0.1)
+    monkeypatch.setattr("shared.proc_rpc.rpc_endpoint", lambda service: ("127.0.0.1", port) if service == "dummy" else None)
+    client = ProcClient("dummy", spawn_fallback=False)
+    try:
+        slow_task = asyncio.create_task(client.request("slow", {}))
+        await asyncio.sleep(0.05)
+        _, res = await asyncio.wait_for(client.request("status", {}), timeout=1.0)
+        assert res["result"]["op"] == "status"
+        assert not slow_task.done()
+        release.set()
+        _, res = await slow_task
+        assert res["result"]["op"] == "slow"
+    finally:
+        await client.close()
+        server_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await server_task
+
+
+@pytest.mark.asyncio
+async def test_service_bounds_in_flight_requests_per_connection(monkeypatch):
+    port = _free_port()
+    active = {"now": 0, "peak": 0}
+
+    async def work(payload, emit, req_id):
+        active["now"] += 1
+        active["peak"] = max(active["peak"], active["now"])
+        await asyncio.sleep(0.02)
+        active["now"] -= 1
+        return {}
+
+    app = NDJSONService(name="test", island="gw", kind="service", version="1", ops={"work": work}, max_concurrency=2)
+    server_task = asyncio.create_task(app.run_tcp("127.0.0.1", port))
+    await asyncio.sleep(0.1)
+    monkeypatch.setattr("shared.proc_rpc.rpc_endpoint", lambda service: ("127.0.0.1", port) if service == "dummy" else None)
+    client = ProcClient("dummy", spawn_fallback=False)
+    try:
+        results = await asyncio.gather(*(client.request("work", {}) for _ in range(6)))
+        assert all(res["ok"] for _, res in results)
+        assert active["peak"] == 2
+    finally:
+        await client.close()
+        server_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await server_task
+
+
+@pytest.mark.asyncio
+async def test_proc_client_connects_over_unix_socket(monkeypatch, tmp_path):
+    sock_path = tmp_path / "dummy.sock"
+    app = NDJSONService(
+        name="test",
+        island="gw",
+        kind="service",
+        version="1",
+        ops={"echo": lambda payload, emit, req_id: asyncio.sleep(0, result={"echo": payload["text"]})},
+    )
+    server_task = asyncio.create_task(app.run_unix(sock_path))
+    await asyncio.sleep(0.1)
+    assert sock_path.is_socket()
+    assert sock_path.stat().st_mode & 0o777 == 0o600
+    monkeypatch.setattr("shared.proc_rpc.rpc_socket_path", lambda service: sock_path if service == "dummy" else None)
+    client = ProcClient("dummy", spawn_fallback=False)
+    try:
+        _, res = await client.request("echo", {"text": "hello"})
+        assert res["result"]["echo"] == "hello"
+    finally:
+        await client.close()
+        server_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await server_task
+    assert not sock_path.exists()
+
+
+def test_rpc_transport_is_selectable_per_service(monkeypatch, tmp_path):
+    from shared.service_registry import rpc_socket_path, rpc_transport
+
+    monkeypatch.setenv("SHERIFFCLAW_ROOT", str(tmp_path))
+    monkeypatch.delenv("SHERIFF_RPC_TRANSPORT", raising=False)
+    monkeypatch.setenv("SHERIFF_RPC_TRANSPORT_SHERIFF_SECRETS", "unix")
+    assert rpc_transport("sheriff-secrets") == "unix"
+    assert rpc_transport("sheriff-policy") == "tcp"
+    assert rpc_socket_path("sheriff-secrets") == tmp_path / "gw" / "run" / "sheriff-secrets.sock"
+    assert rpc_socket_path("sheriff-policy") is None
+
+    monkeypatch.setenv("SHERIFF_RPC_TRANSPORT", "unix")
+    assert rpc_socket_path("codex-mcp-host") == tmp_path / "llm" / "run" / "codex-mcp-host.sock"
+    assert rpc_socket_path("telegram-listener") is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("codec", ["auto", "json", "ndjson"])
+async def test_proc_client_negotiates_frame_codec(monkeypatch, codec):
+    port = _free_port()
+    app = NDJSONService(
+        name="test",
+        island="gw",
+        kind="service",
+        version="1",
+        ops={"echo": lambda payload, emit, req_id: asyncio.sleep(0, result={"echo": payload["text"]})},
+    )
+    server_task = asyncio.create_task(app.run_tcp("127.0.0.1", port))
+    await asyncio.sleep(0.1)
+    monkeypatch.setattr("shared.proc_rpc.rpc_endpoint", lambda service: ("127.0.0.1", port) if service == "dummy" else None)
+    client = ProcClient("dummy", spawn_fallback=False, codec=codec)
+    try:
+        text = "line\n" * 50_000
+        _, res = await client.request("echo", {"text": text})
+        assert res["result"]["echo"] == text
+        expected = {"auto": codec_names()[0], "json": "json", "ndjson": "ndjson"}[codec]
+        assert client._format.codec_name == expected
+    finally:
+        await client.close()
+        server_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await server_task
+
+
+@pytest.mark.asyncio
+async def test_proc_client_stays_on_ndjson_with_services_that_do_not_negotiate(monkeypatch):
+    port = _free_port()
+
+    async def handle(reader, writer):
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            req = json.loads(line)
+            result = {"name": "old"} if req["op"] == "meta" else {"echo": req["payload"]["text"]}
+            writer.write(encode_frame({"id": req["id"], "ok": True, "result": result}))
+            await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", port)
+    monkeypatch.setattr("shared.proc_rpc.rpc_endpoint", lambda service: ("127.0.0.1", port) if service == "dummy" else None)
+    client = ProcClient("dummy", spawn_fallback=False)
+    try:
+        _, res = await client.request("echo", {"text": "hello"})
+        assert res["result"]["echo"] == "hello"
+        assert client._format.codec_name == "ndjson"
+    finally:
+        await client.close()
+        server.close()
+        await server.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_large_strings_travel_out_of_band_and_are_cleaned_up(monkeypatch, tmp_path):
+    monkeypatch.setenv("SHERIFFCLAW_ROOT", str(tmp_path))
+    port = _free_port()
+    seen = {}
+
+    async def echo(payload, emit, req_id):
+        seen["inbound"] = type(payload["text"])
+        return {"echo": payload["text"], "small": "ok"}
+
+    app = NDJSONService(name="test", island="llm", kind="service", version="1", ops={"echo": echo})
+    server_task = asyncio.create_task(app.run_tcp("127.0.0.1", port))
+    await asyncio.sleep(0.1)
+    monkeypatch.setattr("shared.proc_rpc.rpc_endpoint", lambda service: ("127.0.0.1", port) if service == "dummy" else None)
+    client = ProcClient("dummy", spawn_fallback=False)
+    spill_dir = tmp_path / "llm" / "run" / "oob"
+    try:
+        text = "päyload \"quoted\"\n" * 40_000
+        _, res = await client.request("echo", {"text": text})
+        assert client._format.oob is not None
+        assert seen["inbound"] is OOBStr
+        assert isinstance(res["result"]["echo"], OOBStr)
+        assert res["result"]["echo"] == text
+        assert res["result"]["small"] == "ok"
+        del res
+        await asyncio.sleep(0.05)
+        gc.collect()
+        assert list(spill_dir.iterdir()) == []
+    finally:
+        await client.close()
+        server_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await server_task
+
+
+@pytest.mark.asyncio
+async def test_proc_client_dispatches_to_in_process_service_without_a_socket(monkeypatch):
+    async def echo(payload, emit, req_id):
+        payload["text"] = payload["text"].upper()
+        await emit("progress", {"step": 1})
+        return {"echo": payload["text"]}
+
+    app = NDJSONService(name="test", island="gw", kind="service", version="1", ops={"echo": echo})
+    monkeypatch.setattr("shared.proc_rpc.rpc_endpoint", lambda service: pytest.fail("must not open a socket"))
+    register_local_service("dummy", app)
+    client = ProcClient("dummy", spawn_fallback=False)
+    try:
+        payload = {"text": "hi"}
+        events, res = await client.request("echo", payload)
+        assert res["result"] == {"echo": "HI"}
+        assert [e["event"] for e in events] == ["progress"]
+        assert payload == {"text": "hi"}
+        _, res = await client.request("missing", {})
+        assert res["ok"] is False
+    finally:
+        unregister_local_service("dummy")
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_client_timeout_cancels_the_handler_on_the_service(monkeypatch):
+    port = _free_port()
+    cancelled = asyncio.Event()
+
+    async def slow(payload, emit, req_id):
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return {}
+
+    app = NDJSONService(name="test", island="gw", kind="service", version="1", ops={"slow": slow})
+    server_task = asyncio.create_task(app.run_tcp("127.0.0.1", port))
+    await asyncio.sleep(0.1)
+    monkeypatch.setattr("shared.proc_rpc.rpc_endpoint", lambda service: ("127.0.0.1", port) if service == "dummy" else None)
+    client = ProcClient("dummy", spawn_fallback=False)
+    client.request_timeout_sec = 0.3
+    try:
+        with pytest.raises(ServiceCrashedError, match="timeout"):
+            await client.request("slow", {})
+        await asyncio.wait_for(cancelled.wait(), timeout=2)
+    finally:
+        await client.close()
+        server_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await server_task
+
+
+@pytest.mark.asyncio
+async def test_cancel_is_read_while_every_slot_is_busy():
+    port = _free_port()
+    started = []
+    cancelled = asyncio.Event()
+
+    async def slow(payload, emit, req_id):
+        started.append(req_id)
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return {}
+
+    app = NDJSONService(name="test", island="gw", kind="service", version="1", ops={"slow": slow},
+                        max_concurrency=1)
+    server_task = asyncio.create_task(app.run_tcp("127.0.0.1", port))
+    await asyncio.sleep(0.1)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        # No deadlines: only the cancel frames can stop the work. "a" holds the only slot, "b" queues.
+        for frame in ({"id": "a", "op": "slow", "payload": {}}, {"id": "b", "op": "slow", "payload": {}}):
+            writer.write(encode_frame(frame))
+        await writer.drain()
+        await asyncio.sleep(0.1)
+        for frame in ({"id": "b", "control": "cancel"}, {"id": "a", "control": "cancel"}):
+            writer.write(encode_frame(frame))
+        await writer.drain()
+        await asyncio.wait_for(cancelled.wait(), timeout=2)
+        await asyncio.sleep(0.1)
+        assert started == ["a"]
+    finally:
+        writer.close()
+        server_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await server_task
+
+
+@pytest.mark.asyncio
+async def test_nested_calls_inherit_the_callers_deadline(monkeypatch):
+    port = _free_port()
+
+    async def inner(payload, emit, req_id):
+        return {"deadline": current_deadline()}
+
+    async def outer(payload, emit, req_id):
+        nested = ProcClient("inner", spawn_fallback=False)
+        try:
+            _, res = await nested.request("inner", {})
+        finally:
+            await nested.close()
+        return {"outer": current_deadline(), "inner": res["result"]["deadline"]}
+
+    register_local_service("inner", NDJSONService(name="inner", island="gw", kind="service", version="1",
+                                                  ops={"inner": inner}))
+    app = NDJSONService(name="test", island="gw", kind="service", version="1", ops={"outer": outer})
+    server_task = asyncio.create_task(app.run_tcp("127.0.0.1", port))
+    await asyncio.sleep(0.1)
+    monkeypatch.setattr("shared.proc_rpc.rpc_endpoint", lambda service: ("127.0.0.1", port) if service == "dummy" else None)
+    client = ProcClient("dummy", spawn_fallback=False)
+    client.request_timeout_sec = 5
+    try:
+        started = time.time()
+        _, res = await client.request("outer", {})
+        assert started < res["result"]["outer"] <= started + 5.5
+        assert res["result"]["inner"] == res["result"]["outer"]
+    finally:
+        unregister_local_service("inner")
+        await client.close()
+        server_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await server_task
+
+
+@pytest.mark.asyncio
+async def test_service_rejects_requests_whose_deadline_already_passed():
+    ran = []
+
+    async def work(payload, emit, req_id):
+        ran.append(req_id)
+        return {}
+
+    app = NDJSONService(name="test", island="gw", kind="service", version="1", ops={"work": work})
+    frames = []
+
+    async def write_frame(frame):
+        frames.append(frame)
+
+    await app._dispatch_frame({"id": "r1", "op": "work", "payload": {}, "deadline": time.time() - 1},
+                              write_frame=write_frame)
+    assert ran == []
+    assert frames[0]["error_type"] == "deadline_exceeded"
+
+
+@pytest.mark.asyncio
+async def test_request_many_runs_a_batch_in_one_round_trip(monkeypatch):
+    port = _free_port()
+    order = []
+
+    async def echo(payload, emit, req_id):
+        await asyncio.sleep(payload.get("delay", 0))
+        order.append(payload["n"])
+        await emit("progress", {"n": payload["n"]})
+        return {"n": payload["n"]}
+
+    async def boom(payload, emit, req_id):
+        raise RuntimeError("boom")
+
+    app = NDJSONService(name="test", island="gw", kind="service", version="1", ops={"echo": echo, "boom": boom})
+    server_task = asyncio.create_task(app.run_tcp("127.0.0.1", port))
+    await asyncio.sleep(0.1)
+    monkeypatch.setattr("shared.proc_rpc.rpc_endpoint", lambda service: ("127.0.0.1", port) if service == "dummy" else None)
+    client = ProcClient("dummy", spawn_fallback=False)
+    try:
+        results = await client.request_many([("echo", {"n": 0, "delay": 0.05}), ("boom", {}), ("echo", {"n": 2})])
+        assert [r["ok"] for r in results] == [True, False, True]
+        assert results[0]["result"] == {"n": 0}
+        assert results[1]["error"] == "boom"
+        assert order == [2, 0]
+        assert app.metrics.snapshot()["ops"]["echo"]["count"] == 2
+
+        order.clear()
+        results = await client.request_many([("echo", {"n": 0, "delay": 0.05}), ("boom", {}), ("echo", {"n": 2})],
+                                            sequential=True, stop_on_error=True)
+        assert [r["ok"] for r in results] == [True, False]
+        assert order == [0]
+
+        events, res = await client.request("batch", {"items": [{"op": "echo", "payload": {"n": 7}}]})
+        assert events[0]["payload"] == {"n": 7, "batch_index": 0}
+        _, res = await client.request("batch", {"items": [{"op": "batch", "payload": {}}]})
+        assert res["result"]["results"][0]["error_type"] == "protocol_error"
+    finally:
+        await client.close()
+        server_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await server_task
+
+
+@pytest.mark.asyncio
+async def test_request_many_falls_back_to_single_requests_without_batch_op(monkeypatch):
+    port = _free_port()
+
+    async def handle(reader, writer):
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            req = json.loads(line)
+            if req["op"] == "batch":
+                frame = {"id": req["id"], "ok": False, "error": "unknown op: batch", "error_type": "unknown_op"}
+            elif req["op"] == "meta":
+                frame = {"id": req["id"], "ok": True, "result": {"name": "old"}}
+            else:
+                frame = {"id": req["id"], "ok": True, "result": {"echo": req["payload"]["text"]}}
+            writer.write(encode_frame(frame))
+            await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", port)
+    monkeypatch.setattr("shared.proc_rpc.rpc_endpoint", lambda service: ("127.0.0.1", port) if service == "dummy" else None)
+    client = ProcClient("dummy", spawn_fallback=False)
+    try:
+        results = await client.request_many([("echo", {"text": "a"}), ("echo", {"text": "b"})])
+        assert results == [{"ok": True, "result": {"echo": "a"}}, {"ok": True, "result": {"echo": "b"}}]
+    finally:
+        await client.close()
+        server.close()
+        await server.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_idempotent_ops_are_retried_after_the_connection_drops(monkeypatch):
+    port = _free_port()
+    seen = []
+
+    async def handle(reader, writer):
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            req = json.loads(line)
+            if req["op"] == "meta":
+                frame = {"id": req["id"], "ok": True, "result": {"idempotent": ["get"]}}
+            else:
+                seen.append(req["op"])
+                if len(seen) in (1, 3):
+                    # Simulate a service restart mid-request.
+                    break
+                frame = {"id": req["id"], "ok": True, "result": {"op": req["op"]}}
+            writer.write(encode_frame(frame))
+            await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", port)
+    monkeypatch.setattr("shared.proc_rpc.RPC_RETRY_BASE_SEC", 0.01)
+    monkeypatch.setattr("shared.proc_rpc.rpc_endpoint", lambda service: ("127.0.0.1", port) if service == "dummy" else None)
+    client = ProcClient("dummy", spawn_fallback=False, codec="ndjson")
+    client.oob_threshold = 0
+    # Without codecs or spill files to negotiate there is no handshake; opt in explicitly.
+    client.idempotent_ops = {"get"}
+    try:
+        _, res = await client.request("get", {})
+        assert res["result"] == {"op": "get"}
+        assert seen == ["get", "get"]
+        with pytest.raises(ServiceCrashedError):
+            await client.request("set", {})
+        assert seen == ["get", "get", "set"]
+    finally:
+        await client.close()
+        server.close()
+        await server.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_meta_declares_idempotent_ops_and_the_client_learns_them(monkeypatch):
+    from shared.service_base import idempotent
+
+    @idempotent
+    async def read(payload, emit, req_id):
+        return {}
+
+    async def write(payload, emit, req_id):
+        return {}
+
+    port = _free_port()
+    app = NDJSONService(name="test", island="gw", kind="service", version="1", ops={"read": read, "write": write})
+    server_task = asyncio.create_task(app.run_tcp("127.0.0.1", port))
+    await asyncio.sleep(0.1)
+    monkeypatch.setattr("shared.proc_rpc.rpc_endpoint", lambda service: ("127.0.0.1", port) if service == "dummy" else None)
+    client = ProcClient("dummy", spawn_fallback=False)
+    try:
+        _, res = await client.request("meta", {})
+        assert res["result"]["idempotent"] == ["health", "meta", "read"]
+        assert client.idempotent_ops == {"health", "meta", "read"}
+    finally:
+        await client.close()
+        server_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await server_task
+
+
+@pytest.mark.asyncio
+async def test_outbound_queue_coalesces_bursts_and_applies_backpressure():
+    writes = []
+    gate = asyncio.Event()
+
+    async def write_bytes(data):
+        writes.append(data)
+        await gate.wait()
+
+    outbox = OutboundQueue(write_bytes, high_water=100)
+    await outbox.send(b"a" * 10)
+    await asyncio.sleep(0)
+    assert writes == [b"a" * 10]
+
+    # The writer is stuck on the first write: frames pile up until the high-water mark blocks the sender.
+    for _ in range(9):
+        await outbox.send(b"b" * 10)
+    blocked = asyncio.create_task(outbox.send(b"c" * 20))
+    await asyncio.sleep(0.01)
+    assert not blocked.done()
+
+    gate.set()
+    await asyncio.wait_for(blocked, 1)
+    await outbox.close()
+    assert writes == [b"a" * 10, b"b" * 90 + b"c" * 20]
+
+
+@pytest.mark.asyncio
+async def test_outbound_queue_reports_a_lost_connection_to_senders():
+    async def write_bytes(data):
+        raise ConnectionResetError("peer went away")
+
+    outbox = OutboundQueue(write_bytes)
+    await outbox.send(b"x")
+    await asyncio.sleep(0)
+    with pytest.raises(ConnectionResetError):
+        await outbox.send(b"y")
+    await outbox.close()
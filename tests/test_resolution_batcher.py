@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+import pytest
+
+from services.sheriff_gateway.resolution_batcher import ResolutionBatcher, resolution_prompt
+from shared.rpc_deadline import current_deadline, reset_deadline, set_deadline
+
+
+@pytest.mark.asyncio
+async def test_batches_per_session_and_caps_the_wait():
+    delivered = []
+
+    async def deliver(session, events):
+        delivered.append((session, [e["key"] for e in events]))
+
+    batcher = ResolutionBatcher(deliver, window=0.1, max_wait=0.2)
+    batcher.add("a", {"key": "1"})
+    batcher.add("b", {"key": "x"})
+    for key in ("2", "3", "4", "5", "6"):
+        await asyncio.sleep(0.06)
+        batcher.add("a", {"key": key})
+    await asyncio.sleep(0.3)
+
+    assert ("b", ["x"]) in delivered
+    # The window kept sliding, so the cap cut the first batch and the rest went in a second one.
+    batches = [keys for session, keys in delivered if session == "a"]
+    assert sum(batches, []) == ["1", "2", "3", "4", "5", "6"]
+    assert len(batches) >= 2
+    assert batcher.pending() == 0
+
+
+def test_single_event_prompt_keeps_its_wording():
+    text = resolution_prompt([{"type": "tool", "key": "git", "status": "denied"}])
+    assert text.startswith('Sheriff: user denied tool "git". Choose another approach.')
+    assert "## Request Resolution Event\n" in text
+
+
+@pytest.mark.asyncio
+async def test_batch_is_delivered_outside_the_notifiers_deadline():
+    seen = []
+
+    async def deliver(session, events):
+        seen.append(current_deadline())
+
+    batcher = ResolutionBatcher(deliver, window=0.01, max_wait=0.01)
+    token = set_deadline(time.time() + 30)
+    try:
+        batcher.add("a", {"key": "1"})
+    finally:
+        reset_deadline(token)
+    await asyncio.sleep(0.05)
+    assert seen == [None]
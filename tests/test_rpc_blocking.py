@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from shared.rpc_blocking import BlockingPools, blocking
+from shared.rpc_deadline import current_deadline
+from shared.service_base import NDJSONService
+
+
+@pytest.mark.asyncio
+async def test_blocking_ops_run_off_the_loop_and_keep_health_responsive():
+    seen = {}
+
+    @blocking("io")
+    async def slow(payload, emit, req_id):
+        seen["thread"] = threading.current_thread().name
+        seen["deadline"] = current_deadline()
+        await emit("progress", {"step": 1})
+        time.sleep(0.3)
+        return {"done": True}
+
+    app = NDJSONService(name="test", island="gw", kind="service", version="1", ops={"slow": slow},
+                        blocking_pools={"io": 1})
+    frames = []
+
+    async def write_frame(frame):
+        frames.append((time.perf_counter(), frame))
+
+    deadline = time.time() + 30
+    started = time.perf_counter()
+    slow_task = asyncio.create_task(
+        app._dispatch_frame({"id": "s", "op": "slow", "payload": {}, "deadline": deadline}, write_frame=write_frame)
+    )
+    await asyncio.sleep(0.05)
+    await app._dispatch_frame({"id": "h", "op": "health", "payload": {}}, write_frame=write_frame)
+    await slow_task
+
+    by_id = {frame["id"]: (at, frame) for at, frame in frames if "event" not in frame}
+    assert by_id["h"][0] - started < 0.2
+    assert by_id["s"][1]["result"] == {"done": True}
+    assert [frame["payload"] for _, frame in frames if "event" in frame] == [{"step": 1}]
+    assert seen["thread"].startswith("rpc-io")
+    assert seen["deadline"] == deadline
+    app.blocking.shutdown()
+
+
+def test_pool_sizes_come_from_env_and_overrides(monkeypatch):
+    monkeypatch.setenv("SHERIFF_RPC_BLOCKING_POOLS", "io=3,sqlite=4,bogus")
+    pools = BlockingPools({"crypto": 1})
+    assert pools.sizes == {"io": 3, "crypto": 1, "sqlite": 4}
+    with pytest.raises(ValueError):
+        pools.executor("missing")
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+import socket
+
+import pytest
+
+from shared.errors import ServiceCrashedError, ServiceUnavailableError
+from shared.proc_rpc import ProcClient
+from shared.rpc_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from shared.service_base import NDJSONService
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_breaker_backs_off_and_lets_one_probe_through(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("shared.rpc_breaker.time.monotonic", lambda: now[0])
+    monkeypatch.setattr("shared.rpc_breaker.random.uniform", lambda a, b: 1.0)
+    breaker = CircuitBreaker("svc", threshold=2, base_sec=1.0, max_sec=3.0)
+
+    breaker.record_failure("refused")
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure("refused")
+    assert breaker.state == OPEN and not breaker.allow()
+
+    now[0] += 1.0
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure("refused")
+    assert breaker.snapshot()["retry_in_sec"] == 2.0
+
+    now[0] += 2.0
+    assert breaker.allow()
+    breaker.record_failure("refused")
+    now[0] += 2.0
+    assert breaker.state == OPEN
+    now[0] += 1.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.snapshot() == {"state": CLOSED, "failures": 0, "retry_in_sec": 0.0, "last_error": ""}
+
+
+@pytest.mark.asyncio
+async def test_daemon_only_client_fails_fast_while_the_circuit_is_open(monkeypatch):
+    port = _free_port()
+    monkeypatch.setattr("shared.rpc_breaker.RPC_BREAKER_BASE_SEC", 0.2)
+    monkeypatch.setattr("shared.proc_rpc.rpc_endpoint", lambda service: ("127.0.0.1", port) if service == "dummy" else None)
+    connects = []
+    real_open = asyncio.open_connection
+
+    async def counting_open(*args, **kwargs):
+        connects.append(args)
+        return await real_open(*args, **kwargs)
+
+    monkeypatch.setattr("shared.proc_rpc.asyncio.open_connection", counting_open)
+    client = ProcClient("dummy", spawn_fallback=False)
+    other = ProcClient("dummy", spawn_fallback=False)
+    with pytest.raises(ServiceCrashedError) as first:
+        await client.request("health", {})
+    assert not isinstance(first.value, ServiceUnavailableError)
+    with pytest.raises(ServiceUnavailableError):
+        await other.request("health", {})
+    assert len(connects) == 1
+    assert other.circuit_state()["state"] == OPEN
+
+    app = NDJSONService(name="test", island="gw", kind="service", version="1", ops={})
+    server_task = asyncio.create_task(app.run_tcp("127.0.0.1", port))
+    await asyncio.sleep(0.3)
+    try:
+        _, res = await other.request("health", {})
+        assert res["result"]["status"] == "ok"
+        assert client.circuit_state()["state"] == CLOSED
+        assert other.circuit_state()["connected"] is True
+    finally:
+        await client.close()
+        await other.close()
+        server_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await server_task
+
+
+def test_clients_with_spawn_fallback_have_no_breaker():
+    assert ProcClient("dummy").breaker is None
+    assert ProcClient("dummy", spawn_fallback=False, circuit_breaker=False).circuit_state()["state"] == "disabled"
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from shared.rpc_looplag import LoopLagMonitor
+from shared.service_base import NDJSONService
+
+
+def _block_the_loop_for_a_while():
+    time.sleep(0.3)
+
+
+@pytest.mark.asyncio
+async def test_monitor_records_lag_and_captures_the_blocking_stack(monkeypatch, tmp_path):
+    monkeypatch.setenv("SHERIFFCLAW_ROOT", str(tmp_path))
+    monitor = LoopLagMonitor("gw", interval=0.02, stall_ms=100)
+    monitor.services.add("gw.test")
+    monitor.start()
+    try:
+        await asyncio.sleep(0.1)
+        _block_the_loop_for_a_while()
+        await asyncio.sleep(0.1)
+    finally:
+        monitor.stop()
+    snap = monitor.snapshot()
+    assert snap["stalls"] == 1
+    assert snap["lag_max_ms"] >= 250
+    assert snap["last_stall"]["blocked_ms"] >= 250
+    assert "_block_the_loop_for_a_while" in snap["last_stall"]["stack"]
+    log_text = (tmp_path / "gw" / "logs" / "ops" / "loop-lag.log").read_text(encoding="utf-8")
+    assert "event loop of gw.test blocked" in log_text
+
+
+@pytest.mark.asyncio
+async def test_services_on_one_loop_share_a_monitor_exposed_in_health_and_metrics():
+    a = NDJSONService(name="gw.a", island="gw", kind="service", version="1", ops={})
+    b = NDJSONService(name="gw.b", island="gw", kind="service", version="1", ops={})
+    a._attach_loop_monitor()
+    b._attach_loop_monitor()
+    try:
+        assert a.loop_monitor is b.loop_monitor
+        await asyncio.sleep(0.3)
+        health = await a._health({}, None, "h")
+        assert health["status"] == "ok" and health["loop"]["stalls"] == 0
+        metrics = await b._metrics({}, None, "m")
+        assert metrics["loop"]["lag_p99_ms"] >= 0
+    finally:
+        monitor = a.loop_monitor
+        a._detach_loop_monitor()
+        assert monitor._task is not None
+        b._detach_loop_monitor()
+        assert monitor._task is None
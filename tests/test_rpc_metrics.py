@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from shared.rpc_metrics import LatencyHistogram
+from shared.service_base import NDJSONService
+
+
+def test_histogram_percentiles_stay_within_bucket_precision():
+    hist = LatencyHistogram()
+    for ms in range(1, 1001):
+        hist.record(ms / 1000)
+    for pct, expected_us in ((50, 500_000), (95, 950_000), (99, 990_000)):
+        assert expected_us <= hist.percentile_us(pct) <= expected_us * 1.04
+    assert hist.percentile_us(100) == 1_000_000
+
+
+@pytest.mark.asyncio
+async def test_metrics_op_reports_counts_errors_and_latency():
+    async def ok(payload, emit, req_id):
+        await asyncio.sleep(0.01)
+        return {}
+
+    async def boom(payload, emit, req_id):
+        raise RuntimeError("nope")
+
+    app = NDJSONService(name="test", island="gw", kind="service", version="1", ops={"ok": ok, "boom": boom})
+    frames = []
+
+    async def write_frame(frame):
+        frames.append(frame)
+
+    for idx in range(3):
+        await app._dispatch_frame({"id": f"r{idx}", "op": "ok", "payload": {}}, write_frame=write_frame)
+    await app._dispatch_frame({"id": "r9", "op": "boom", "payload": {}}, write_frame=write_frame)
+    await app._dispatch_frame({"id": "m", "op": "metrics", "payload": {"reset": True}}, write_frame=write_frame)
+
+    ops = frames[-1]["result"]["ops"]
+    assert ops["ok"]["count"] == 3 and ops["ok"]["errors"] == 0 and ops["ok"]["in_flight"] == 0
+    assert ops["ok"]["p50_ms"] >= 10
+    assert ops["boom"]["errors"] == 1
+    assert ops["metrics"]["in_flight"] == 1
+    assert app.metrics.snapshot()["ops"]["metrics"]["in_flight"] == 0
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from shared.rpc_oob import OOB_KEY, OOBChannel, OOBStr, accept_oob, make_probe, oob_file_mode
+
+
+def test_spill_leaves_small_values_and_caller_frame_untouched(tmp_path):
+    channel = OOBChannel(tmp_path, threshold=16)
+    frame = {"id": "r1", "ok": True, "result": {"stdout": "x" * 64, "code": 0, "lines": ["short", "y" * 32]}}
+    wire = channel.spill(frame)
+    assert frame["result"]["stdout"] == "x" * 64
+    assert wire["id"] == "r1"
+    assert set(wire["result"]["stdout"]) == {OOB_KEY, "size"}
+    assert wire["result"]["lines"][0] == "short"
+    assert channel.restore(wire) == frame
+
+
+def test_forwarding_a_received_string_links_instead_of_rewriting(tmp_path):
+    channel = OOBChannel(tmp_path, threshold=16)
+    received = channel.restore(channel.spill({"text": "z" * 100}))["text"]
+    assert isinstance(received, OOBStr)
+    forwarded = channel.spill({"text": received})
+    assert os.stat(tmp_path / forwarded["text"][OOB_KEY]).st_nlink == 2
+    del received
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_restore_rejects_handles_outside_the_spill_dir(tmp_path):
+    channel = OOBChannel(tmp_path, threshold=16)
+    with pytest.raises(ValueError):
+        channel.restore({"text": {OOB_KEY: "../secrets.db", "size": 1}})
+
+
+def test_accept_oob_requires_the_clients_probe(tmp_path):
+    assert accept_oob({"oob_dir": str(tmp_path), "oob_probe": "probe-missing"}, tmp_path) is None
+    probe = make_probe(tmp_path)
+    channel = accept_oob({"oob_dir": str(tmp_path), "oob_probe": probe.name}, tmp_path)
+    assert channel is not None and channel.directory == tmp_path
+
+
+def test_accept_oob_only_takes_the_islands_own_dir(tmp_path):
+    ours, theirs = tmp_path / "ours", tmp_path / "theirs"
+    ours.mkdir()
+    theirs.mkdir()
+    probe = make_probe(theirs)
+    assert accept_oob({"oob_dir": str(theirs), "oob_probe": probe.name}, ours) is None
+
+
+def test_restore_does_not_follow_symlinked_handles(tmp_path):
+    secret = tmp_path / "auth.json"
+    secret.write_text("token", encoding="utf-8")
+    spill = tmp_path / "oob"
+    spill.mkdir()
+    (spill / "link.oob").symlink_to(secret)
+    channel = OOBChannel(spill, threshold=16)
+    with pytest.raises(ValueError):
+        channel.restore({"text": {OOB_KEY: "link.oob", "size": 5}})
+
+
+def test_spill_files_are_never_world_readable(tmp_path, monkeypatch):
+    monkeypatch.delenv("SHERIFF_AI_WORKER_USER", raising=False)
+    assert oob_file_mode("llm") == 0o600
+    assert oob_file_mode("gw") == 0o600
+    monkeypatch.setenv("SHERIFF_AI_WORKER_USER", "sheriffai")
+    assert oob_file_mode("llm") == 0o640
+
+    channel = OOBChannel(tmp_path, threshold=16, file_mode=oob_file_mode("llm"))
+    wire = channel.spill({"text": "p" * 64})
+    assert os.stat(tmp_path / wire["text"][OOB_KEY]).st_mode & 0o007 == 0
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import asyncio
+import socket
+
+import pytest
+
+from shared.rpc_pool import close_pool, pooled_client
+from shared.service_base import NDJSONService
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_pooled_client_is_shared_per_service_and_mode():
+    client = pooled_client("sheriff-secrets")
+    assert pooled_client("sheriff-secrets") is client
+    assert pooled_client("sheriff-policy") is not client
+    assert pooled_client("sheriff-secrets", spawn_fallback=True) is not client
+    assert client.spawn_fallback is False
+
+
+@pytest.mark.asyncio
+async def test_pooled_connection_is_reused_then_closed_when_idle(monkeypatch):
+    port = _free_port()
+    connections = []
+    app = NDJSONService(name="test", island="gw", kind="service", version="1", ops={})
+    serve = app._handle_stream_client
+
+    async def counting(reader, writer):
+        connections.append(writer)
+        await serve(reader, writer)
+
+    server = await asyncio.start_server(counting, "127.0.0.1", port)
+    monkeypatch.setattr("shared.proc_rpc.rpc_endpoint", lambda service: ("127.0.0.1", port) if service == "dummy" else None)
+    client = pooled_client("dummy")
+    client.idle_timeout_sec = 0.1
+    try:
+        for _ in range(3):
+            await pooled_client("dummy").request("health", {})
+        assert len(connections) == 1
+        assert client._connected()
+
+        await asyncio.sleep(0.3)
+        assert not client._connected()
+        _, res = await client.request("health", {})
+        assert res["ok"] is True
+        assert len(connections) == 2
+    finally:
+        await close_pool()
+        server.close()
+        await server.wait_closed()
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import asyncio
+import socket
+
+import pytest
+
+from services.sheriff_ctl import ctl
+from services.sheriff_ctl.trace import load_trace, render_waterfall
+from shared.local_rpc import register_local_service, unregister_local_service
+from shared.oplog import get_op_logger
+from shared.proc_rpc import ProcClient
+from shared.rpc_trace import SpanRecorder, current_trace_id
+from shared.service_base import NDJSONService
+
+
+def _free_port() -> int:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+@pytest.mark.asyncio
+async def test_trace_context_follows_nested_calls_and_renders(monkeypatch, tmp_path, capsys):
+    monkeypatch.setenv("SHERIFFCLAW_ROOT", str(tmp_path))
+    port = _free_port()
+    seen = {}
+
+    async def inner(payload, emit, req_id):
+        seen["inner"] = current_trace_id()
+        return {}
+
+    async def outer(payload, emit, req_id):
+        seen["outer"] = current_trace_id()
+        nested = ProcClient("inner", spawn_fallback=False)
+        try:
+            await nested.request("inner.op", {})
+        finally:
+            await nested.close()
+        return {}
+
+    register_local_service("inner", NDJSONService(name="gw.inner", island="gw", kind="service", version="1",
+                                                  ops={"inner.op": inner}))
+    app = NDJSONService(name="gw.outer", island="gw", kind="service", version="1", ops={"outer.op": outer})
+    server_task = asyncio.create_task(app.run_tcp("127.0.0.1", port))
+    await asyncio.sleep(0.1)
+    monkeypatch.setattr("shared.proc_rpc.rpc_endpoint", lambda service: ("127.0.0.1", port) if service == "dummy" else None)
+    client = ProcClient("dummy", spawn_fallback=False)
+    try:
+        await client.request("outer.op", {})
+    finally:
+        unregister_local_service("inner")
+        await client.close()
+        server_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await server_task
+
+    assert seen["outer"] and seen["outer"] == seen["inner"]
+    ids, spans = load_trace(seen["outer"][:8])
+    assert ids == [seen["outer"]]
+    by_op = {row["op"]: row for row in spans}
+    assert by_op["inner.op"]["parent_span_id"] == by_op["outer.op"]["span_id"]
+    assert by_op["outer.op"]["parent_span_id"] is None
+
+    waterfall = render_waterfall(spans)
+    assert waterfall.index("gw.outer outer.op") < waterfall.index("  gw.inner inner.op")
+
+    ctl.main_sheriff(["trace", seen["outer"][:8]])
+    assert "gw.inner inner.op" in capsys.readouterr().out
+
+
+def test_op_log_lines_carry_the_current_trace_id(monkeypatch, tmp_path):
+    monkeypatch.setenv("SHERIFFCLAW_ROOT", str(tmp_path))
+    logger = get_op_logger("trace_test")
+    with SpanRecorder("gw.test", "gw").span("test.op", {"trace_id": "abc123"}):
+        logger.info("inside")
+    logger.info("outside")
+    text = (tmp_path / "gw" / "logs" / "ops" / "trace_test.log").read_text(encoding="utf-8")
+    assert "trace=abc123 :: inside" in text
+    assert "trace=- :: outside" in text
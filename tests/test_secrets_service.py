@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 
 from services.sheriff_secrets.service import SheriffSecretsService
@@ -53,3 +55,42 @@ async def test_secrets_lock(mock_paths):
 
     with pytest.raises(RuntimeError):
         await svc.get_llm_api_key({}, None, "r6")
+
+
+@pytest.mark.asyncio
+async def test_watch_streams_changes_from_writes(mock_paths):
+    svc = SheriffSecretsService()
+    events = []
+
+    async def emit(event, payload):
+        events.append((event, payload))
+
+    watch = asyncio.create_task(svc.watch({"timeout_sec": 5}, emit, "w1"))
+    await asyncio.sleep(0.05)
+    await svc.initialize({"master_password": "pw"}, None, "r1")
+    await svc.unlock({"master_password": "wrong"}, None, "r2")
+    await svc.unlock({"master_password": "pw"}, None, "r3")
+    # Writes may also come from a worker thread (blocking handlers).
+    await asyncio.to_thread(svc.changes.publish, "llm_provider")
+    await asyncio.sleep(0.05)
+    watch.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await watch
+
+    assert events[0][0] == "secrets.watching"
+    assert events[0][1]["version"] == 0
+    changed = [payload for event, payload in events if event == "secrets.changed"]
+    assert [c["keys"] for c in changed] == [["unlocked", "llm_provider", "llm_api_key"], ["unlocked"], ["llm_provider"]]
+    assert [c["version"] for c in changed] == [1, 2, 3]
+    assert not svc.changes._subscribers
+
+
+@pytest.mark.asyncio
+async def test_watch_ends_with_cursor_after_timeout(mock_paths):
+    svc = SheriffSecretsService()
+
+    async def emit(event, payload):
+        return None
+
+    out = await svc.watch({"timeout_sec": 0.01}, emit, "w1")
+    assert out == {"epoch": svc.changes.epoch, "version": 0}
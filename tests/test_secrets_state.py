@@ -1,3 +1,5 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 
 from shared.secrets_state import SecretsState
@@ -68,6 +70,35 @@ def test_ensure_handle(tmp_path, monkeypatch):
     assert state.ensure_handle("exists")
 
 
+def test_concurrent_set_secret_keeps_every_handle(tmp_path, monkeypatch):
+    monkeypatch.setenv("SHERIFF_DEBUG", "0")
+    state = SecretsState(tmp_path / "s.enc", tmp_path / "m.json")
+    state.initialize({"master_password": "pw"})
+    state.unlock("pw")
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda i: state.set_secret(f"h{i}", f"v{i}"), range(16)))
+
+    assert all(state.get_secret(f"h{i}") == f"v{i}" for i in range(16))
+
+
+def test_initialize_never_reads_as_unlocked(tmp_path, monkeypatch):
+    monkeypatch.setenv("SHERIFF_DEBUG", "0")
+    state = SecretsState(tmp_path / "s.enc", tmp_path / "m.json")
+    seen = []
+    db_set = state._db_set
+
+    def spy(key, value, password=None):
+        seen.append(state.is_unlocked())
+        db_set(key, value, password)
+
+    monkeypatch.setattr(state, "_db_set", spy)
+    state.initialize({"master_password": "pw"})
+
+    assert seen and not any(seen)
+    assert not state.is_unlocked()
+
+
 def test_debug_mode_uses_isolated_files_and_forced_password(tmp_path, monkeypatch):
     monkeypatch.setenv("SHERIFF_DEBUG", "1")
     state = SecretsState(tmp_path / "secrets.db", tmp_path / "master.json")
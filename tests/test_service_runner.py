@@ -48,3 +48,41 @@ def test_service_env_sets_install_root(monkeypatch, tmp_path):
     monkeypatch.setattr(service_runner, "base_root", lambda: tmp_path)
     env = service_runner._service_env("sheriff-updater")
     assert env["SHERIFFCLAW_ROOT"] == str(tmp_path)
+
+
+def test_service_env_uses_unix_socket_when_selected(monkeypatch, tmp_path):
+    monkeypatch.setenv("SHERIFFCLAW_ROOT", str(tmp_path))
+    monkeypatch.setenv("SHERIFF_RPC_TRANSPORT", "unix")
+    monkeypatch.setattr(service_runner, "base_root", lambda: tmp_path)
+    env = service_runner._service_env("sheriff-secrets")
+    assert env["SHERIFF_RPC_SOCKET"] == str(tmp_path / "gw" / "run" / "sheriff-secrets.sock")
+    assert "SHERIFF_RPC_PORT" not in env
+
+
+def test_cmd_start_monolith_runs_gw_host_and_keeps_llm_island_separate(monkeypatch):
+    started = []
+    waited = []
+
+    class FakeClient:
+        def __init__(self, name: str, *args, **kwargs):
+            self.name = name
+
+        async def request(self, op, payload, stream_events=False):
+            return [], {"result": {"unlocked": True}}
+
+        async def close(self):
+            pass
+
+    async def fake_wait(service, timeout_sec=10.0):
+        waited.append(service)
+
+    monkeypatch.setattr(service_runner, "ProcClient", FakeClient)
+    monkeypatch.setattr(service_runner.SERVICE_MANAGER, "stop_many", lambda services: {})
+    monkeypatch.setattr(service_runner.SERVICE_MANAGER, "start", started.append)
+    monkeypatch.setattr(service_runner, "_wait_service_health", fake_wait)
+    monkeypatch.setattr(service_runner, "_notify_sheriff_channel", lambda text: False)
+
+    service_runner.cmd_start(argparse.Namespace(master_password=None, monolith=True))
+
+    assert started == [service_runner.GW_HOST, *service_runner.LLM_ORDER]
+    assert waited == [*service_runner.GW_ORDER, *service_runner.LLM_ORDER]
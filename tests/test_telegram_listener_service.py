@@ -71,8 +71,9 @@ async def test_poll_bot_extracts_topic_metadata(monkeypatch, tmp_path):
 
     captured = []
 
-    async def fake_handle_ai_message(token, sheriff_token, user_id, chat_id, text, *, chat_type="", message_thread_id=None):
-        captured.append((token, sheriff_token, user_id, chat_id, text, chat_type, message_thread_id))
+    async def fake_handle_ai_message(token, sheriff_token, user_id, chat_id, text, *, chat_type="", message_thread_id=None,
+                                     update_id=None):
+        captured.append((token, sheriff_token, user_id, chat_id, text, chat_type, message_thread_id, update_id))
 
     svc._http_get = lambda url, params, timeout: FakeResp()
     svc._handle_ai_message = fake_handle_ai_message
@@ -88,7 +89,7 @@ async def test_poll_bot_extracts_topic_metadata(monkeypatch, tmp_path):
     await svc._poll_bot("llm", "llm-token", "sheriff-token", offsets)
     await __import__("asyncio").sleep(0)
 
-    assert captured == [("llm-token", "sheriff-token", "42", -100, "hello topic", "supergroup", 9)]
+    assert captured == [("llm-token", "sheriff-token", "42", -100, "hello topic", "supergroup", 9, 1)]
     assert offsets["llm"] == 2
 
 
@@ -113,3 +114,60 @@ async def test_handle_ai_message_timeout_surfaces_user_message(monkeypatch, tmp_
 
     assert sent
     assert "timed out" in sent[-1][2].lower()
+
+
+@pytest.mark.asyncio
+async def test_handle_ai_message_resends_update_after_gateway_restart(monkeypatch, tmp_path):
+    monkeypatch.setenv("SHERIFFCLAW_ROOT", str(tmp_path))
+    monkeypatch.setattr("services.telegram_listener.service.CHAT_RETRY_BASE_SEC", 0)
+    svc = TelegramListenerService()
+    sent = []
+    svc._send_message = lambda token, chat_id, text: sent.append(text)
+
+    async def fake_secrets(op: str, payload: dict):
+        if op == "secrets.is_unlocked":
+            return {"unlocked": True}
+        if op == "secrets.activation.status":
+            return {"user_id": "u1"}
+        return {}
+
+    async def fake_stream():
+        yield {"event": "assistant.final", "payload": {"text": "ok"}}
+
+    svc._secrets = fake_secrets
+    svc.gateway.request = AsyncMock(side_effect=[
+        ServiceCrashedError("service connection lost: sheriff-gateway"),
+        (fake_stream(), {"result": {"status": "done"}}),
+    ])
+
+    await svc._handle_ai_message("llm-token", "sheriff-token", "u1", 123, "hello", update_id=5)
+
+    assert sent == ["ok"]
+    payloads = [call.args[1] for call in svc.gateway.request.call_args_list]
+    assert [p["update_id"] for p in payloads] == [5, 5]
+
+
+@pytest.mark.asyncio
+async def test_handle_ai_message_stays_quiet_on_duplicate_update(monkeypatch, tmp_path):
+    monkeypatch.setenv("SHERIFFCLAW_ROOT", str(tmp_path))
+    svc = TelegramListenerService()
+    sent = []
+    svc._send_message = lambda token, chat_id, text: sent.append(text)
+
+    async def fake_secrets(op: str, payload: dict):
+        if op == "secrets.is_unlocked":
+            return {"unlocked": True}
+        if op == "secrets.activation.status":
+            return {"user_id": "u1"}
+        return {}
+
+    async def empty_stream():
+        if False:
+            yield {}
+
+    svc._secrets = fake_secrets
+    svc.gateway.request = AsyncMock(return_value=(empty_stream(), {"result": {"status": "duplicate"}}))
+
+    await svc._handle_ai_message("llm-token", "sheriff-token", "u1", 123, "hello", update_id=5)
+
+    assert sent == []
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from unittest.mock import AsyncMock
+
+import pytest
+
+from services.telegram_webhook.service import TelegramWebhookService
+from shared.session_keys import update_idempotency_key
+
+
+def _accepting_service(sent: list):
+    svc = TelegramWebhookService()
+    svc._send_message = lambda token, chat_id, text: sent.append(text)
+    svc.ai_gate.request = AsyncMock(return_value=([], {"ok": True, "result": {"status": "accepted"}}))
+    return svc
+
+
+@pytest.mark.asyncio
+async def test_handle_ai_message_passes_reply_channel_to_gateway(monkeypatch, tmp_path):
+    monkeypatch.setenv("SHERIFFCLAW_ROOT", str(tmp_path))
+    sent = []
+    svc = _accepting_service(sent)
+
+    async def fake_stream():
+        yield {"event": "assistant.final", "payload": {"text": "ok"}}
+
+    svc.gateway.request = AsyncMock(return_value=(fake_stream(), {"result": {"status": "done"}}))
+
+    await svc._handle_ai_message("llm-token", "u1", 123, "hello", chat_type="supergroup", message_thread_id=77,
+                                 update_id=9)
+
+    op, payload = svc.gateway.request.call_args.args[:2]
+    assert op == "gateway.handle_user_message"
+    assert payload["chat_id"] == 123
+    assert payload["chat_type"] == "supergroup"
+    assert payload["message_thread_id"] == 77
+    assert payload["idempotency_key"] == update_idempotency_key("telegram", 123, 9)
+    assert sent == ["ok"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("status", ["duplicate", "coalesced"])
+async def test_handle_ai_message_stays_quiet_for_already_answered_updates(monkeypatch, tmp_path, status):
+    monkeypatch.setenv("SHERIFFCLAW_ROOT", str(tmp_path))
+    sent = []
+    svc = _accepting_service(sent)
+
+    async def fake_stream():
+        if False:
+            yield {}
+
+    svc.gateway.request = AsyncMock(return_value=(fake_stream(), {"result": {"status": status}}))
+
+    await svc._handle_ai_message("llm-token", "u1", 123, "hello", update_id=9)
+
+    assert sent == []
+
+
+@pytest.mark.asyncio
+async def test_handle_ai_message_reports_an_empty_turn(monkeypatch, tmp_path):
+    monkeypatch.setenv("SHERIFFCLAW_ROOT", str(tmp_path))
+    sent = []
+    svc = _accepting_service(sent)
+
+    async def fake_stream():
+        if False:
+            yield {}
+
+    svc.gateway.request = AsyncMock(return_value=(fake_stream(), {"result": {"status": "done"}}))
+
+    await svc._handle_ai_message("llm-token", "u1", 123, "hello")
+
+    assert sent == ["⚠️ No response generated. Please try again in a moment."]
@@ -0,0 +1,100 @@
+import asyncio
+import gc
+
+import pytest
+
+from services.sheriff_gateway.tool_dispatch import ToolDispatcher
+
+
+def _router(delays, running, peak):
+    async def route(call):
+        running.append(call["id"])
+        peak[0] = max(peak[0], len(running))
+        await asyncio.sleep(delays[call["id"]])
+        running.remove(call["id"])
+        if call["id"] == "boom":
+            raise RuntimeError("tool host down")
+        return {"status": "ok", "id": call["id"]}
+    return route
+
+
+@pytest.mark.asyncio
+async def test_calls_run_concurrently_up_to_the_limit_and_are_tagged():
+    running, peak, events = [], [0], []
+
+    async def emit(event, payload):
+        events.append(payload)
+
+    tools = ToolDispatcher(_router({"a": 0.05, "b": 0.01, "c": 0.01}, running, peak), emit, limit=2)
+    for cid in ("a", "b", "c"):
+        await tools.submit({"id": cid, "call_id": f"id-{cid}"})
+    await tools.drain()
+
+    assert peak[0] == 2
+    # Completion order: the slow first call does not hold back the others.
+    assert [e["id"] for e in events] == ["b", "c", "a"]
+    assert [e["call_id"] for e in events] == ["id-b", "id-c", "id-a"]
+
+
+@pytest.mark.asyncio
+async def test_in_order_delivery_holds_results_back_until_earlier_ones_are_out():
+    running, peak, events = [], [0], []
+
+    async def emit(event, payload):
+        events.append(payload["call_id"])
+
+    tools = ToolDispatcher(_router({"a": 0.03, "b": 0.01, "c": 0.0}, running, peak), emit, in_order=True)
+    for cid in ("a", "b", "c"):
+        await tools.submit({"id": cid})
+    await tools.drain()
+
+    assert peak[0] == 3
+    assert events == ["call-1", "call-2", "call-3"]
+
+
+@pytest.mark.asyncio
+async def test_failed_call_fails_the_drain_and_stops_the_rest():
+    running, peak, events = [], [0], []
+
+    async def emit(event, payload):
+        events.append(payload["call_id"])
+
+    tools = ToolDispatcher(_router({"slow": 0.2, "boom": 0.01}, running, peak), emit)
+    await tools.submit({"id": "slow"})
+    await tools.submit({"id": "boom"})
+    with pytest.raises(RuntimeError):
+        await tools.drain()
+    await asyncio.sleep(0)
+
+    assert events == []
+    assert all(task.done() for task in tools._tasks)
+
+
+@pytest.mark.asyncio
+async def test_cancel_collects_calls_that_fail_while_stopping():
+    unretrieved = []
+    loop = asyncio.get_running_loop()
+    loop.set_exception_handler(lambda _loop, context: unretrieved.append(context))
+    started = asyncio.Event()
+
+    async def route(call):
+        started.set()
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            raise RuntimeError("tool host down while cancelling")
+        return {}
+
+    async def emit(event, payload):
+        return
+
+    tools = ToolDispatcher(route, emit)
+    await tools.submit({"id": "a"})
+    await started.wait()
+    await tools.cancel()
+    await asyncio.sleep(0)
+    del tools
+    gc.collect()
+    loop.set_exception_handler(None)
+
+    assert unretrieved == []
@@ -19,12 +19,10 @@ def tools_svc(tmp_path, monkeypatch):
 @pytest.mark.asyncio
 async def test_exec_tool_allowed(tools_svc):
     tools_svc.policy.request.return_value = (None, {"result": {"decision": "ALLOW"}})
-    tools_svc.secrets.request.side_effect = [
-        (None, {"result": {"unlocked": True}}),
-    ]
     result = await tools_svc.exec_tool({"principal_id": "u1", "argv": [sys.executable, "-c", "print('ok')"]}, None,
                                        "r1")
     assert result["status"] == "executed"
+    tools_svc.secrets.request_many.assert_not_awaited()
 
 
 @pytest.mark.asyncio
@@ -38,17 +36,16 @@ async def test_exec_tool_denied_returns_needs_tool_approval(tools_svc):
 @pytest.mark.asyncio
 async def test_exec_tool_with_missing_secret_creates_request(tools_svc):
     tools_svc.policy.request.return_value = (None, {"result": {"decision": "ALLOW"}})
-    tools_svc.secrets.request.side_effect = [
-        (None, {"result": {"unlocked": True}}),
-        (None, {"result": {"value": None}}),
-    ]
+    tools_svc.secrets.request.return_value = (None, {"ok": True, "result": {"unlocked": True}})
+    tools_svc.secrets.request_many.return_value = [{"ok": True, "result": {"value": None}}]
     result = await tools_svc.exec_tool(
         {"principal_id": "u1", "argv": ["git", "clone", "x"], "env_handles": ["GIT_TOKEN"]},
         None,
         "r1",
     )
     assert result == {"status": "needs_secret", "missing_handles": ["GIT_TOKEN"]}
-    tools_svc.requests.request.assert_any_await(
+    tools_svc.secrets.request_many.assert_awaited_once_with([("secrets.get_secret", {"handle": "GIT_TOKEN"})])
+    tools_svc.requests.request_many.assert_awaited_once_with([(
         "requests.create_or_update",
         {
             "type": "secret",
@@ -56,16 +53,14 @@ async def test_exec_tool_with_missing_secret_creates_request(tools_svc):
             "one_liner": "Need GIT_TOKEN to run git clone x",
             "context": {"title": "GIT_TOKEN", "tool": "git", "argv": ["git", "clone", "x"]},
         },
-    )
+    )])
 
 
 @pytest.mark.asyncio
 async def test_exec_tool_with_secret_env_uses_value(tools_svc):
     tools_svc.policy.request.return_value = (None, {"result": {"decision": "ALLOW"}})
-    tools_svc.secrets.request.side_effect = [
-        (None, {"result": {"unlocked": True}}),
-        (None, {"result": {"value": "top-secret"}}),
-    ]
+    tools_svc.secrets.request.return_value = (None, {"ok": True, "result": {"unlocked": True}})
+    tools_svc.secrets.request_many.return_value = [{"ok": True, "result": {"value": "top-secret"}}]
     result = await tools_svc.exec_tool(
         {
             "principal_id": "u1",
@@ -79,6 +74,21 @@ async def test_exec_tool_with_secret_env_uses_value(tools_svc):
     assert "top-secret" in result["stdout"]
 
 
+@pytest.mark.asyncio
+async def test_exec_tool_with_locked_vault_requires_master_password(tools_svc):
+    tools_svc.policy.request.return_value = (None, {"result": {"decision": "ALLOW"}})
+    tools_svc.secrets.request.return_value = (None, {"ok": True, "result": {"unlocked": False}})
+    result = await tools_svc.exec_tool(
+        {"principal_id": "u1", "argv": ["git", "clone", "x"], "env_handles": ["GIT_TOKEN"]},
+        None,
+        "r1",
+    )
+    assert result == {"status": "master_password_required"}
+    # No lookups against the locked vault.
+    tools_svc.secrets.request_many.assert_not_awaited()
+    tools_svc.requests.request_many.assert_not_awaited()
+
+
 @pytest.mark.asyncio
 async def test_disclose_output_check_unified_flow(tools_svc):
     # Setup allowed execution
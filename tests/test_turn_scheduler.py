@@ -0,0 +1,162 @@
+import asyncio
+
+import pytest
+
+from services.sheriff_gateway.turn_scheduler import TurnScheduler, _parse_weights
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_lane_is_fifo_and_serial():
+    sched = TurnScheduler(max_concurrent=4)
+    first = await sched.acquire("a")
+    second = asyncio.create_task(sched.acquire("a"))
+    third = asyncio.create_task(sched.acquire("a"))
+    await _settle()
+    assert not second.done() and not third.done()
+
+    sched.release(first)
+    await _settle()
+    assert second.done() and not third.done()
+    sched.release(second.result())
+    await _settle()
+    sched.release(third.result())
+    assert sched.status()["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_lanes_run_in_parallel_up_to_the_global_cap():
+    sched = TurnScheduler(max_concurrent=2)
+    a = await sched.acquire("a")
+    b = await sched.acquire("b")
+    c = asyncio.create_task(sched.acquire("c"))
+    await _settle()
+    assert not c.done()
+    assert sched.status()["processing"] == 2
+
+    sched.release(a)
+    await _settle()
+    assert c.done()
+    sched.release(b)
+    sched.release(c.result())
+    assert sched.status()["processing"] == 0
+
+
+@pytest.mark.asyncio
+async def test_weighted_round_robin_across_lanes():
+    sched = TurnScheduler(max_concurrent=1)
+    blocker = await sched.acquire("x")
+    order = []
+
+    async def turn(lane, weight):
+        ticket = await sched.acquire(lane, weight)
+        order.append(lane)
+        await asyncio.sleep(0)
+        sched.release(ticket)
+
+    tasks = [asyncio.create_task(turn("heavy", 2)) for _ in range(4)]
+    await _settle()
+    tasks += [asyncio.create_task(turn("light", 1)) for _ in range(2)]
+    await _settle()
+    sched.release(blocker)
+    await asyncio.gather(*tasks)
+    assert order == ["heavy", "heavy", "light", "heavy", "heavy", "light"]
+
+
+@pytest.mark.asyncio
+async def test_release_wakes_only_the_next_waiter():
+    sched = TurnScheduler(max_concurrent=1)
+    held = await sched.acquire("a")
+    waiters = [asyncio.create_task(sched.acquire(f"lane-{i}")) for i in range(5)]
+    await _settle()
+
+    sched.release(held)
+    await _settle()
+    assert [w.done() for w in waiters] == [True, False, False, False, False]
+    for i, waiter in enumerate(waiters):
+        sched.release(waiter.result())
+        await _settle()
+        assert sum(w.done() for w in waiters) == min(i + 2, 5)
+
+
+@pytest.mark.asyncio
+async def test_pause_holds_new_turns_until_resume():
+    sched = TurnScheduler(max_concurrent=2)
+    sched.pause("update")
+    waiter = asyncio.create_task(sched.acquire("a"))
+    await _settle()
+    assert not waiter.done()
+    assert sched.status()["pending"] == 1
+    assert sched.status()["pause_reason"] == "update"
+
+    sched.resume()
+    await _settle()
+    assert waiter.done()
+    sched.release(waiter.result())
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_its_lane():
+    sched = TurnScheduler(max_concurrent=1)
+    held = await sched.acquire("a")
+    gone = asyncio.create_task(sched.acquire("a"))
+    kept = asyncio.create_task(sched.acquire("a"))
+    await _settle()
+    gone.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await gone
+
+    sched.release(held)
+    await _settle()
+    assert kept.done()
+    sched.release(kept.result())
+    assert sched.status()["pending"] == 0
+    assert sched.status()["lanes"] == 0
+
+
+@pytest.mark.asyncio
+async def test_slot_granted_to_a_cancelled_waiter_is_handed_on():
+    sched = TurnScheduler(max_concurrent=1)
+    held = await sched.acquire("a")
+    gone = asyncio.create_task(sched.acquire("b"))
+    kept = asyncio.create_task(sched.acquire("c"))
+    await _settle()
+
+    sched.release(held)
+    gone.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await gone
+    await _settle()
+    assert kept.done()
+    assert sched.status()["processing"] == 1
+
+
+def test_parse_weights_skips_bad_entries():
+    assert _parse_weights("telegram=3, cli=1,bad,zero=0,x=y") == {"telegram": 3, "cli": 1}
+
+
+@pytest.mark.asyncio
+async def test_absorb_takes_over_matching_waiters_in_order():
+    sched = TurnScheduler(max_concurrent=1)
+    leader = await sched.acquire("a")
+    waiters = [asyncio.create_task(sched.acquire("a", data=text)) for text in ("x", "y", "stop", "z")]
+    await _settle()
+
+    taken = sched.absorb(leader, 5, lambda ticket: ticket.data != "stop")
+    await _settle()
+    assert [t.data for t in taken] == ["x", "y"]
+    assert all(w.done() and w.result().leader is leader for w in waiters[:2])
+    assert not waiters[2].done()
+    assert sched.status()["processing"] == 1 and sched.status()["waiting"] == 2
+
+    sched.release(leader)
+    await _settle()
+    assert waiters[2].done() and not waiters[3].done()
+    sched.release(waiters[2].result())
+    await _settle()
+    sched.release(waiters[3].result())
+    assert sched.status()["pending"] == 0
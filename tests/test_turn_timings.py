@@ -0,0 +1,91 @@
+from unittest.mock import AsyncMock
+
+import pytest
+
+from services.sheriff_ctl.ctl import build_parser
+from services.sheriff_ctl.stats import render_turn_stats
+from services.sheriff_gateway.service import SheriffGatewayService
+from shared.turn_timings import TurnTimer, TurnTimingStore, begin_turn, current_turn, summarize, turn_phase
+
+
+def test_turn_phase_accumulates_only_inside_a_turn():
+    with turn_phase("vault"):
+        pass
+    assert current_turn() is None
+
+    with begin_turn() as turn:
+        with turn_phase("vault"):
+            pass
+        with turn_phase("vault"):
+            pass
+        turn.add_tool("tools.exec", 0.002)
+    assert current_turn() is None
+    row = turn.row(status="done")
+    assert set(row["phases"]) == {"vault", "tools"}
+    assert row["tools"] == [["tools.exec", 2.0]]
+    assert row["total_ms"] >= 0
+
+
+def test_store_round_trip_and_summary(tmp_path):
+    store = TurnTimingStore(tmp_path / "turns.jsonl")
+    for ms in (10, 20, 30, 40):
+        timer = TurnTimer()
+        timer.add("queue_wait", ms / 1000)
+        timer.add("codex", 0.1)
+        row = timer.row(status="done")
+        row["total_ms"] = 100 + ms
+        store.append(row)
+
+    rows = store.load()
+    assert len(rows) == 4
+    assert len(store.load(2)) == 2
+
+    summary = summarize(rows)
+    assert summary["queue_wait"]["count"] == 4
+    assert summary["queue_wait"]["max_ms"] == pytest.approx(40, rel=0.05)
+    assert summary["codex"]["p50_ms"] == pytest.approx(100, rel=0.05)
+    assert summary["host"]["max_ms"] == pytest.approx(40, rel=0.05)
+
+    text = render_turn_stats(rows)
+    assert "4 turns" in text
+    assert text.index("queue_wait") < text.index("codex") < text.index("host")
+
+
+def test_stats_turns_cli_is_registered():
+    args = build_parser().parse_args(["stats", "turns", "--limit", "5"])
+    assert args.limit == 5
+    assert callable(args.func)
+
+
+@pytest.mark.asyncio
+async def test_gateway_records_one_timing_row_per_turn(tmp_path):
+    svc = SheriffGatewayService()
+    svc.turn_timings = TurnTimingStore(tmp_path / "turns.jsonl")
+
+    async def ai_stream():
+        yield {"event": "tool.call", "payload": {"tool_name": "tools.exec", "payload": {"argv": ["ls"]}}}
+        yield {"event": "assistant.final", "payload": {"text": "done"}}
+
+    async def ai_request(op, payload, stream_events=False):
+        if op == "codex.session.send":
+            return ai_stream(), AsyncMock()
+        return [], {"result": {}}
+
+    svc.ai.request = AsyncMock(side_effect=ai_request)
+    svc.tools.request = AsyncMock(return_value=([], {"result": {"status": "executed"}}))
+    svc.secrets.request = AsyncMock(return_value=([], {"ok": True, "result": {"unlocked": True, "provider": "stub"}}))
+
+    async def emit(event, payload):
+        return None
+
+    out = await svc.handle_user_message({"channel": "cli", "principal_external_id": "u1", "text": "hi"}, emit, "r1")
+    assert out["status"] == "done"
+
+    rows = svc.turn_timings.load()
+    assert len(rows) == 1
+    row = rows[0]
+    assert row["status"] == "done"
+    assert row["channel"] == "cli"
+    for phase in ("queue_wait", "preflight", "session_ensure", "vault", "provider", "codex", "tools"):
+        assert phase in row["phases"]
+    assert [name for name, _ in row["tools"]] == ["tools.exec"]
@@ -0,0 +1,175 @@
+import asyncio
+import time
+
+import pytest
+
+from services.sheriff_gateway.vault_cache import VaultStateCache
+from shared.errors import ServiceCrashedError
+from shared.rpc_deadline import current_deadline, reset_deadline, set_deadline
+
+
+class FakeSecrets:
+    def __init__(self, epoch="e1"):
+        self.calls = []
+        self.watch_deadlines = []
+        self.epoch = epoch
+        self.pushes: asyncio.Queue = asyncio.Queue()
+        self.values = {
+            "secrets.is_unlocked": {"unlocked": True},
+            "secrets.get_llm_provider": {"provider": "openai-codex"},
+            "secrets.get_llm_api_key": {"api_key": "sk-1"},
+        }
+
+    async def request(self, op, payload, stream_events=False):
+        self.calls.append(op)
+        if op != "secrets.watch":
+            return [], {"ok": True, "result": dict(self.values[op])}
+        self.watch_deadlines.append(current_deadline())
+        final = asyncio.get_running_loop().create_future()
+        final.add_done_callback(lambda fut: fut.cancelled() or fut.exception())
+
+        async def stream():
+            yield {"event": "secrets.watching", "payload": {"epoch": self.epoch, "version": 0}}
+            while True:
+                item = await self.pushes.get()
+                if isinstance(item, BaseException):
+                    final.set_exception(item)
+                    raise item
+                if item is None:
+                    final.set_result({"ok": True, "result": {"epoch": self.epoch, "version": 0}})
+                    return
+                yield {"event": "secrets.changed", "payload": item}
+
+        return stream(), final
+
+    def reads(self):
+        return [op for op in self.calls if op != "secrets.watch"]
+
+
+async def _until(predicate):
+    for _ in range(100):
+        if predicate():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+@pytest.mark.asyncio
+async def test_reads_are_served_from_cache_while_watch_is_live():
+    secrets = FakeSecrets()
+    cache = VaultStateCache(lambda: secrets)
+
+    await cache.request("secrets.is_unlocked")
+    await _until(lambda: cache.live)
+    for _ in range(3):
+        assert (await cache.request("secrets.is_unlocked"))["result"]["unlocked"] is True
+        assert (await cache.request("secrets.get_llm_provider"))["result"]["provider"] == "openai-codex"
+    assert secrets.reads() == ["secrets.is_unlocked", "secrets.is_unlocked", "secrets.get_llm_provider"]
+
+
+@pytest.mark.asyncio
+async def test_pushed_change_invalidates_only_its_keys():
+    secrets = FakeSecrets()
+    cache = VaultStateCache(lambda: secrets)
+    await cache.request("secrets.is_unlocked")
+    await _until(lambda: cache.live)
+    await cache.request("secrets.is_unlocked")
+    await cache.request("secrets.get_llm_provider")
+
+    secrets.values["secrets.get_llm_provider"] = {"provider": "stub"}
+    await secrets.pushes.put({"epoch": "e1", "version": 1, "keys": ["llm_provider"]})
+    await _until(lambda: "secrets.get_llm_provider" not in cache._entries)
+
+    assert (await cache.request("secrets.get_llm_provider"))["result"]["provider"] == "stub"
+    await cache.request("secrets.is_unlocked")
+    assert secrets.reads().count("secrets.is_unlocked") == 2
+    assert secrets.reads().count("secrets.get_llm_provider") == 2
+
+
+@pytest.mark.asyncio
+async def test_lost_watch_stops_serving_cached_entries():
+    secrets = FakeSecrets()
+    cache = VaultStateCache(lambda: secrets)
+    await cache.request("secrets.is_unlocked")
+    await _until(lambda: cache.live)
+    await cache.request("secrets.is_unlocked")
+
+    # The secrets service restarted: it lost its unlock state and comes back with a new epoch.
+    secrets.epoch = "e2"
+    secrets.values["secrets.is_unlocked"] = {"unlocked": False}
+    await secrets.pushes.put(ServiceCrashedError("service connection lost"))
+    await _until(lambda: secrets.calls.count("secrets.watch") == 2)
+    await _until(lambda: cache.live)
+
+    assert (await cache.request("secrets.is_unlocked"))["result"]["unlocked"] is False
+    cache._task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_local_write_invalidates_without_waiting_for_push():
+    secrets = FakeSecrets()
+    cache = VaultStateCache(lambda: secrets)
+    await cache.request("secrets.get_llm_api_key")
+    await _until(lambda: cache.live)
+    await cache.request("secrets.get_llm_api_key")
+
+    cache.note_write("secrets.set_llm_api_key")
+    await cache.request("secrets.get_llm_api_key")
+    assert secrets.reads().count("secrets.get_llm_api_key") == 3
+
+
+@pytest.mark.asyncio
+async def test_service_without_watch_is_never_cached():
+    class OldSecrets:
+        calls = 0
+
+        async def request(self, op, payload, stream_events=False):
+            if op == "secrets.watch":
+                return [], {"ok": False, "error": "unknown op", "error_type": "unknown_op"}
+            OldSecrets.calls += 1
+            return [], {"ok": True, "result": {"unlocked": True}}
+
+    cache = VaultStateCache(lambda: OldSecrets())
+    for _ in range(3):
+        await cache.request("secrets.is_unlocked")
+        await asyncio.sleep(0.01)
+    assert OldSecrets.calls == 3
+    assert not cache.live
+
+
+@pytest.mark.asyncio
+async def test_watch_does_not_inherit_the_first_callers_deadline():
+    secrets = FakeSecrets()
+    cache = VaultStateCache(lambda: secrets)
+    token = set_deadline(time.time() + 0.05)
+    try:
+        await cache.request("secrets.is_unlocked")
+    finally:
+        reset_deadline(token)
+    await _until(lambda: cache.live)
+    await asyncio.sleep(0.1)
+
+    await secrets.pushes.put(ServiceCrashedError("service connection lost"))
+    await _until(lambda: secrets.calls.count("secrets.watch") == 2)
+    await _until(lambda: cache.live)
+    assert secrets.watch_deadlines == [None, None]
+    cache._task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_known_unlocked_needs_a_live_unlocked_entry():
+    secrets = FakeSecrets()
+    cache = VaultStateCache(lambda: secrets)
+    assert not cache.known_unlocked()
+    await cache.request("secrets.is_unlocked")
+    await _until(lambda: cache.live)
+    assert not cache.known_unlocked()
+    await cache.request("secrets.is_unlocked")
+    assert cache.known_unlocked()
+
+    secrets.values["secrets.is_unlocked"] = {"unlocked": False}
+    await secrets.pushes.put({"epoch": "e1", "version": 1, "keys": ["unlocked"]})
+    await _until(lambda: not cache.known_unlocked())
+    await cache.request("secrets.is_unlocked")
+    assert not cache.known_unlocked()
+    cache._task.cancel()
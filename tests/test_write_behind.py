@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+import pytest
+
+from services.sheriff_gateway.write_behind import WriteBehindQueue
+from shared.rpc_deadline import current_deadline, reset_deadline, set_deadline
+
+
+@pytest.mark.asyncio
+async def test_writes_run_in_order_and_retry():
+    done = []
+    failures = {"b": 2}
+
+    def write(name):
+        def _run():
+            if failures.get(name):
+                failures[name] -= 1
+                raise OSError("disk busy")
+            done.append(name)
+        return _run
+
+    async def async_write():
+        done.append("c")
+
+    q = WriteBehindQueue(attempts=3, retry_sec=0.001)
+    q.submit("k", write("a"))
+    q.submit("k", write("b"))
+    q.submit("k", async_write)
+    await q.drain()
+
+    assert done == ["a", "b", "c"]
+    assert q.status() == {"pending": 0, "dropped": 0, "failed": 0}
+
+
+@pytest.mark.asyncio
+async def test_gives_up_after_attempts_and_drops_oldest_on_overflow():
+    calls = []
+
+    def failing():
+        calls.append("x")
+        raise OSError("gone")
+
+    q = WriteBehindQueue(max_pending=2, attempts=2, retry_sec=0.001)
+    q.submit("k", failing)
+    q.submit("k", lambda: calls.append("y"))
+    q.submit("k", lambda: calls.append("z"))
+    await q.drain()
+
+    assert calls == ["y", "z"]
+    assert q.status()["dropped"] == 1
+
+    q.submit("k", failing)
+    await q.drain()
+    assert calls == ["y", "z", "x", "x"]
+    assert q.status()["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_worker_does_not_inherit_the_first_writers_deadline():
+    seen = []
+    q = WriteBehindQueue()
+    token = set_deadline(time.time() + 30)
+    try:
+        q.submit("a", lambda: seen.append(current_deadline()))
+    finally:
+        reset_deadline(token)
+    await q.drain()
+    q.submit("b", lambda: seen.append(current_deadline()))
+    await q.drain()
+    assert seen == [None, None]
+
+
+@pytest.mark.asyncio
+async def test_a_stuck_key_does_not_hold_up_other_keys():
+    done = []
+    release = asyncio.Event()
+
+    async def stuck():
+        await release.wait()
+        done.append("inbox")
+
+    q = WriteBehindQueue()
+    q.submit("inbox:s1", stuck)
+    q.submit("transcript:s1", lambda: done.append("t1"))
+    q.submit("transcript:s2", lambda: done.append("t2"))
+    for _ in range(5):
+        await asyncio.sleep(0)
+    assert sorted(done) == ["t1", "t2"]
+    assert q.status()["pending"] == 0
+
+    release.set()
+    await q.drain()
+    assert done[-1] == "inbox"